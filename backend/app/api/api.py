@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import profile, courses, parcours, activities, agenda, auth, document_conversion, chapters
+from app.api.endpoints import profile, courses, parcours, activities, agenda, auth, document_conversion, chapters, dashboard, sync, events, ai, export
 
 api_router = APIRouter()
 
@@ -22,6 +22,21 @@ api_router.include_router(activities.router, tags=["activities"])
 # Agenda endpoints
 api_router.include_router(agenda.router, tags=["agenda"])
 
+# Dashboard endpoint (aggregate of profile, parcours and agenda)
+api_router.include_router(dashboard.router, tags=["dashboard"])
+
+# Delta sync endpoint for client-side caches
+api_router.include_router(sync.router, tags=["sync"])
+
+# Server-sent events (extraction, conversion and recommendation progress)
+api_router.include_router(events.router, tags=["events"])
+
+# Export of all of the user's study data (NDJSON)
+api_router.include_router(export.router, tags=["export"])
+
+# AI gateway (evaluations, feedback and recommendations through the AI provider)
+api_router.include_router(ai.router, tags=["ai"])
+
 # Document conversion endpoints
 api_router.include_router(document_conversion.router, prefix="/documents", tags=["documents"])
 
@@ -2,8 +2,10 @@ from typing import Any, Dict
 from fastapi import APIRouter, Depends, HTTPException
 from uuid import UUID
 
-from app.api.models.pydantic_models import Activity, ActivityUpdate
+from app.api.models.pydantic_models import Activity, ActivityBatchRequest, ActivityBatchResult, ActivityUpdate
+from app.api.services.activity_durations import duration_estimator, measured_minutes
 from app.api.services.auth import get_current_active_user
+from app.api.services.reference_data import attach_activity_types, course_catalog
 from app.api.services.supabase import supabase
 
 router = APIRouter()
@@ -18,9 +20,9 @@ async def get_activity(
     Get a specific activity with its details
     """
     try:
-        # Get activity with related data
+        # Get activity with related data (activity type and course come from the cache)
         response = supabase.table("activities") \
-            .select("*, activity_types(*), chapters(*)") \
+            .select("*, chapters(*)") \
             .eq("id", str(activity_id)) \
             .eq("user_id", current_user.id) \
             .execute()
@@ -28,17 +30,13 @@ async def get_activity(
         if not response.data:
             raise HTTPException(status_code=404, detail="Activity not found")
         
-        activity = response.data[0]
+        activity = (await attach_activity_types(response.data))[0]
         
         # Get course data if available
         if activity.get("course_id"):
-            course_response = supabase.table("courses") \
-                .select("*") \
-                .eq("id", activity.get("course_id")) \
-                .execute()
-            
-            if course_response.data:
-                activity["course"] = course_response.data[0]
+            course = await course_catalog.aget(activity.get("course_id"))
+            if course:
+                activity["course"] = course
         
         return activity
     except Exception as e:
@@ -93,56 +91,128 @@ async def complete_activity(
     Mark an activity as completed with optional score
     """
     try:
-        # Check if activity exists and belongs to user
-        activity_response = supabase.table("activities") \
-            .select("*, activity_types(*), chapters(*), courses(*)") \
-            .eq("id", str(activity_id)) \
-            .eq("user_id", current_user.id) \
-            .execute()
+        return await complete_user_activity(
+            current_user.id,
+            str(activity_id),
+            {"score": data["score"]} if "score" in data else {},
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error completing activity: {str(e)}")
+
+
+@router.post("/activities/batch", response_model=ActivityBatchResult)
+async def batch_update_activities(
+    batch: ActivityBatchRequest,
+    current_user: Any = Depends(get_current_active_user),
+) -> Any:
+    """
+    Apply several start/complete/score operations at once
+
+    Operations are applied in order (the last one wins for each field), written
+    with a single UPDATE (apply_activity_updates, migration 09), and progress is
+    recalculated once per course with a completion or a new score.
+    Unknown activities are reported in `not_found` without failing the batch.
+    """
+    for operation in batch.operations:
+        if operation.action == "score" and operation.score is None:
+            raise HTTPException(status_code=400, detail=f"Missing score for activity {operation.activity_id}")
+
+    # Merge the operations into one final state per activity
+    updates: Dict[str, Dict[str, Any]] = {}
+    affects_progress = set()
+    for operation in batch.operations:
+        activity_id = str(operation.activity_id)
+        update = updates.setdefault(activity_id, {"id": activity_id})
+        if operation.action == "start":
+            update["status"] = "in_progress"
+        elif operation.action == "complete":
+            update["status"] = "completed"
+        if operation.score is not None:
+            update["score"] = operation.score
+        if operation.action != "start":
+            affects_progress.add(activity_id)
+
+    try:
+        response = supabase.rpc("apply_activity_updates", {
+            "p_user_id": current_user.id,
+            "p_updates": list(updates.values()),
+        }).execute()
+        updated = response.data or []
         
-        if not activity_response.data:
-            raise HTTPException(status_code=404, detail="Activity not found")
+        # Recalculate progress once per affected course
+        courses = []
+        for activity in updated:
+            course_id = activity.get("course_id")
+            if course_id and str(activity.get("id")) in affects_progress and course_id not in courses:
+                courses.append(course_id)
         
-        activity = activity_response.data[0]
+        for course_id in courses:
+            await calculate_course_progress(current_user.id, course_id)
         
-        # Update activity status and score
-        update_data = {
-            "status": "completed",
-            "updated_at": "now()"
+        updated_ids = {str(activity.get("id")) for activity in updated}
+        return {
+            "activities": updated,
+            "not_found": [activity_id for activity_id in updates if activity_id not in updated_ids],
+            "recalculated_courses": courses
         }
-        
-        # Add score if provided
-        if "score" in data:
-            update_data["score"] = data["score"]
-        
-        response = supabase.table("activities") \
-            .update(update_data) \
-            .eq("id", str(activity_id)) \
-            .execute()
-        
-        if not response.data:
-            raise HTTPException(status_code=400, detail="Error completing activity")
-        
-        # Trigger progress calculation if course_id is available
-        if activity.get("course_id"):
-            # This would normally call a database function or trigger
-            # For now, we'll manually recalculate progress
-            await calculate_course_progress(current_user.id, activity.get("course_id"))
-        
-        return response.data[0]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error completing activity: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error updating activities: {str(e)}")
+
+
+async def complete_user_activity(user_id: str, activity_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Mark an activity of the user as completed, with extra fields (score), and recalculate course progress
+    """
+    # Check if activity exists and belongs to user
+    activity_response = supabase.table("activities") \
+        .select("id, course_id") \
+        .eq("id", activity_id) \
+        .eq("user_id", user_id) \
+        .execute()
+    
+    if not activity_response.data:
+        raise HTTPException(status_code=404, detail="Activity not found")
+    
+    activity = activity_response.data[0]
+    
+    # Update activity status and score; last_completed_at also dates a new completion
+    # of a completed activity, which reschedules its review (migration 17)
+    update_data = {
+        "status": "completed",
+        "last_completed_at": "now()",
+        "updated_at": "now()",
+        **fields
+    }
+    
+    response = supabase.table("activities") \
+        .update(update_data) \
+        .eq("id", activity_id) \
+        .execute()
+    
+    if not response.data:
+        raise HTTPException(status_code=400, detail="Error completing activity")
+    
+    # Trigger progress calculation if course_id is available
+    if activity.get("course_id"):
+        # This would normally call a database function or trigger
+        # For now, we'll manually recalculate progress
+        await calculate_course_progress(user_id, activity.get("course_id"))
+    
+    return response.data[0]
 
 
 async def calculate_course_progress(user_id: str, course_id: str) -> None:
     """
     Calculate and update course progress
     This would normally be a database function or trigger
+
+    The study time counts the measured duration of each completed activity, or
+    the user's estimate for its type when it was not measured.
     """
     try:
-        # Get all activities for this course and user
+        # Get all activities for this course and user (weights come from the cache)
         activities_response = supabase.table("activities") \
-            .select("*, activity_types(*)") \
+            .select("status, score, activity_type_id, started_at, completed_at") \
             .eq("user_id", user_id) \
             .eq("course_id", course_id) \
             .execute()
@@ -150,12 +220,16 @@ async def calculate_course_progress(user_id: str, course_id: str) -> None:
         if not activities_response.data:
             return
         
-        activities = activities_response.data
+        activities = await attach_activity_types(activities_response.data)
         
         # Calculate progress
         total_activities = len(activities)
         completed_activities = sum(1 for a in activities if a.get("status") == "completed")
-        total_time = sum(a.get("activity_types", {}).get("weight", 1) * 30 for a in activities if a.get("status") == "completed")
+        durations = await duration_estimator.for_user(user_id)
+        total_time = round(sum(
+            measured_minutes(a) or durations.minutes(a.get("activity_type_id"), a.get("activity_types", {}).get("weight", 1) * 30)
+            for a in activities if a.get("status") == "completed"
+        ))
         
         # Calculate weighted progress based on activity weights
         total_weight = sum(a.get("activity_types", {}).get("weight", 1) for a in activities)
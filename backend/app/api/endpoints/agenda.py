@@ -1,11 +1,21 @@
-from typing import Any, Dict, List
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from datetime import date, datetime, timedelta
 from uuid import UUID
 
-from app.api.models.pydantic_models import DailyLog, DailyLogCreate, DailyLogUpdate, DailyRecommendation
+from app.api.models.pydantic_models import DailyLog, DailyLogCreate, DailyLogUpdate, DailyRecommendation, JReminder, StudyHeartbeat, StudyStatsGranularity, StudyStatsPeriod
+from app.api.services.activity_durations import duration_estimator
 from app.api.services.auth import get_current_active_user
-from app.api.services.supabase import supabase
+from app.api.services.daily_log_buffer import daily_log_buffer
+from app.api.services.exam_reminders import fetch_user_reminders
+from app.api.services.reference_data import attach_activity_types, course_catalog
+from app.api.services.study_planner import DEFAULT_ACTIVITY_MINUTES, WeeklyPlanner, week_start
+from app.api.services.study_stats import MAX_STATS_PERIODS, fetch_study_stats, period_count, period_start
+from app.api.services.supabase import fetch_rows, supabase
+from app.core.config import settings
+from app.core.events import event_bus
+from app.core.singleflight import SingleFlight
 
 router = APIRouter()
 
@@ -30,11 +40,38 @@ async def get_daily_logs(
         
         response = query.order("date").execute()
         
+        # Include the heartbeat increments not written yet
+        pending = daily_log_buffer.pending_for(current_user.id)
+        for log in response.data:
+            increment = pending.get(log.get("date"))
+            if increment:
+                log["sessions_completed"] = log.get("sessions_completed", 0) + increment["sessions_completed"]
+                log["total_time"] = log.get("total_time", 0) + increment["total_time"]
+        
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving daily logs: {str(e)}")
 
 
+@router.post("/agenda/heartbeat", response_model=Dict[str, Any], status_code=202)
+async def record_study_heartbeat(
+    heartbeat: StudyHeartbeat,
+    current_user: Any = Depends(get_current_active_user),
+) -> Any:
+    """
+    Add study time and completed sessions to a daily log (today by default)
+
+    Increments are summed in memory and written in batches every
+    DAILY_LOG_FLUSH_INTERVAL seconds, creating the daily log if needed.
+    """
+    day = heartbeat.date or date.today()
+    pending = daily_log_buffer.add(current_user.id, day, heartbeat.sessions_completed, heartbeat.total_time)
+    return {
+        "date": day.isoformat(),
+        "pending": pending
+    }
+
+
 @router.post("/agenda/daily-logs", response_model=DailyLog)
 async def create_daily_log(
     log_in: DailyLogCreate,
@@ -109,6 +146,87 @@ async def update_daily_log(
         raise HTTPException(status_code=500, detail=f"Error updating daily log: {str(e)}")
 
 
+@router.get("/agenda/stats", response_model=List[StudyStatsPeriod])
+async def get_study_stats(
+    granularity: StudyStatsGranularity = "week",
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    current_user: Any = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get study totals per week or month (the last 12 periods by default)
+
+    Totals are read from rollups maintained when daily logs change (migration 19),
+    so a year of history is a few dozen rows.
+    """
+    to_date = to_date or date.today()
+    if from_date is None:
+        from_date = period_start(to_date, granularity)
+        for _ in range(11):
+            from_date = period_start(from_date - timedelta(days=1), granularity)
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    if period_count(from_date, to_date, granularity) > MAX_STATS_PERIODS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_STATS_PERIODS} periods can be requested")
+
+    try:
+        return await fetch_study_stats(current_user.id, granularity, from_date, to_date)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving study stats: {str(e)}")
+
+
+@router.get("/agenda/reviews", response_model=List[Dict[str, Any]])
+async def get_due_reviews(
+    until: date = None,
+    limit: int = Query(50, ge=1, le=500),
+    current_user: Any = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get the reviews due up to a date (today by default), earliest first
+
+    Reviews are scheduled by spaced repetition (SM-2) each time an activity or
+    a quiz gets a score (migration 17).
+    """
+    try:
+        reviews = await fetch_due_reviews(current_user.id, until or date.today(), limit)
+        for review in reviews:
+            course = await course_catalog.aget(review.get("course_id"))
+            review["course_name"] = course["name"] if course else None
+        return reviews
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving reviews: {str(e)}")
+
+
+async def fetch_due_reviews(user_id: str, until: date, limit: int) -> List[Dict[str, Any]]:
+    """
+    Reviews of a user due up to a date, with their activity (range read on idx_review_items_user_due_date)
+    """
+    reviews = await fetch_rows(
+        supabase.table("review_items")
+        .select("*, activities(*, chapters(*))")
+        .eq("user_id", user_id)
+        .lte("due_date", until.isoformat())
+        .order("due_date")
+        .limit(limit)
+    )
+    await attach_activity_types(review["activities"] for review in reviews if review.get("activities"))
+    return reviews
+
+
+@router.get("/agenda/reminders", response_model=List[JReminder])
+async def get_exam_reminders(current_user: Any = Depends(get_current_active_user)) -> Any:
+    """
+    Get the J-7, J-3 and J-1 reminders of the user's exams, next reminder first
+
+    Reminder dates are computed when an exam date is set (migration 18) and
+    sent by the daily reminders job.
+    """
+    try:
+        return await fetch_user_reminders(current_user.id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving exam reminders: {str(e)}")
+
+
 @router.get("/agenda/recommendations", response_model=Dict[str, Any])
 async def get_daily_recommendations(
     target_date: date = None,
@@ -122,177 +240,243 @@ async def get_daily_recommendations(
         if not target_date:
             target_date = date.today()
         
-        # Check if recommendations exist for this date
-        recommendations_response = supabase.table("daily_recommendations") \
-            .select("*") \
-            .eq("user_id", current_user.id) \
-            .eq("date", target_date.isoformat()) \
-            .execute()
-        
-        # If recommendations exist, return them
-        if recommendations_response.data:
-            return recommendations_response.data[0]
-        
-        # Otherwise, generate new recommendations
-        new_recommendations = await generate_recommendations(current_user.id, target_date)
-        
-        return new_recommendations
+        return await get_or_generate_recommendations(current_user.id, target_date)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving recommendations: {str(e)}")
 
 
-async def generate_recommendations(user_id: str, target_date: date) -> Dict[str, Any]:
+# Concurrent requests for the same (user, date) share one lookup and generation
+recommendation_flight = SingleFlight()
+
+
+async def get_or_generate_recommendations(
+    user_id: str,
+    target_date: date,
+    profile: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
     """
-    Generate recommendations for a user on a specific date
-    This is a placeholder for the actual recommendation algorithm
+    Return the stored recommendations for a date, generating them if missing
     """
-    try:
-        # Get user profile for time goals
-        profile_response = supabase.table("user_profiles") \
-            .select("*") \
-            .eq("id", user_id) \
-            .execute()
-        
-        if not profile_response.data:
-            raise HTTPException(status_code=404, detail="User profile not found")
-        
-        profile = profile_response.data[0]
-        daily_time_goal = profile.get("daily_time_goal", 60)  # Default 60 minutes
+    async def load_or_generate() -> Dict[str, Any]:
+        # Check if recommendations exist for this date (in a thread: other callers can join meanwhile)
+        existing = await fetch_rows(
+            supabase.table("daily_recommendations")
+            .select("*")
+            .eq("user_id", user_id)
+            .eq("date", target_date.isoformat())
+        )
+        
+        # If recommendations exist, return them (planned again if the week went differently)
+        if existing:
+            return await replan_if_diverged(user_id, existing[0], profile=profile)
         
-        # Get user courses with progress
-        courses_response = supabase.table("user_courses") \
-            .select("*, courses(*), user_course_progress(*)") \
-            .eq("user_id", user_id) \
-            .execute()
-        
-        if not courses_response.data:
-            # No courses, return empty recommendations
-            empty_recommendations = {
-                "user_id": user_id,
-                "date": target_date.isoformat(),
-                "recommended_activities": {
-                    "courses": [],
-                    "total_time": 0,
-                    "message": "No courses available for recommendations"
-                }
-            }
+        # Otherwise, generate new recommendations
+        return await generate_recommendations(user_id, target_date, profile=profile)
+    
+    return await recommendation_flight.do((user_id, target_date.isoformat()), load_or_generate)
+
+
+# Users whose weekly plan was compared with their logs today (per worker)
+_replan_checked: Dict[date, set] = {}
+
+
+async def replan_if_diverged(
+    user_id: str,
+    recommendation: Dict[str, Any],
+    profile: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Plan the rest of the week again when the time logged on a past day differs from its plan
+
+    Checked once a day per user: the stored recommendation is returned unchanged
+    unless a day differs by more than STUDY_PLAN_REPLAN_TOLERANCE minutes.
+    """
+    today = date.today()
+    target_date = datetime.strptime(str(recommendation["date"])[:10], "%Y-%m-%d").date()
+    if target_date < today or week_start(target_date) != week_start(today):
+        return recommendation
+    
+    checked = _replan_checked.setdefault(today, set())
+    for day in [day for day in _replan_checked if day != today]:
+        del _replan_checked[day]
+    if user_id in checked:
+        return recommendation
+    
+    planned_time = (recommendation.get("recommended_activities") or {}).get("planned_time")
+    if planned_time is None:
+        # Recommendations of a single day, from before the weekly planning
+        checked.add(user_id)
+        return await generate_recommendations(user_id, target_date, profile=profile)
+    
+    past_days = sorted(day for day in planned_time if day < today.isoformat())
+    if past_days:
+        logs = await fetch_rows(
+            supabase.table("daily_logs")
+            .select("date, total_time")
+            .eq("user_id", user_id)
+            .gte("date", past_days[0])
+            .lt("date", today.isoformat())
+        )
+        logged = {log["date"]: log.get("total_time") or 0 for log in logs}
+        for day, increment in daily_log_buffer.pending_for(user_id).items():
+            logged[day] = logged.get(day, 0) + increment["total_time"]
+        
+        checked.add(user_id)
+        if any(
+            abs(logged.get(day, 0) - planned_time[day]) > settings.STUDY_PLAN_REPLAN_TOLERANCE
+            for day in past_days
+        ):
+            return await generate_recommendations(user_id, target_date, profile=profile)
+    
+    checked.add(user_id)
+    return recommendation
+
+
+async def generate_recommendations(
+    user_id: str,
+    target_date: date,
+    profile: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Plan the week of a date and store the recommendations of each planned day
+
+    The days from today (or from the Monday of a later week) to Sunday are
+    planned at once by WeeklyPlanner, from the user's availability, the weekly
+    time goal minus the time already studied this week, the daily time goal and
+    the exam dates; one upsert writes them all. Past dates are planned alone.
+    Activity durations are the user's learned estimates (activity_durations),
+    and the reviews due by the end of the plan are planned from their due date.
+
+    The user profile is fetched unless already loaded by the caller (e.g. /dashboard)
+    """
+    try:
+        if profile is None:
+            # Get user profile for availability and time goals
+            profile_response = supabase.table("user_profiles") \
+                .select("*") \
+                .eq("id", user_id) \
+                .execute()
             
-            # Save empty recommendations
-            supabase.table("daily_recommendations").insert(empty_recommendations).execute()
+            if not profile_response.data:
+                raise HTTPException(status_code=404, detail="User profile not found")
             
-            return empty_recommendations
-        
-        # Sort courses by priority (exam date, progress)
-        courses = courses_response.data
+            profile = profile_response.data[0]
+        daily_time_goal = profile.get("daily_time_goal") or 60  # Default 60 minutes
+        weekly_time_goal = profile.get("weekly_time_goal") or 300  # Default 5 hours
         
-        # Prioritize courses with upcoming exams
         today = date.today()
-        prioritized_courses = []
-        
-        for course in courses:
-            exam_date = course.get("exam_date")
-            if exam_date:
-                # Convert string to date if needed
-                if isinstance(exam_date, str):
-                    exam_date = datetime.strptime(exam_date, "%Y-%m-%d").date()
-                
-                days_until_exam = (exam_date - today).days
-                
-                # Higher priority for closer exams
-                if days_until_exam <= 7:
-                    priority = 3
-                elif days_until_exam <= 30:
-                    priority = 2
-                else:
-                    priority = 1
-            else:
-                priority = 0
-            
-            # Get progress
-            progress = 0
-            if course.get("user_course_progress") and course["user_course_progress"]:
-                progress = course["user_course_progress"][0].get("progression_rate", 0)
-            
-            # Lower progress gets higher priority
-            progress_priority = 100 - progress if progress else 100
-            
-            prioritized_courses.append({
-                "course": course,
-                "priority": priority,
-                "progress_priority": progress_priority,
-                "total_priority": priority * 100 + progress_priority  # Combined priority score
-            })
-        
-        # Sort by total priority (higher is more important)
-        prioritized_courses.sort(key=lambda x: x["total_priority"], reverse=True)
-        
-        # Get activities for top 3 courses
-        top_courses = prioritized_courses[:3]
-        recommended_activities = []
-        
-        for course_item in top_courses:
-            course = course_item["course"]
-            
-            # Get incomplete activities for this course
-            activities_response = supabase.table("activities") \
-                .select("*, activity_types(*), chapters(*)") \
-                .eq("user_id", user_id) \
-                .eq("course_id", course["courses"]["id"]) \
-                .neq("status", "completed") \
-                .execute()
+        monday = week_start(target_date)
+        if target_date < today:
+            first_day = last_day = target_date
+        else:
+            first_day, last_day = max(monday, today), monday + timedelta(days=6)
+        
+        # Get user courses with progress (course details come from the catalog cache),
+        # the time already studied this week, the estimated activity durations and the due reviews
+        courses_data, logs, durations, reviews = await asyncio.gather(
+            fetch_rows(
+                supabase.table("user_courses")
+                .select("*, user_course_progress(*)")
+                .eq("user_id", user_id)
+            ),
+            fetch_rows(
+                supabase.table("daily_logs")
+                .select("date, total_time")
+                .eq("user_id", user_id)
+                .gte("date", monday.isoformat())
+                .lt("date", first_day.isoformat())
+            ),
+            duration_estimator.for_user(user_id),
+            fetch_due_reviews(user_id, last_day, settings.STUDY_PLAN_MAX_REVIEWS),
+        )
+        if target_date < today:
+            budget = daily_time_goal
+        else:
+            budget = weekly_time_goal - sum(log.get("total_time") or 0 for log in logs)
+        
+        planner = WeeklyPlanner(first_day, last_day, profile.get("availability"), daily_time_goal, budget, today)
+        user_courses = {}
+        for user_course in courses_data:
+            course = await course_catalog.aget(user_course.get("course_id"))
+            if course:
+                user_courses[course["id"]] = (course, user_course)
+        
+        candidates = []
+        if user_courses:
+            # Incomplete activities of every course in one query
+            activities = await fetch_rows(
+                supabase.table("activities")
+                .select("*, chapters(*)")
+                .eq("user_id", user_id)
+                .in_("course_id", list(user_courses))
+                .neq("status", "completed")
+            )
+            for activity in await attach_activity_types(activities):
+                if activity.get("course_id") not in user_courses:
+                    continue
+                course, user_course = user_courses[activity["course_id"]]
+                progress = user_course.get("user_course_progress") or [{}]
+                candidates.append(planner.item(
+                    activity,
+                    course,
+                    exam_date=user_course.get("exam_date"),
+                    progression_rate=progress[0].get("progression_rate"),
+                    minutes=durations.minutes(activity.get("activity_type_id"), DEFAULT_ACTIVITY_MINUTES),
+                ))
+            candidates.sort(key=lambda item: item["value"], reverse=True)
+            candidates = candidates[:settings.STUDY_PLAN_MAX_CANDIDATES]
             
-            if activities_response.data:
-                # Sort activities by type priority
-                activities = activities_response.data
-                for activity in activities:
-                    activity_type = activity.get("activity_types", {})
-                    is_required = activity_type.get("is_required", False)
-                    weight = activity_type.get("weight", 1.0)
-                    
-                    # Higher priority for required activities and higher weight
-                    activity_priority = (2 if is_required else 1) * weight
-                    
-                    recommended_activities.append({
-                        "activity": activity,
-                        "course": course["courses"],
-                        "priority": activity_priority
-                    })
-        
-        # Sort activities by priority
-        recommended_activities.sort(key=lambda x: x["priority"], reverse=True)
-        
-        # Limit activities to fit daily time goal (assuming 30 min per activity)
-        time_per_activity = 30  # minutes
-        max_activities = daily_time_goal // time_per_activity
-        
-        final_activities = recommended_activities[:max_activities]
-        total_time = len(final_activities) * time_per_activity
-        
-        # Format recommendations
-        recommendations = {
-            "user_id": user_id,
-            "date": target_date.isoformat(),
-            "recommended_activities": {
-                "activities": [
-                    {
-                        "id": item["activity"]["id"],
-                        "type": item["activity"]["activity_types"]["name"],
-                        "course_name": item["course"]["name"],
-                        "chapter_title": item["activity"]["chapters"]["title"] if item["activity"].get("chapters") else None,
-                        "estimated_time": time_per_activity,
-                        "priority": item["priority"]
-                    }
-                    for item in final_activities
-                ],
-                "total_time": total_time,
-                "message": f"Here are your recommended activities for {target_date.isoformat()}"
+            for review in reviews:
+                if review.get("course_id") not in user_courses:
+                    continue
+                course, user_course = user_courses[review["course_id"]]
+                # A quiz review has no activity of its own
+                activity = review.get("activities") or {
+                    "id": review["id"],
+                    "activity_types": {"name": "quiz", "weight": 1.0, "is_required": False},
+                }
+                candidates.append(planner.item(
+                    activity,
+                    course,
+                    exam_date=user_course.get("exam_date"),
+                    minutes=durations.minutes(activity.get("activity_type_id"), DEFAULT_ACTIVITY_MINUTES),
+                    review=review,
+                ))
+        
+        plan = planner.solve(candidates)
+        planned_time = {day.isoformat(): day_plan["total_time"] for day, day_plan in plan.items()}
+        if not user_courses:
+            message = "No courses available for recommendations"
+        else:
+            message = "Here are your recommended activities for {day}"
+        
+        rows = [
+            {
+                "user_id": user_id,
+                "date": day.isoformat(),
+                "recommended_activities": {
+                    **day_plan,
+                    "message": message.format(day=day.isoformat()),
+                    "week_start": monday.isoformat(),
+                    "planned_on": today.isoformat(),
+                    # Planned minutes of every day of the plan, compared with the logs to replan
+                    "planned_time": planned_time,
+                },
             }
-        }
+            for day, day_plan in plan.items()
+        ]
         
-        # Save recommendations
-        supabase.table("daily_recommendations").insert(recommendations).execute()
+        # Save the recommendations of every planned day (upsert: one row per user and date, migration 11)
+        supabase.table("daily_recommendations") \
+            .upsert(rows, on_conflict="user_id,date") \
+            .execute()
+        event_bus.publish(
+            user_id,
+            "recommendations.ready",
+            {"date": target_date.isoformat(), "dates": [row["date"] for row in rows]},
+        )
         
-        return recommendations
+        return next(row for row in rows if row["date"] == target_date.isoformat())
     except Exception as e:
         # Log error but return empty recommendations
         print(f"Error generating recommendations: {str(e)}")
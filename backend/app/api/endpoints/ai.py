@@ -0,0 +1,160 @@
+import itertools
+import math
+from typing import Any, Dict
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.api.endpoints.activities import complete_user_activity
+from app.api.models.pydantic_models import (
+    AIBatchEvaluationRequest,
+    AIBatchEvaluationResult,
+    AIInteractionRequest,
+    AIReport,
+    AIReportType,
+)
+from app.api.services.ai_batch import evaluation_batcher, item_score
+from app.api.services.ai_gateway import AIGatewayBusyError, AIGatewayUnavailableError, ai_gateway
+from app.api.services.ai_prompts import AI_BATCH_TYPES
+from app.api.services.ai_providers import AIProviderError
+from app.api.services.ai_reports import report_service
+from app.api.services.auth import get_current_active_user
+from app.core.config import settings
+from app.core.events import Event
+
+router = APIRouter()
+
+
+def _gateway_error(e: Exception) -> HTTPException:
+    if isinstance(e, AIGatewayBusyError):
+        return HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(settings.AI_QUEUE_TIMEOUT)))},
+        )
+    if isinstance(e, AIGatewayUnavailableError):
+        return HTTPException(status_code=503, detail=f"AI gateway unavailable: {str(e)}")
+    if isinstance(e, AIProviderError):
+        return HTTPException(status_code=502, detail=str(e))
+    return HTTPException(status_code=500, detail=f"Error during AI interaction: {str(e)}")
+
+
+@router.post("/ai/interact", response_model=Dict[str, Any])
+async def interact(
+    request: AIInteractionRequest,
+    current_user: Any = Depends(get_current_active_user),
+) -> Any:
+    """
+    Run an AI interaction (evaluation, feedback, planning) and return its answer
+
+    Quiz and concept card evaluations of an activity arriving together are
+    graded by one grouped request (see POST /ai/evaluate/batch).
+    """
+    try:
+        if request.type in AI_BATCH_TYPES and request.activity_id and isinstance(request.content, dict):
+            return await evaluation_batcher.submit(
+                current_user.id, request.type, request.content, request.activity_id, request.chapter_id
+            )
+        return await ai_gateway.interact(
+            current_user.id, request.type, request.content, request.activity_id, request.chapter_id
+        )
+    except Exception as e:
+        raise _gateway_error(e)
+
+
+@router.post("/ai/interact/stream")
+async def interact_stream(
+    request: AIInteractionRequest,
+    current_user: Any = Depends(get_current_active_user),
+) -> StreamingResponse:
+    """
+    Run an AI interaction, streaming the model output (server-sent events)
+
+    Events: `delta` ({"text"}) while the answer is produced, then `result` (same
+    payload as POST /ai/interact) or `error` ({"status", "detail"}).
+    """
+    async def event_stream():
+        ids = itertools.count(1)
+        try:
+            async for name, data in ai_gateway.stream(
+                current_user.id, request.type, request.content, request.activity_id, request.chapter_id
+            ):
+                payload = {"text": data} if name == "delta" else data
+                yield Event(next(ids), name, payload).encode()
+        except Exception as e:
+            error = _gateway_error(e)
+            yield Event(next(ids), "error", {"status": error.status_code, "detail": error.detail}).encode()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Disable response buffering in nginx
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.post("/ai/evaluate/batch", response_model=AIBatchEvaluationResult)
+async def evaluate_batch(
+    request: AIBatchEvaluationRequest,
+    current_user: Any = Depends(get_current_active_user),
+) -> Any:
+    """
+    Grade the quiz answers or concept cards of an activity with grouped AI requests
+
+    Items are sent AI_BATCH_MAX_ITEMS at a time; those the grouped answer does
+    not cover are graded one by one. With `complete`, the activity is completed
+    with the average score (percent) of the valid evaluations, as by
+    POST /activities/{activity_id}/complete.
+    """
+    if len({item.id for item in request.items}) != len(request.items):
+        raise HTTPException(status_code=400, detail="Item ids must be unique")
+    if request.complete:
+        try:
+            UUID(request.activity_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid activity id")
+
+    try:
+        results = await evaluation_batcher.evaluate(
+            current_user.id,
+            request.type,
+            [(item.id, item.content) for item in request.items],
+            request.activity_id,
+            request.chapter_id,
+        )
+    except Exception as e:
+        raise _gateway_error(e)
+
+    scores = [item_score(request.type, response["result"]) for response in results.values() if response["valid"]]
+    score = round(sum(scores) / len(scores), 2) if scores else None
+    activity = None
+    if request.complete and score is not None:
+        try:
+            activity = await complete_user_activity(current_user.id, request.activity_id, {"score": score})
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error completing activity: {str(e)}")
+    return {"results": results, "score": score, "activity": activity}
+
+
+@router.get("/ai/reports/{report_type}", response_model=AIReport)
+async def get_report(
+    report_type: AIReportType,
+    current_user: Any = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get the precomputed study plan or progress report of the current user
+
+    The stored report is returned at once; when its inputs changed, it is
+    returned with `stale` and regenerated in the background (event
+    `report.ready`). Only the very first request waits for the generation.
+    """
+    try:
+        return await report_service.get(current_user.id, report_type)
+    except Exception as e:
+        raise _gateway_error(e)
@@ -1,62 +1,142 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any, Optional, List
 from app.services.chapter_service import extract_chapter_content, extract_all_course_chapters
-from app.models.chapter import ChapterExtractRequest, ChapterExtractAllRequest
+from app.services.chapter_upload_service import ChapterNotFoundError, create_chapter_upload, finalize_chapter_upload
+from app.models.chapter import ChapterExtractRequest, ChapterExtractAllRequest, ChapterUploadRequest, ChapterUploadFinalizeRequest
+from app.core.lifespan import work_tracker, ShuttingDownError
+from app.core.events import event_bus
+from app.api.services.auth import get_current_active_user, get_optional_user
 
 router = APIRouter(prefix="/chapters")
 
 @router.post("/extract")
 async def extract_chapter(
-    request: ChapterExtractRequest
+    request: ChapterExtractRequest,
+    current_user: Any = Depends(get_optional_user)
 ) -> Dict[str, Any]:
     """
     Extrait le contenu d'un chapitre spécifique et le convertit en JSON
     """
     try:
-        result = await extract_chapter_content(request.chapter_id)
+        async with work_tracker.track("extraction"):
+            result = await extract_chapter_content(request.chapter_id)
+        if current_user:
+            event_bus.publish(current_user.id, "extraction.completed", {
+                "chapter_id": request.chapter_id,
+                "success": result.get("type") != "error"
+            })
         return {
             "success": True,
             "chapter_id": request.chapter_id,
             "json_data": result
         }
+    except ShuttingDownError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'extraction du contenu: {str(e)}")
 
+async def _extract_all_and_notify(course_id: str, user_id: Optional[str]) -> int:
+    """
+    Extraction de tous les chapitres d'un cours, avec progression envoyée sur GET /events
+    """
+    def on_progress(chapter_id: str, processed: int, total: int, succeeded: bool) -> None:
+        event_bus.publish(user_id, "extraction.progress", {
+            "course_id": course_id,
+            "chapter_id": chapter_id,
+            "processed": processed,
+            "total": total,
+            "success": succeeded
+        })
+    
+    try:
+        processed_count = await extract_all_course_chapters(course_id, on_progress=on_progress)
+    except Exception as e:
+        event_bus.publish(user_id, "extraction.failed", {"course_id": course_id, "error": str(e)})
+        raise
+    event_bus.publish(user_id, "extraction.completed", {"course_id": course_id, "processed_count": processed_count})
+    return processed_count
+
 @router.post("/extract-all")
 async def extract_all_chapters(
     request: ChapterExtractAllRequest,
-    background_tasks: BackgroundTasks
+    current_user: Any = Depends(get_optional_user)
 ) -> Dict[str, Any]:
     """
     Extrait le contenu de tous les chapitres d'un cours
     """
     try:
         # Lancer l'extraction en arrière-plan pour éviter les timeouts
-        background_tasks.add_task(extract_all_course_chapters, request.course_id)
+        # (suivie par le lifespan pour être terminée avant l'arrêt du worker)
+        user_id = current_user.id if current_user else None
+        work_tracker.spawn("extraction", _extract_all_and_notify(request.course_id, user_id))
         
         return {
             "success": True,
             "course_id": request.course_id,
             "processed_count": 0,  # Le traitement est en arrière-plan, donc 0 pour l'instant
-            "message": "Extraction lancée en arrière-plan. Les résultats seront disponibles dans quelques instants."
+            "message": "Extraction lancée en arrière-plan. La progression est envoyée sur GET /events."
         }
+    except ShuttingDownError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'extraction du contenu: {str(e)}")
 
-@router.post("/upload")
-async def upload_chapter_file(
-    file: UploadFile = File(...),
-    chapter_id: str = Form(...)
+@router.post("/upload-url")
+async def create_upload_url(
+    request: ChapterUploadRequest,
+    current_user: Any = Depends(get_current_active_user)
 ) -> Dict[str, Any]:
     """
-    Télécharge un fichier et l'associe à un chapitre
+    Délivre une URL signée pour envoyer un fichier de chapitre directement à Storage
     """
     try:
-        # Logique d'upload à implémenter
+        return create_chapter_upload(request.chapter_id, request.filename, request.size, current_user.id)
+    except ChapterNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la création de l'URL d'upload: {str(e)}")
+
+async def _extract_and_notify(chapter_id: str, user_id: Optional[str]) -> None:
+    """
+    Extraction d'un chapitre en arrière-plan, avec le résultat envoyé sur GET /events
+    """
+    result = await extract_chapter_content(chapter_id)
+    event_bus.publish(user_id, "extraction.completed", {
+        "chapter_id": chapter_id,
+        "success": result.get("type") != "error"
+    })
+
+@router.post("/upload/finalize")
+async def finalize_upload(
+    request: ChapterUploadFinalizeRequest,
+    current_user: Any = Depends(get_current_active_user)
+) -> Dict[str, Any]:
+    """
+    Associe au chapitre le fichier envoyé à Storage et lance son extraction
+    """
+    try:
+        chapter = finalize_chapter_upload(request.chapter_id, request.file_path, current_user.id, request.sha256)
+        
+        extraction_started = False
+        if request.extract:
+            work_tracker.spawn("extraction", _extract_and_notify(request.chapter_id, current_user.id))
+            extraction_started = True
+        
         return {
             "success": True,
-            "chapter_id": chapter_id,
-            "filename": file.filename
+            "chapter_id": request.chapter_id,
+            "file_path": chapter.get("file_path"),
+            "file_size": chapter.get("file_size"),
+            "file_hash": chapter.get("file_hash"),
+            "extraction_started": extraction_started
         }
+    except ChapterNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ShuttingDownError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur lors de l'upload du fichier: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la finalisation de l'upload: {str(e)}")
@@ -4,6 +4,7 @@ from uuid import UUID
 
 from app.api.models.pydantic_models import Course, CourseCreate, CourseUpdate, UserCourse, UserCourseCreate
 from app.api.services.auth import get_current_active_user
+from app.api.services.reference_data import course_catalog
 from app.api.services.supabase import supabase
 
 router = APIRouter()
@@ -17,8 +18,7 @@ async def get_courses(
     Get all courses
     """
     try:
-        response = supabase.table("courses").select("*").execute()
-        return response.data
+        return await course_catalog.aall()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving courses: {str(e)}")
 
@@ -37,6 +37,8 @@ async def create_course(
         if not response.data:
             raise HTTPException(status_code=400, detail="Error creating course")
         
+        course_catalog.upsert(response.data[0])
+        
         return response.data[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating course: {str(e)}")
@@ -51,12 +53,12 @@ async def get_course(
     Get a specific course by id
     """
     try:
-        response = supabase.table("courses").select("*").eq("id", str(course_id)).execute()
+        course = await course_catalog.aget(course_id)
         
-        if not response.data:
+        if not course:
             raise HTTPException(status_code=404, detail="Course not found")
         
-        return response.data[0]
+        return course
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving course: {str(e)}")
 
@@ -82,6 +84,8 @@ async def update_course(
         if not response.data:
             raise HTTPException(status_code=404, detail="Course not found")
         
+        course_catalog.upsert(response.data[0])
+        
         return response.data[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating course: {str(e)}")
@@ -104,6 +108,8 @@ async def delete_course(
         if not response.data:
             raise HTTPException(status_code=404, detail="Course not found")
         
+        course_catalog.remove(course_id)
+        
         return course
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting course: {str(e)}")
@@ -133,9 +139,7 @@ async def create_user_course(
     """
     try:
         # Check if course exists
-        course_response = supabase.table("courses").select("*").eq("id", str(course_in.course_id)).execute()
-        
-        if not course_response.data:
+        if not await course_catalog.aget(course_in.course_id):
             raise HTTPException(status_code=404, detail="Course not found")
         
         # Create user_course with user_id
@@ -0,0 +1,149 @@
+import asyncio
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.api.endpoints.agenda import get_or_generate_recommendations, replan_if_diverged
+from app.api.endpoints.parcours import format_parcours_entry
+from app.api.endpoints.profile import format_course_progress
+from app.api.services.auth import get_current_active_user
+from app.api.services.reference_data import course_catalog
+from app.api.services.supabase import fetch_rows, supabase
+
+router = APIRouter()
+
+DASHBOARD_SECTIONS = ("profile", "course_progress", "parcours", "recommendations", "daily_logs")
+
+
+def _parse_sections(sections: Optional[str]) -> List[str]:
+    if not sections:
+        return list(DASHBOARD_SECTIONS)
+    requested = [section.strip() for section in sections.split(",") if section.strip()]
+    unknown = [section for section in requested if section not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown dashboard section(s): {', '.join(unknown)}. Available: {', '.join(DASHBOARD_SECTIONS)}"
+        )
+    return requested
+
+
+@router.get("/dashboard", response_model=Dict[str, Any])
+async def get_dashboard(
+    sections: Optional[str] = Query(None, description="Comma-separated sections, all by default"),
+    days: int = Query(7, ge=1, le=90, description="Number of days of daily logs"),
+    current_user: Any = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get everything the home screen needs in one call
+
+    Replaces /profile, /profile/course-progress, /parcours and /agenda/recommendations:
+    the user is authenticated once and the underlying tables are queried concurrently,
+    each at most once. A failing section is reported in `errors` without failing the others.
+    """
+    requested = _parse_sections(sections)
+    user_id = current_user.id
+    today = date.today()
+
+    # Shared lookups, each fetched once for all the sections that need them
+    queries = {}
+    if "profile" in requested:
+        queries["profile"] = supabase.table("user_profiles").select("*").eq("id", user_id)
+    if "course_progress" in requested or "parcours" in requested:
+        queries["progress"] = supabase.table("user_course_progress").select("*").eq("user_id", user_id)
+    if "course_progress" in requested:
+        queries["steps"] = supabase.table("course_steps") \
+            .select("course_id, step_key") \
+            .eq("user_id", user_id) \
+            .eq("completed", True)
+        queries["quizzes"] = supabase.table("quiz_results") \
+            .select("course_id, quiz_number, score") \
+            .eq("user_id", user_id)
+    if "recommendations" in requested:
+        queries["recommendations"] = supabase.table("daily_recommendations") \
+            .select("*") \
+            .eq("user_id", user_id) \
+            .eq("date", today.isoformat())
+    if "daily_logs" in requested:
+        queries["daily_logs"] = supabase.table("daily_logs") \
+            .select("*") \
+            .eq("user_id", user_id) \
+            .gte("date", (today - timedelta(days=days - 1)).isoformat()) \
+            .lte("date", today.isoformat()) \
+            .order("date")
+
+    results = await asyncio.gather(*(fetch_rows(query) for query in queries.values()), return_exceptions=True)
+    data = dict(zip(queries, results))
+
+    dashboard: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+
+    def failed(section: str, *lookups: str) -> bool:
+        for lookup in lookups:
+            if isinstance(data[lookup], Exception):
+                print(f"Error retrieving dashboard {section}: {str(data[lookup])}")
+                errors[section] = f"Error retrieving {section}: {str(data[lookup])}"
+                return True
+        return False
+
+    if "profile" in requested and not failed("profile", "profile"):
+        dashboard["profile"] = data["profile"][0] if data["profile"] else None
+
+    if "course_progress" in requested and not failed("course_progress", "progress", "steps", "quizzes"):
+        steps_by_course = defaultdict(list)
+        for step in data["steps"]:
+            steps_by_course[step.get("course_id")].append(step.get("step_key"))
+        quizzes_by_course = defaultdict(dict)
+        for quiz in data["quizzes"]:
+            quizzes_by_course[quiz.get("course_id")][f"quiz_{quiz.get('quiz_number')}"] = quiz.get("score")
+
+        dashboard["course_progress"] = [
+            format_course_progress(
+                progress,
+                await course_catalog.aget(progress.get("course_id")) or {},
+                steps_by_course[progress.get("course_id")],
+                quizzes_by_course[progress.get("course_id")],
+            )
+            for progress in data["progress"]
+        ]
+
+    if "parcours" in requested and not failed("parcours", "progress"):
+        try:
+            if data["progress"]:
+                entries = [(progress.get("course_id"), progress) for progress in data["progress"]]
+            else:
+                # Same fallback as /parcours: enrolled courses with no progress yet
+                user_courses = await fetch_rows(
+                    supabase.table("user_courses").select("course_id, exam_date").eq("user_id", user_id)
+                )
+                entries = [
+                    (user_course.get("course_id"), {"exam_date": user_course.get("exam_date")})
+                    for user_course in user_courses
+                ]
+            parcours = []
+            for course_id, progress in entries:
+                course = await course_catalog.aget(course_id)
+                if course:
+                    parcours.append(format_parcours_entry(course, progress))
+            dashboard["parcours"] = parcours
+        except Exception as e:
+            print(f"Error retrieving dashboard parcours: {str(e)}")
+            errors["parcours"] = f"Error retrieving parcours: {str(e)}"
+
+    if "recommendations" in requested and not failed("recommendations", "recommendations"):
+        if data["recommendations"]:
+            dashboard["recommendations"] = await replan_if_diverged(
+                user_id, data["recommendations"][0], profile=dashboard.get("profile")
+            )
+        else:
+            dashboard["recommendations"] = await get_or_generate_recommendations(
+                user_id, today, profile=dashboard.get("profile")
+            )
+
+    if "daily_logs" in requested and not failed("daily_logs", "daily_logs"):
+        dashboard["daily_logs"] = data["daily_logs"]
+
+    dashboard["errors"] = errors
+    return dashboard
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
 from fastapi.responses import Response
-from typing import Optional
+from typing import Any, Optional
 import logging
 
 from ..services.document_converter import DocumentConverter
+from ...core.lifespan import work_tracker, ShuttingDownError
+from ...core.events import event_bus
+from ..services.auth import get_optional_user
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -11,6 +14,7 @@ logger = logging.getLogger(__name__)
 @router.post("/convert-to-pdf")
 async def convert_document_to_pdf(
     file: UploadFile = File(...),
+    current_user: Any = Depends(get_optional_user),
 ) -> Response:
     """
     Convertit un document (Word, PowerPoint, etc.) en PDF.
@@ -21,11 +25,19 @@ async def convert_document_to_pdf(
     Returns:
         Le fichier PDF converti
     """
+    user_id = current_user.id if current_user else None
     try:
         logger.info(f"Tentative de conversion du fichier: {file.filename}")
         
-        # Convertir le fichier en PDF
-        filename, pdf_content = await DocumentConverter.convert_to_pdf(file)
+        # Convertir le fichier en PDF (suivi pour être drainé à l'arrêt du worker)
+        async with work_tracker.track("conversion"):
+            filename, pdf_content = await DocumentConverter.convert_to_pdf(file)
+        
+        event_bus.publish(user_id, "conversion.completed", {
+            "source_filename": file.filename,
+            "filename": filename,
+            "size": len(pdf_content)
+        })
         
         # Retourner le PDF
         return Response(
@@ -35,8 +47,11 @@ async def convert_document_to_pdf(
                 "Content-Disposition": f"attachment; filename={filename}"
             }
         )
+    except ShuttingDownError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Erreur lors de la conversion: {str(e)}")
+        event_bus.publish(user_id, "conversion.failed", {"source_filename": file.filename, "error": str(e)})
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=f"Erreur lors de la conversion: {str(e)}")
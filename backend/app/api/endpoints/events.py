@@ -0,0 +1,56 @@
+import asyncio
+import time
+from typing import Any
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from app.api.services.auth import get_stream_user
+from app.core.config import settings
+from app.core.events import event_bus
+
+router = APIRouter()
+
+# Delay before the browser reconnects once a stream ends (milliseconds)
+RECONNECT_DELAY_MS = 2000
+
+
+@router.get("/events")
+async def stream_events(
+    request: Request,
+    current_user: Any = Depends(get_stream_user),
+) -> StreamingResponse:
+    """
+    Stream the current user's events (server-sent events)
+
+    Events: extraction.progress, extraction.completed, extraction.failed,
+    conversion.completed, conversion.failed, recommendations.ready. The stream ends after
+    EVENTS_MAX_STREAM_SECONDS; EventSource reconnects automatically.
+    """
+    async def event_stream():
+        deadline = time.monotonic() + settings.EVENTS_MAX_STREAM_SECONDS
+        async with event_bus.subscribe(str(current_user.id)) as subscription:
+            yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+            while time.monotonic() < deadline:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(),
+                        timeout=min(settings.EVENTS_KEEPALIVE_INTERVAL, max(deadline - time.monotonic(), 0)),
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comment line: keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield event.encode()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Disable response buffering in nginx
+            "X-Accel-Buffering": "no",
+        },
+    )
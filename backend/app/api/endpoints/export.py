@@ -0,0 +1,42 @@
+from datetime import date
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.api.services.auth import get_current_active_user
+from app.api.services.data_export import ExportBusyError, data_exporter
+
+router = APIRouter()
+
+
+@router.get("/export")
+async def export_user_data(current_user: Any = Depends(get_current_active_user)) -> StreamingResponse:
+    """
+    Download all of the user's study data (NDJSON, one JSON object per line)
+
+    Sections: profile, courses, chapters (metadata), course_progress,
+    chapter_progress, activities, daily_logs and quiz_results. Lines are
+    {"type": <section>, "data": <row>}, starting with an "export" header and
+    ending with an "end" line holding the row count of each section (an "error"
+    line instead if the export was interrupted).
+    """
+    try:
+        slot = data_exporter.reserve()
+    except ExportBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    filename = f"halpi-export-{date.today().isoformat()}.ndjson"
+    return StreamingResponse(
+        data_exporter.stream(current_user.id, slot),
+        media_type="application/x-ndjson",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+            # Disable response buffering in nginx
+            "X-Accel-Buffering": "no",
+        },
+        # Also releases the slot when the client leaves before the stream starts
+        background=BackgroundTask(slot.release),
+    )
@@ -4,6 +4,7 @@ from uuid import UUID
 
 from app.api.models.pydantic_models import UserCourseProgress, Chapter
 from app.api.services.auth import get_current_active_user
+from app.api.services.reference_data import attach_activity_types, course_catalog
 from app.api.services.supabase import supabase
 
 router = APIRouter()
@@ -38,18 +39,7 @@ async def get_user_parcours(
             for user_course in courses_response.data:
                 course = user_course.get("courses", {})
                 if course:
-                    result.append({
-                        "course_id": course.get("id"),
-                        "name": course.get("name"),
-                        "description": course.get("description"),
-                        "level": course.get("level"),
-                        "image_url": course.get("image_url"),
-                        "progression_rate": 0,
-                        "total_study_time": 0,
-                        "confidence_level": 0,
-                        "exam_date": user_course.get("exam_date"),
-                        "exam_grade": None
-                    })
+                    result.append(format_parcours_entry(course, {"exam_date": user_course.get("exam_date")}))
             return result
         
         # Format response to include course info and progress
@@ -57,23 +47,30 @@ async def get_user_parcours(
         for progress in progress_response.data:
             course = progress.get("courses", {})
             if course:
-                result.append({
-                    "course_id": course.get("id"),
-                    "name": course.get("name"),
-                    "description": course.get("description"),
-                    "level": course.get("level"),
-                    "image_url": course.get("image_url"),
-                    "progression_rate": progress.get("progression_rate", 0),
-                    "total_study_time": progress.get("total_study_time", 0),
-                    "confidence_level": progress.get("confidence_level", 0),
-                    "exam_date": progress.get("exam_date"),
-                    "exam_grade": progress.get("exam_grade")
-                })
+                result.append(format_parcours_entry(course, progress))
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving parcours: {str(e)}")
 
 
+def format_parcours_entry(course: Dict[str, Any], progress: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Shape a course and its progress for the frontend (also used by /dashboard)
+    """
+    return {
+        "course_id": course.get("id"),
+        "name": course.get("name"),
+        "description": course.get("description"),
+        "level": course.get("level"),
+        "image_url": course.get("image_url"),
+        "progression_rate": progress.get("progression_rate", 0),
+        "total_study_time": progress.get("total_study_time", 0),
+        "confidence_level": progress.get("confidence_level", 0),
+        "exam_date": progress.get("exam_date"),
+        "exam_grade": progress.get("exam_grade")
+    }
+
+
 @router.get("/parcours/{course_id}", response_model=Dict[str, Any])
 async def get_course_progress(
     course_id: UUID,
@@ -84,16 +81,11 @@ async def get_course_progress(
     """
     try:
         # Get course details
-        course_response = supabase.table("courses") \
-            .select("*") \
-            .eq("id", str(course_id)) \
-            .execute()
+        course = await course_catalog.aget(course_id)
         
-        if not course_response.data:
+        if not course:
             raise HTTPException(status_code=404, detail="Course not found")
         
-        course = course_response.data[0]
-        
         # Get course progress
         progress_response = supabase.table("user_course_progress") \
             .select("*") \
@@ -120,12 +112,12 @@ async def get_course_progress(
         
         # Get activities for this course and user
         activities_response = supabase.table("activities") \
-            .select("*, activity_types(*)") \
+            .select("*") \
             .eq("user_id", current_user.id) \
             .eq("course_id", str(course_id)) \
             .execute()
         
-        activities = activities_response.data
+        activities = await attach_activity_types(activities_response.data)
         
         # Organize activities by chapter
         chapter_activities = {}
@@ -96,25 +96,37 @@ async def get_user_course_progress(
                 for quiz in quiz_response.data:
                     quiz_scores[f"quiz_{quiz.get('quiz_number')}"] = quiz.get("score")
             
-            result.append({
-                "id": item.get("id"),
-                "course_id": item.get("course_id"),
-                "course_name": course.get("name"),
-                "progression_rate": item.get("progression_rate", 0),
-                "total_study_time": item.get("total_study_time", 0),
-                "confidence_level": item.get("confidence_level", 0),
-                "exam_date": item.get("exam_date"),
-                "exam_grade": item.get("exam_grade"),
-                "last_updated_at": item.get("last_updated_at"),
-                "steps_completed": steps_completed,
-                "quiz_scores": quiz_scores
-            })
+            result.append(format_course_progress(item, course, steps_completed, quiz_scores))
         
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving course progress: {str(e)}")
 
 
+def format_course_progress(
+    progress: Dict[str, Any],
+    course: Dict[str, Any],
+    steps_completed: List[str],
+    quiz_scores: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Shape a user_course_progress row for the frontend (also used by /dashboard)
+    """
+    return {
+        "id": progress.get("id"),
+        "course_id": progress.get("course_id"),
+        "course_name": course.get("name"),
+        "progression_rate": progress.get("progression_rate", 0),
+        "total_study_time": progress.get("total_study_time", 0),
+        "confidence_level": progress.get("confidence_level", 0),
+        "exam_date": progress.get("exam_date"),
+        "exam_grade": progress.get("exam_grade"),
+        "last_updated_at": progress.get("last_updated_at"),
+        "steps_completed": steps_completed,
+        "quiz_scores": quiz_scores
+    }
+
+
 @router.post("/profile/exam-feedback", response_model=Dict[str, Any])
 async def submit_exam_feedback(
     feedback_data: Dict[str, Any],
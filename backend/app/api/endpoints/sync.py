@@ -0,0 +1,155 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.api.services.auth import get_current_active_user
+from app.api.services.supabase import fetch_rows, supabase
+from app.core.config import settings
+
+router = APIRouter()
+
+# Per-user tables tracked by migrations/08_add_sync_tracking.sql
+SYNC_TABLES = (
+    "user_courses",
+    "user_course_progress",
+    "activities",
+    "daily_logs",
+    "daily_recommendations",
+    "course_steps",
+    "quiz_results",
+    "chapter_progress",
+)
+
+
+def _parse_cursor(cursor: str) -> datetime:
+    # A "+" left unencoded in the query string arrives as a space
+    value = cursor.strip().replace(" ", "+")
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid sync cursor: {cursor}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _format_cursor(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).isoformat(timespec="microseconds").replace("+00:00", "Z")
+
+
+async def _fetch_table(table: str, user_id: str, since_at: Optional[datetime]) -> List[Dict[str, Any]]:
+    """
+    Rows of a table changed since a moment (all rows without one), read in pages
+
+    PostgREST caps each response (max-rows), so rows are read SYNC_PAGE_SIZE at a
+    time in (updated_at, id) order, each page starting after the last row read.
+    """
+    rows: List[Dict[str, Any]] = []
+    last: Optional[Dict[str, Any]] = None
+    while True:
+        query = supabase.table(table).select("*").eq("user_id", user_id)
+        if since_at is not None:
+            query = query.gte("updated_at", since_at.isoformat())
+        if last is not None:
+            # postgrest-py has no or_(): the filter is added as a raw "or" parameter
+            updated_at = f'"{last["updated_at"]}"'
+            query.params = query.params.add(
+                "or", f'(updated_at.gt.{updated_at},and(updated_at.eq.{updated_at},id.gt.{last["id"]}))'
+            )
+        # One order parameter: postgrest-py adds a separate one per order() call
+        page = await fetch_rows(query.order("updated_at,id").limit(settings.SYNC_PAGE_SIZE))
+        rows.extend(page)
+        if len(page) < settings.SYNC_PAGE_SIZE:
+            return rows
+        last = page[-1]
+
+
+async def _fetch_tombstones(user_id: str, since_at: datetime, tables: List[str]) -> List[Dict[str, Any]]:
+    """
+    Deletions recorded since a moment, read in pages of SYNC_PAGE_SIZE in id order
+    """
+    tombstones: List[Dict[str, Any]] = []
+    last_id: Optional[int] = None
+    while True:
+        query = supabase.table("sync_tombstones") \
+            .select("id, table_name, row_id") \
+            .eq("user_id", user_id) \
+            .gte("deleted_at", since_at.isoformat()) \
+            .in_("table_name", tables)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = await fetch_rows(query.order("id").limit(settings.SYNC_PAGE_SIZE))
+        tombstones.extend(page)
+        if len(page) < settings.SYNC_PAGE_SIZE:
+            return tombstones
+        last_id = page[-1]["id"]
+
+
+def _parse_tables(tables: Optional[str]) -> List[str]:
+    if not tables:
+        return list(SYNC_TABLES)
+    requested = [table.strip() for table in tables.split(",") if table.strip()]
+    unknown = [table for table in requested if table not in SYNC_TABLES]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown sync table(s): {', '.join(unknown)}. Available: {', '.join(SYNC_TABLES)}"
+        )
+    return requested
+
+
+@router.get("/sync", response_model=Dict[str, Any])
+async def sync_changes(
+    since: Optional[str] = Query(None, description="Cursor returned by the previous call, omitted for a full sync"),
+    tables: Optional[str] = Query(None, description="Comma-separated tables, all by default"),
+    current_user: Any = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get the user's rows changed since a cursor
+
+    Returns the created or updated rows (`changes`) and the ids of deleted rows
+    (`deleted`) for each table, plus the cursor to send on the next call. Without
+    a cursor, or with one older than the deletion history, every row is returned
+    and `full` is true: the client must then replace its local copy.
+    Rows changed within the last SYNC_CURSOR_OVERLAP_SECONDS may be sent twice,
+    clients apply changes as upserts by id, then deletions.
+    """
+    requested = _parse_tables(tables)
+    user_id = current_user.id
+    now = datetime.now(timezone.utc)
+
+    since_at = _parse_cursor(since) if since else None
+    full = since_at is None or since_at < now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+
+    # The next cursor is taken before reading, minus the overlap: rows committed while
+    # (or shortly before) this call runs will be picked up by the next one
+    next_cursor = now - timedelta(seconds=settings.SYNC_CURSOR_OVERLAP_SECONDS)
+    if since_at is not None and since_at > next_cursor:
+        next_cursor = since_at
+
+    fetches = {table: _fetch_table(table, user_id, None if full else since_at) for table in requested}
+    if not full:
+        fetches["sync_tombstones"] = _fetch_tombstones(user_id, since_at, requested)
+
+    try:
+        results = await asyncio.gather(*fetches.values())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving changes: {str(e)}")
+    data = dict(zip(fetches, results))
+
+    deleted = defaultdict(list)
+    for tombstone in data.pop("sync_tombstones", []):
+        deleted[tombstone.get("table_name")].append(tombstone.get("row_id"))
+
+    # Unchanged tables are omitted so that an idle poll is only a few bytes
+    return {
+        "cursor": _format_cursor(next_cursor),
+        "full": full,
+        "changes": {table: rows for table, rows in data.items() if rows or full},
+        "deleted": dict(deleted),
+    }
@@ -1,5 +1,7 @@
+# Optional fields named "date" are annotated dt.date: the field name would hide the date type
+import datetime as dt
 from datetime import datetime, date, time
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Literal, Optional, Any, Union
 from uuid import UUID
 from pydantic import BaseModel, Field, EmailStr
 
@@ -175,6 +177,28 @@ class Activity(ActivityBase):
     user_id: UUID
     created_at: datetime
     updated_at: Optional[datetime] = None
+    # Set by trigger when the activity is started / completed (migration 16)
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    # Each completion, including a new completion of a completed activity (migration 17)
+    last_completed_at: Optional[datetime] = None
+
+
+# Activity batch models
+class ActivityOperation(BaseModel):
+    activity_id: UUID
+    action: Literal["start", "complete", "score"]
+    score: Optional[float] = None
+
+
+class ActivityBatchRequest(BaseModel):
+    operations: List[ActivityOperation] = Field(..., min_length=1, max_length=500)
+
+
+class ActivityBatchResult(BaseModel):
+    activities: List[Activity]
+    not_found: List[UUID] = []
+    recalculated_courses: List[UUID] = []
 
 
 # User Course Progress models
@@ -220,7 +244,7 @@ class DailyLogCreate(DailyLogBase):
 
 
 class DailyLogUpdate(DailyLogBase):
-    date: Optional[date] = None
+    date: Optional[dt.date] = None
     sessions_completed: Optional[int] = None
     total_time: Optional[int] = None
     goal_met: Optional[bool] = None
@@ -233,6 +257,24 @@ class DailyLog(DailyLogBase):
     created_at: datetime
 
 
+class StudyHeartbeat(BaseModel):
+    date: Optional[dt.date] = None
+    sessions_completed: int = Field(0, ge=0, le=100)
+    total_time: int = Field(0, ge=0, le=1440)
+
+
+StudyStatsGranularity = Literal["week", "month"]
+
+
+class StudyStatsPeriod(BaseModel):
+    period_start: date
+    period_end: date
+    sessions_completed: int = 0
+    total_time: int = 0
+    days_logged: int = 0
+    goal_met_days: int = 0
+
+
 # J Reminder models
 class JReminderBase(BaseModel):
     user_course_id: UUID
@@ -255,6 +297,11 @@ class JReminderUpdate(JReminderBase):
 class JReminder(JReminderBase):
     id: UUID
     created_at: datetime
+    exam_date: Optional[date] = None
+    next_reminder: Optional[str] = None
+    next_reminder_on: Optional[date] = None
+    last_reminder: Optional[str] = None
+    last_sent_at: Optional[datetime] = None
 
 
 # Daily Recommendation models
@@ -268,7 +315,7 @@ class DailyRecommendationCreate(DailyRecommendationBase):
 
 
 class DailyRecommendationUpdate(DailyRecommendationBase):
-    date: Optional[date] = None
+    date: Optional[dt.date] = None
     recommended_activities: Optional[Dict[str, Any]] = None
 
 
@@ -276,3 +323,57 @@ class DailyRecommendation(DailyRecommendationBase):
     id: UUID
     user_id: UUID
     created_at: datetime
+
+
+# AI gateway models
+AIInteractionType = Literal[
+    "concept_restitution",
+    "concept_identification",
+    "quiz_evaluation",
+    "note_feedback",
+    "mindmap_feedback",
+    "study_planning",
+    "progress_report",
+]
+
+
+class AIInteractionRequest(BaseModel):
+    type: AIInteractionType
+    content: Union[str, Dict[str, Any], List[Any]]
+    # Threads are reused per activity (or per user when absent)
+    activity_id: Optional[str] = None
+    # Chapter whose most relevant excerpts are added to the request
+    chapter_id: Optional[str] = None
+
+
+class AIBatchItem(BaseModel):
+    # Unique within the request; results are returned by item id
+    id: str
+    content: Dict[str, Any]
+
+
+class AIBatchEvaluationRequest(BaseModel):
+    type: Literal["quiz_evaluation", "concept_restitution"]
+    activity_id: str
+    chapter_id: Optional[str] = None
+    items: List[AIBatchItem] = Field(..., min_length=1, max_length=200)
+    # Complete the activity with the average score of the evaluated items
+    complete: bool = False
+
+
+class AIBatchEvaluationResult(BaseModel):
+    results: Dict[str, Dict[str, Any]]
+    # Average score of the valid evaluations, in percent
+    score: Optional[float] = None
+    activity: Optional[Activity] = None
+
+
+AIReportType = Literal["study_planning", "progress_report"]
+
+
+class AIReport(BaseModel):
+    report: Dict[str, Any]
+    generated_at: Optional[datetime] = None
+    valid: bool
+    # Inputs changed since generation (or plan of a previous day): a refresh is under way
+    stale: bool = False
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.api.services.supabase import fetch_rows, supabase
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+
+# Statistics maintained by trigger on each completed activity (migration 16)
+STATS_COLUMNS = "activity_type_id, samples, mean_minutes, m2, p50_minutes, p90_minutes"
+
+# Durations outside these bounds (minutes) are not measurements (activity left open, misclick)
+MIN_MEASURED_MINUTES = 1
+MAX_MEASURED_MINUTES = 240
+
+
+def measured_minutes(activity: Dict[str, Any]) -> Optional[float]:
+    """
+    Duration of a completed activity from its started_at and completed_at, when plausible
+    """
+    started_at, completed_at = activity.get("started_at"), activity.get("completed_at")
+    if not started_at or not completed_at:
+        return None
+    started_at = datetime.fromisoformat(str(started_at).replace("Z", "+00:00"))
+    completed_at = datetime.fromisoformat(str(completed_at).replace("Z", "+00:00"))
+    minutes = (completed_at - started_at).total_seconds() / 60
+    if MIN_MEASURED_MINUTES <= minutes <= MAX_MEASURED_MINUTES:
+        return minutes
+    return None
+
+
+class DurationEstimates:
+    """
+    Estimated durations of a user's activity types, in minutes
+
+    The user's median is shrunk towards a prior (the median of all users once it
+    has ACTIVITY_DURATION_MIN_SAMPLES samples, otherwise the caller's default)
+    weighted as ACTIVITY_DURATION_PRIOR_SAMPLES samples, so a few measurements
+    move the estimate without replacing it.
+    """
+
+    def __init__(self, user_stats: Dict[str, Dict[str, Any]], global_stats: Dict[str, Dict[str, Any]]) -> None:
+        self.user_stats = user_stats
+        self.global_stats = global_stats
+
+    def minutes(self, activity_type_id: Any, default: float) -> float:
+        prior = default
+        overall = self.global_stats.get(str(activity_type_id))
+        if overall and overall["samples"] >= settings.ACTIVITY_DURATION_MIN_SAMPLES:
+            prior = overall["p50_minutes"]
+
+        own = self.user_stats.get(str(activity_type_id))
+        if not own or not own["samples"]:
+            return prior
+        weight = settings.ACTIVITY_DURATION_PRIOR_SAMPLES
+        return (own["samples"] * own["p50_minutes"] + weight * prior) / (own["samples"] + weight)
+
+
+class DurationEstimator:
+    """
+    Loads duration statistics: one query for a user's types, all users' statistics cached
+    """
+
+    def __init__(self) -> None:
+        self._global: Dict[str, Dict[str, Any]] = {}
+        self._global_loaded_at: Optional[float] = None
+        self._flight = SingleFlight()
+
+    async def _global_stats(self) -> Dict[str, Dict[str, Any]]:
+        if (
+            self._global_loaded_at is not None
+            and time.monotonic() - self._global_loaded_at < settings.ACTIVITY_DURATION_GLOBAL_TTL
+        ):
+            return self._global
+
+        async def load() -> Dict[str, Dict[str, Any]]:
+            rows = await fetch_rows(supabase.table("activity_duration_stats").select(STATS_COLUMNS).is_("user_id", "null"))
+            self._global = {str(row["activity_type_id"]): row for row in rows}
+            self._global_loaded_at = time.monotonic()
+            return self._global
+
+        return await self._flight.do("global", load)
+
+    async def for_user(self, user_id: str) -> DurationEstimates:
+        user_rows, global_stats = await asyncio.gather(
+            fetch_rows(supabase.table("activity_duration_stats").select(STATS_COLUMNS).eq("user_id", user_id)),
+            self._global_stats(),
+        )
+        return DurationEstimates({str(row["activity_type_id"]): row for row in user_rows}, global_stats)
+
+
+duration_estimator = DurationEstimator()
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.api.services.ai_gateway import DEFAULT_FALLBACK, FALLBACK_RESULTS, AIGateway, ai_gateway, check_result
+from app.api.services.prompt_registry import count_tokens
+from app.core.config import settings
+from app.core.lifespan import work_tracker
+
+logger = logging.getLogger(__name__)
+
+# (user_id, scope, interaction type, chapter_id)
+BatchKey = Tuple[str, str, str, Optional[str]]
+
+
+def item_score(interaction_type: str, result: Dict[str, Any]) -> float:
+    """
+    Score of one evaluated item, in percent
+    """
+    if interaction_type == "concept_restitution":
+        return float(result["note_globale_sur_30"]) * 100 / 30
+    return float(result["score"])
+
+
+class _Batch:
+    __slots__ = ("items", "tokens", "timer")
+
+    def __init__(self) -> None:
+        # (content, future of the interaction payload)
+        self.items: List[Tuple[Any, asyncio.Future]] = []
+        self.tokens = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class EvaluationBatcher:
+    """
+    Groups the evaluations of a user's activity into one provider request
+
+    Items of the same user, activity (scope), type and chapter submitted within
+    AI_BATCH_WINDOW seconds are sent together as the "<type>_batch" interaction,
+    up to AI_BATCH_MAX_ITEMS items and AI_PROMPT_INPUT_MAX_TOKENS tokens of
+    student input, so answers are never shortened to fit the prompt budget. The
+    answer is fanned out by item id; items whose result is missing or invalid
+    are evaluated again one by one.
+    """
+
+    def __init__(self, gateway: AIGateway) -> None:
+        self.gateway = gateway
+        self._pending: Dict[BatchKey, _Batch] = {}
+
+    async def submit(
+        self,
+        user_id: str,
+        interaction_type: str,
+        content: Any,
+        scope: str,
+        chapter_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Evaluate one item, grouped with the items submitted alongside it
+
+        Returns:
+            the payload of AIGateway.interact, with "batched": whether a grouped request answered it
+        """
+        loop = asyncio.get_running_loop()
+        key = (user_id, scope, interaction_type, chapter_id)
+        # The "id" member added to each item counts too
+        tokens = count_tokens(json.dumps(content, ensure_ascii=False)) + 6
+
+        batch = self._pending.get(key)
+        if batch is not None and batch.tokens + tokens > settings.AI_PROMPT_INPUT_MAX_TOKENS:
+            self._flush(key, batch)
+            batch = None
+        if batch is None:
+            batch = _Batch()
+            self._pending[key] = batch
+            batch.timer = loop.call_later(settings.AI_BATCH_WINDOW, self._flush, key, batch)
+
+        future = loop.create_future()
+        batch.items.append((content, future))
+        batch.tokens += tokens
+        if len(batch.items) >= settings.AI_BATCH_MAX_ITEMS:
+            self._flush(key, batch)
+        return await future
+
+    async def evaluate(
+        self,
+        user_id: str,
+        interaction_type: str,
+        items: List[Tuple[str, Any]],
+        scope: str,
+        chapter_id: Optional[str] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Evaluate (item id, content) pairs, returning the interaction payload of each item by id
+
+        Items that could not be evaluated get the fallback answer of the type with an
+        "error" message; the error is raised when no item could be evaluated.
+        """
+        outcomes = await asyncio.gather(
+            *(self.submit(user_id, interaction_type, content, scope, chapter_id) for _, content in items),
+            return_exceptions=True,
+        )
+        errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        if errors and len(errors) == len(outcomes):
+            raise errors[0]
+
+        results = {}
+        for (item_id, _), outcome in zip(items, outcomes):
+            if isinstance(outcome, BaseException):
+                outcome = {
+                    "result": dict(FALLBACK_RESULTS.get(interaction_type, DEFAULT_FALLBACK)),
+                    "cached": False,
+                    "valid": False,
+                    "batched": False,
+                    "error": str(outcome),
+                }
+            results[item_id] = outcome
+        return results
+
+    def _flush(self, key: BatchKey, batch: _Batch) -> None:
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        if batch.timer is not None:
+            batch.timer.cancel()
+        try:
+            work_tracker.spawn("ai_batch", self._run(key, batch.items))
+        except Exception as e:
+            for _, future in batch.items:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _single(self, key: BatchKey, content: Any, future: asyncio.Future) -> None:
+        user_id, scope, interaction_type, chapter_id = key
+        try:
+            response = await self.gateway.interact(user_id, interaction_type, content, scope, chapter_id)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result({**response, "batched": False})
+
+    async def _run(self, key: BatchKey, items: List[Tuple[Any, asyncio.Future]]) -> None:
+        user_id, scope, interaction_type, chapter_id = key
+        if len(items) == 1:
+            await self._single(key, *items[0])
+            return
+
+        payload = {
+            "items": [
+                {**content, "id": str(index)} if isinstance(content, dict) else {"id": str(index), "content": content}
+                for index, (content, _) in enumerate(items)
+            ]
+        }
+        try:
+            response = await self.gateway.interact(user_id, f"{interaction_type}_batch", payload, scope, chapter_id)
+        except Exception as e:
+            # Provider or capacity error: evaluating the items one by one would fail the same way
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        results = response["result"].get("results") if response["valid"] else []
+        by_id = {str(result.get("id")): result for result in results if isinstance(result, dict)}
+        retries = []
+        for index, (content, future) in enumerate(items):
+            result = {field: value for field, value in by_id.get(str(index), {}).items() if field != "id"}
+            if not check_result(interaction_type, result):
+                retries.append((content, future))
+            elif not future.done():
+                future.set_result({"result": result, "cached": False, "valid": True, "batched": True})
+        if not retries:
+            return
+
+        logger.warning("Grouped %s evaluation: %d of %d items evaluated again one by one",
+                       interaction_type, len(retries), len(items))
+        # No more calls at once than the user's slots, so retries do not time out in the queue
+        semaphore = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY_PER_USER)
+
+        async def retry(content: Any, future: asyncio.Future) -> None:
+            async with semaphore:
+                await self._single(key, content, future)
+
+        await asyncio.gather(*(retry(content, future) for content, future in retries))
+
+
+evaluation_batcher = EvaluationBatcher(ai_gateway)
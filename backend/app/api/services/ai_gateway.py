@@ -0,0 +1,567 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import aclosing, asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.api.services.ai_providers import AIProvider, AIProviderError, create_provider
+from app.api.services.prompt_registry import (
+    AssembledPrompt,
+    ChunkCache,
+    ContextChunk,
+    PromptTemplate,
+    assemble,
+    chunk_chapter,
+    count_tokens,
+    prompt_registry,
+)
+from app.api.services.supabase import fetch_rows, supabase
+from app.core.config import settings
+from app.core.lifespan import register_worker
+from app.core.metrics import AI_CALLS_IN_FLIGHT, AI_PROMPT_TOKENS, AI_REQUEST_LATENCY
+from app.core.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Interactions whose result only depends on their input: identical requests share one answer
+CACHEABLE_TYPES = frozenset({"concept_identification"})
+
+# Fields each answer must contain (same checks as the former frontend client)
+REQUIRED_FIELDS: Dict[str, Dict[str, type]] = {
+    "concept_identification": {"isCorrect": bool, "similarity": (int, float), "feedback": str},
+    "concept_restitution": {"concept": str, "champs": dict, "note_globale_sur_30": (int, float),
+                            "est_validee": bool, "commentaire_general": str},
+    "quiz_evaluation": {"score": (int, float), "feedback": str, "questionResults": list},
+    "note_feedback": {"feedback": str, "strengths": list, "improvements": list},
+    "mindmap_feedback": {"feedback": str, "strengths": list, "improvements": list},
+    "study_planning": {"recommendation": str, "planning": list, "priorities": list, "tips": list},
+    "progress_report": {"overview": str, "strengths": list, "weaknesses": list, "recommendations": list},
+    # Grouped evaluations (ai_batch): each result is checked against the fields of its type
+    "quiz_evaluation_batch": {"results": list},
+    "concept_restitution_batch": {"results": list},
+}
+
+EVALUATION_ERROR = "Une erreur est survenue lors de l'évaluation. Veuillez réessayer."
+ANALYSIS_ERROR = "Une erreur est survenue lors de l'analyse. Veuillez réessayer."
+
+# Answer returned when the provider's completion cannot be parsed
+FALLBACK_RESULTS: Dict[str, Dict[str, Any]] = {
+    "concept_identification": {"isCorrect": False, "similarity": 0, "feedback": EVALUATION_ERROR},
+    "concept_restitution": {
+        "concept": "Erreur d'évaluation",
+        "champs": {},
+        "note_globale_sur_30": 0,
+        "est_validee": False,
+        "commentaire_general": EVALUATION_ERROR,
+    },
+    "quiz_evaluation": {
+        "score": 0,
+        "feedback": EVALUATION_ERROR,
+        "questionResults": [],
+        "totalScore": 0,
+        "maxPossibleScore": 0,
+    },
+    "note_feedback": {"feedback": ANALYSIS_ERROR, "strengths": [], "improvements": []},
+    "mindmap_feedback": {"feedback": ANALYSIS_ERROR, "strengths": [], "improvements": []},
+    "study_planning": {"recommendation": ANALYSIS_ERROR, "planning": [], "priorities": [], "tips": []},
+    "progress_report": {
+        "overview": ANALYSIS_ERROR,
+        "strengths": [],
+        "weaknesses": [],
+        "trends": "",
+        "recommendations": [],
+        "nextSteps": "",
+    },
+}
+DEFAULT_FALLBACK = {"error": True, "message": "Une erreur est survenue lors du traitement. Veuillez réessayer."}
+
+# Prefix of the messages sent in a reused thread, whose first message holds the instructions
+CONTINUATION_PREFIX = "Nouvelle demande, même consigne et même format de réponse :"
+CONTINUATION_TOKENS = count_tokens(CONTINUATION_PREFIX)
+
+
+class AIGatewayBusyError(RuntimeError):
+    """
+    No AI slot became free within AI_QUEUE_TIMEOUT
+    """
+
+
+class AIGatewayUnavailableError(RuntimeError):
+    """
+    No AI provider is configured
+    """
+
+
+def extract_json(content: str) -> Any:
+    """
+    Parse the JSON answer of a completion (optionally in a ```json block), closing truncated output
+    """
+    match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*(?:```|$)", content)
+    text = (match.group(1) if match else content).strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    # Truncated answer: drop the incomplete last member and close the open brackets
+    if text[-1:] in ('"', ":", ","):
+        text = re.sub(r",[^\]}]*$", "", text)
+    text += "]" * max(text.count("[") - text.count("]"), 0)
+    text += "}" * max(text.count("{") - text.count("}"), 0)
+    return json.loads(text)
+
+
+def check_result(interaction_type: str, result: Any) -> bool:
+    """
+    Whether an answer has the fields required for its type
+    """
+    return isinstance(result, dict) and all(
+        isinstance(result.get(field), expected) and not (expected is not bool and isinstance(result.get(field), bool))
+        for field, expected in REQUIRED_FIELDS.get(interaction_type, {}).items()
+    )
+
+
+def parse_result(interaction_type: str, completion: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    Parse and check a completion
+
+    Returns:
+        (result, valid): the fallback answer of the type when the completion is unusable
+    """
+    try:
+        result = extract_json(completion)
+    except ValueError:
+        result = None
+    valid = check_result(interaction_type, result)
+    if not valid:
+        logger.warning("Unusable %s completion: %.500s", interaction_type, completion)
+        return dict(FALLBACK_RESULTS.get(interaction_type, DEFAULT_FALLBACK)), False
+    return result, True
+
+
+class ResultCache:
+    """
+    In-memory LRU of parsed answers with a time to live
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class ConcurrencyLimiter:
+    """
+    Bounds the provider calls running at once, per user and for the whole worker
+    """
+
+    def __init__(self, global_limit: int, per_user_limit: int) -> None:
+        self.global_limit = global_limit
+        self.per_user_limit = per_user_limit
+        self._global: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._users: Dict[str, Tuple[asyncio.Semaphore, int]] = {}
+        self.in_flight = 0
+
+    def _global_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores are bound to the event loop that first uses them (scripts may run several)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._global = asyncio.Semaphore(self.global_limit)
+            self._loop = loop
+            self._users.clear()
+        return self._global
+
+    @asynccontextmanager
+    async def slot(self, user_id: str, timeout: float):
+        global_semaphore = self._global_semaphore()
+        semaphore, users = self._users.get(user_id, (None, 0))
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_user_limit)
+        self._users[user_id] = (semaphore, users + 1)
+        deadline = time.monotonic() + timeout
+        try:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout)
+            except asyncio.TimeoutError:
+                raise AIGatewayBusyError("Trop de demandes IA en cours pour cet utilisateur")
+            try:
+                try:
+                    await asyncio.wait_for(global_semaphore.acquire(), max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    raise AIGatewayBusyError("Le service IA est saturé, réessayez dans quelques instants")
+                self.in_flight += 1
+                AI_CALLS_IN_FLIGHT.set(self.in_flight)
+                try:
+                    yield
+                finally:
+                    self.in_flight -= 1
+                    AI_CALLS_IN_FLIGHT.set(self.in_flight)
+                    global_semaphore.release()
+            finally:
+                semaphore.release()
+        finally:
+            semaphore, users = self._users[user_id]
+            if users <= 1:
+                del self._users[user_id]
+            else:
+                self._users[user_id] = (semaphore, users - 1)
+
+
+class ThreadRegistry:
+    """
+    Provider threads reused per (user, scope, interaction type)
+
+    The instructions are sent once, as the first message of the thread; later
+    requests only send their content. Threads are rotated after
+    AI_THREAD_MAX_MESSAGES messages (the whole thread is context for the model),
+    after AI_THREAD_TTL seconds or when the prompt version changes. The mapping is kept
+    in memory and in the ai_threads table (migration 14), shared by the workers.
+    """
+
+    def __init__(self) -> None:
+        self._threads: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        # One message at a time per thread: the provider answers in order
+        self._locks: "weakref.WeakValueDictionary[Tuple[str, str, str], asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def lock(self, key: Tuple[str, str, str]) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    @staticmethod
+    def _usable(thread: Optional[Dict[str, Any]], prompt_version: str) -> bool:
+        if not thread or thread.get("prompt_version") != prompt_version:
+            return False
+        if (thread.get("message_count") or 0) >= settings.AI_THREAD_MAX_MESSAGES:
+            return False
+        created_at = thread.get("created_at")
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+        return created_at is None or (datetime.now(timezone.utc) - created_at).total_seconds() < settings.AI_THREAD_TTL
+
+    async def get(self, key: Tuple[str, str, str], prompt_version: str) -> Optional[Dict[str, Any]]:
+        thread = self._threads.get(key)
+        if thread is None:
+            user_id, scope, interaction_type = key
+            try:
+                rows = await fetch_rows(
+                    supabase.table("ai_threads")
+                    .select("thread_id, prompt_version, message_count, created_at")
+                    .eq("user_id", user_id)
+                    .eq("scope", scope)
+                    .eq("interaction_type", interaction_type)
+                )
+            except Exception as e:
+                logger.warning("Could not load AI thread: %s", e)
+                rows = []
+            thread = rows[0] if rows else None
+        return thread if self._usable(thread, prompt_version) else None
+
+    async def save(self, key: Tuple[str, str, str], thread: Dict[str, Any]) -> None:
+        self._threads[key] = thread
+        user_id, scope, interaction_type = key
+        row = {
+            "user_id": user_id,
+            "scope": scope,
+            "interaction_type": interaction_type,
+            "thread_id": thread["thread_id"],
+            "prompt_version": thread["prompt_version"],
+            "message_count": thread["message_count"],
+            "created_at": thread["created_at"].isoformat() if isinstance(thread["created_at"], datetime) else thread["created_at"],
+            "last_used_at": datetime.now(timezone.utc).isoformat(),
+        }
+        try:
+            await asyncio.to_thread(
+                lambda: supabase.table("ai_threads")
+                .upsert(row, on_conflict="user_id,scope,interaction_type")
+                .execute()
+            )
+        except Exception as e:
+            logger.warning("Could not save AI thread: %s", e)
+
+    def forget(self, key: Tuple[str, str, str]) -> None:
+        self._threads.pop(key, None)
+
+
+class AIGateway:
+    """
+    Single entry point for AI interactions: concurrency limits, thread reuse, caching
+    """
+
+    def __init__(self) -> None:
+        self.provider: Optional[AIProvider] = None
+        self.cache = ResultCache(settings.AI_CACHE_SIZE, settings.AI_CACHE_TTL)
+        self.limiter = ConcurrencyLimiter(settings.AI_MAX_CONCURRENCY, settings.AI_MAX_CONCURRENCY_PER_USER)
+        self.threads = ThreadRegistry()
+        self.chunks = ChunkCache(settings.AI_CONTEXT_CACHE_SIZE)
+        self._flight = SingleFlight()
+
+    def _provider(self) -> AIProvider:
+        if self.provider is None:
+            try:
+                self.provider = create_provider()
+            except AIProviderError as e:
+                raise AIGatewayUnavailableError(str(e)) from e
+        return self.provider
+
+    @staticmethod
+    def agent_id(interaction_type: str) -> str:
+        # Grouped evaluations use the agent of their type unless they have their own
+        agent_id = (
+            settings.AI_AGENT_IDS.get(interaction_type)
+            or settings.AI_AGENT_IDS.get(interaction_type.removesuffix("_batch"))
+            or settings.AI_DEFAULT_AGENT_ID
+        )
+        if not agent_id and settings.AI_PROVIDER != "mock":
+            raise AIGatewayUnavailableError(f"No AI agent configured for {interaction_type}")
+        return agent_id or interaction_type
+
+    @staticmethod
+    def cache_key(template: PromptTemplate, body: str) -> str:
+        digest = hashlib.sha256(body.encode("utf-8")).hexdigest()
+        return f"{template.name}:{template.version}:{digest}"
+
+    async def chapter_chunks(self, chapter_id: str, user_id: str) -> List[ContextChunk]:
+        """
+        Chunks of the extracted content of a chapter (empty when it has none)
+
+        chapter_id comes from the request and chapters are read with the service
+        key: the chunks are only returned when the user is enrolled in the course
+        of the chapter. Only the file hash is read on a cache hit: json_data can
+        weigh megabytes.
+        """
+        rows = await fetch_rows(supabase.table("chapters").select("course_id, file_hash").eq("id", chapter_id))
+        if not rows or not rows[0].get("course_id"):
+            return []
+        enrollment = await fetch_rows(
+            supabase.table("user_courses")
+            .select("id")
+            .eq("user_id", str(user_id))
+            .eq("course_id", rows[0]["course_id"])
+            .limit(1)
+        )
+        if not enrollment:
+            logger.warning("User %s is not enrolled in the course of chapter %s: no AI context", user_id, chapter_id)
+            return []
+        key = (chapter_id, rows[0].get("file_hash") or "")
+        chunks = self.chunks.get(key)
+        if chunks is None:
+            rows = await fetch_rows(supabase.table("chapters").select("json_data").eq("id", chapter_id))
+            json_data = rows[0].get("json_data") if rows else None
+            chunks = await asyncio.to_thread(chunk_chapter, json_data, settings.AI_CONTEXT_CHUNK_TOKENS)
+            self.chunks.put(key, chunks)
+        return chunks
+
+    async def prepare(
+        self,
+        user_id: str,
+        interaction_type: str,
+        content: Any,
+        chapter_id: Optional[str] = None,
+    ) -> AssembledPrompt:
+        """
+        Assemble the request body within AI_PROMPT_TOKEN_BUDGET, with excerpts of the chapter if given
+
+        The excerpts are left out when the user is not enrolled in the course of the chapter.
+        """
+        template = prompt_registry.get(interaction_type)
+        chunks: List[ContextChunk] = []
+        if chapter_id:
+            try:
+                chunks = await self.chapter_chunks(chapter_id, user_id)
+            except Exception as e:
+                logger.warning("Could not load chapter %s for AI context: %s", chapter_id, e)
+        prompt = assemble(template, content, chunks)
+        if prompt.truncated:
+            logger.info(
+                "%s request fitted to %d tokens (%d chapter chunks kept of %d)",
+                interaction_type, prompt.tokens + template.tokens, prompt.context_chunks, len(chunks),
+            )
+        return prompt
+
+    async def _completion_chunks(
+        self,
+        user_id: str,
+        interaction_type: str,
+        prompt: AssembledPrompt,
+        scope: str,
+    ) -> AsyncIterator[str]:
+        """
+        Send one request in the (user, scope, type) thread and yield the completion chunks
+        """
+        provider = self._provider()
+        key = (user_id, scope, interaction_type)
+        template = prompt_registry.get(interaction_type)
+        prompt_version = template.version
+
+        async with self.limiter.slot(user_id, settings.AI_QUEUE_TIMEOUT):
+            async with self.threads.lock(key):
+                for attempt in range(2):
+                    thread = await self.threads.get(key, prompt_version)
+                    reused = thread is not None
+                    if thread is None:
+                        thread = {
+                            "thread_id": await provider.create_thread(self.agent_id(interaction_type)),
+                            "prompt_version": prompt_version,
+                            "message_count": 0,
+                            "created_at": datetime.now(timezone.utc),
+                        }
+                        message = f"{template.text}\n\n{prompt.body}"
+                        AI_PROMPT_TOKENS.observe(template.tokens + prompt.tokens, type=interaction_type)
+                    else:
+                        message = f"{CONTINUATION_PREFIX}\n\n{prompt.body}"
+                        AI_PROMPT_TOKENS.observe(CONTINUATION_TOKENS + prompt.tokens, type=interaction_type)
+
+                    produced = False
+                    try:
+                        async for chunk in provider.stream_message(thread["thread_id"], message):
+                            produced = True
+                            yield chunk
+                    except AIProviderError:
+                        # A reused thread may have expired on the provider side: start a new one once
+                        self.threads.forget(key)
+                        if reused and not produced and attempt == 0:
+                            await self.threads.save(key, {**thread, "message_count": settings.AI_THREAD_MAX_MESSAGES})
+                            continue
+                        raise
+                    await self.threads.save(key, {**thread, "message_count": thread["message_count"] + 1})
+                    return
+
+    async def _complete(
+        self,
+        user_id: str,
+        interaction_type: str,
+        prompt: AssembledPrompt,
+        scope: str,
+    ) -> Tuple[Dict[str, Any], bool]:
+        async with aclosing(self._completion_chunks(user_id, interaction_type, prompt, scope)) as completion:
+            chunks = [chunk async for chunk in completion]
+        return parse_result(interaction_type, "".join(chunks))
+
+    async def interact(
+        self,
+        user_id: str,
+        interaction_type: str,
+        content: Any,
+        scope: Optional[str] = None,
+        chapter_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run an interaction and return its parsed answer
+
+        Returns:
+            {"result": answer, "cached": bool, "valid": False when the fallback answer is returned}
+        """
+        scope = scope or "default"
+        started_at = time.perf_counter()
+        outcome = "error"
+        try:
+            prompt = await self.prepare(user_id, interaction_type, content, chapter_id)
+            if interaction_type not in CACHEABLE_TYPES:
+                result, valid = await self._complete(user_id, interaction_type, prompt, scope)
+                outcome = "ok" if valid else "fallback"
+                return {"result": result, "cached": False, "valid": valid}
+
+            key = self.cache_key(prompt_registry.get(interaction_type), prompt.body)
+            cached = self.cache.get(key)
+            if cached is not None:
+                outcome = "cached"
+                return {"result": cached, "cached": True, "valid": True}
+
+            async def complete_and_cache() -> Tuple[Dict[str, Any], bool]:
+                result, valid = await self._complete(user_id, interaction_type, prompt, scope)
+                if valid:
+                    self.cache.put(key, result)
+                return result, valid
+
+            # Identical requests arriving together share one provider call
+            result, valid = await self._flight.do(key, complete_and_cache)
+            outcome = "ok" if valid else "fallback"
+            return {"result": result, "cached": False, "valid": valid}
+        finally:
+            AI_REQUEST_LATENCY.observe(time.perf_counter() - started_at, type=interaction_type, outcome=outcome)
+
+    async def stream(
+        self,
+        user_id: str,
+        interaction_type: str,
+        content: Any,
+        scope: Optional[str] = None,
+        chapter_id: Optional[str] = None,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Run an interaction, yielding ("delta", text) while the answer is produced, then ("result", payload)
+        """
+        scope = scope or "default"
+        started_at = time.perf_counter()
+        outcome = "error"
+        try:
+            prompt = await self.prepare(user_id, interaction_type, content, chapter_id)
+            template = prompt_registry.get(interaction_type)
+            key = self.cache_key(template, prompt.body) if interaction_type in CACHEABLE_TYPES else None
+            cached = self.cache.get(key) if key else None
+            if cached is not None:
+                outcome = "cached"
+                yield "result", {"result": cached, "cached": True, "valid": True}
+                return
+
+            chunks = []
+            # Closed explicitly when the client goes away: releases the slot and the thread at once
+            async with aclosing(self._completion_chunks(user_id, interaction_type, prompt, scope)) as completion:
+                async for chunk in completion:
+                    chunks.append(chunk)
+                    yield "delta", chunk
+            result, valid = parse_result(interaction_type, "".join(chunks))
+            if valid and key:
+                self.cache.put(key, result)
+            outcome = "ok" if valid else "fallback"
+            yield "result", {"result": result, "cached": False, "valid": valid}
+        finally:
+            AI_REQUEST_LATENCY.observe(time.perf_counter() - started_at, type=interaction_type, outcome=outcome)
+
+
+ai_gateway = AIGateway()
+
+
+async def _start_gateway() -> None:
+    try:
+        ai_gateway._provider()
+    except AIGatewayUnavailableError as e:
+        logger.warning("AI gateway disabled: %s", e)
+
+
+async def _stop_gateway() -> None:
+    provider, ai_gateway.provider = ai_gateway.provider, None
+    if provider is not None:
+        await provider.close()
+
+
+register_worker("ai_gateway", _start_gateway, _stop_gateway)
+
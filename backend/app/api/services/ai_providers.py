@@ -0,0 +1,229 @@
+import asyncio
+import difflib
+import json
+import re
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict
+
+import httpx
+
+from app.core.config import settings
+
+
+class AIProviderError(RuntimeError):
+    """
+    The AI provider could not be reached or rejected the request
+    """
+
+
+class AIProvider(ABC):
+    """
+    Conversation API of an AI provider: threads of messages sent to an agent
+    """
+
+    @abstractmethod
+    async def create_thread(self, agent_id: str) -> str:
+        """
+        Open a thread with an agent and return its id
+        """
+
+    @abstractmethod
+    async def send_message(self, thread_id: str, message: str) -> str:
+        """
+        Send a message and return the full completion text
+        """
+
+    async def stream_message(self, thread_id: str, message: str) -> AsyncIterator[str]:
+        """
+        Send a message and yield the completion text as it is produced
+
+        Providers without a streaming API yield the full completion at once.
+        """
+        yield await self.send_message(thread_id, message)
+
+    async def close(self) -> None:
+        pass
+
+
+class FabrileProvider(AIProvider):
+    """
+    Fabrile threads API (https://api.fabrile.ai)
+    """
+
+    def __init__(self, base_url: str, token: str, organization_id: str, timeout: float) -> None:
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers={
+                "Authorization": f"Bearer {token}",
+                "X-Organization-ID": organization_id,
+            },
+            timeout=timeout,
+        )
+
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            response = await self.client.post(path, json=payload)
+        except httpx.HTTPError as e:
+            raise AIProviderError(f"AI provider unreachable: {e}") from e
+        if response.status_code >= 400:
+            raise AIProviderError(f"AI provider error {response.status_code}: {response.text[:500]}")
+        return response.json()
+
+    async def create_thread(self, agent_id: str) -> str:
+        data = await self._post("/threads", {"agent_id": agent_id})
+        return data["id"]
+
+    async def send_message(self, thread_id: str, message: str) -> str:
+        data = await self._post(f"/threads/{thread_id}/messages", {"message": message})
+        return data["completion"]["content"]
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class MockProvider(AIProvider):
+    """
+    Local provider returning well-formed answers, for development and tests
+
+    The answer is derived from the JSON payload found in the message (same
+    payloads as the frontend sends), so identical inputs give identical outputs.
+    Completions are streamed in small chunks spread over AI_MOCK_LATENCY.
+    """
+
+    CHUNK_SIZE = 24
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.threads: Dict[str, int] = {}
+        self.calls = 0
+
+    async def create_thread(self, agent_id: str) -> str:
+        thread_id = f"mock_{uuid.uuid4().hex[:12]}"
+        self.threads[thread_id] = 0
+        return thread_id
+
+    async def send_message(self, thread_id: str, message: str) -> str:
+        return "".join([chunk async for chunk in self.stream_message(thread_id, message)])
+
+    async def stream_message(self, thread_id: str, message: str) -> AsyncIterator[str]:
+        if thread_id not in self.threads:
+            raise AIProviderError(f"Unknown thread: {thread_id}")
+        self.threads[thread_id] += 1
+        self.calls += 1
+        completion = "```json\n" + json.dumps(self.answer(message), ensure_ascii=False, indent=2) + "\n```"
+        chunks = [completion[i:i + self.CHUNK_SIZE] for i in range(0, len(completion), self.CHUNK_SIZE)]
+        for chunk in chunks:
+            await asyncio.sleep(self.latency / len(chunks))
+            yield chunk
+
+    @staticmethod
+    def _payload(message: str) -> Dict[str, Any]:
+        # The payload is the last JSON object of the message
+        start = message.rfind("\n{")
+        candidate = message[start + 1:] if start >= 0 else message
+        try:
+            payload = json.loads(candidate)
+        except ValueError:
+            return {}
+        return payload if isinstance(payload, dict) else {}
+
+    @staticmethod
+    def _normalize(text: Any) -> str:
+        return re.sub(r"\W+", " ", str(text or "")).strip().lower()
+
+    def answer(self, message: str) -> Dict[str, Any]:
+        payload = self._payload(message)
+        if isinstance(payload.get("items"), list):
+            # Grouped evaluation: one answer per item, tagged with its id
+            return {
+                "results": [
+                    {"id": item.get("id"), **self.answer_payload(item)}
+                    for item in payload["items"] if isinstance(item, dict)
+                ]
+            }
+        return self.answer_payload(payload)
+
+    def answer_payload(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if "expectedConcept" in payload:
+            similarity = difflib.SequenceMatcher(
+                None, self._normalize(payload.get("userResponse")), self._normalize(payload["expectedConcept"])
+            ).ratio()
+            return {
+                "isCorrect": similarity >= 0.8,
+                "similarity": round(similarity, 2),
+                "feedback": "Réponse correcte." if similarity >= 0.8 else "Réponse à revoir.",
+            }
+        if "userResponses" in payload:
+            fields = {
+                name: {"note_sur_10": 7, "type_erreur": None, "commentaire": "Restitution fidèle."}
+                for name, value in (payload.get("userResponses") or {}).items() if value
+            }
+            return {
+                "concept": str((payload.get("referenceConcept") or {}).get("title", "Concept")),
+                "champs": fields,
+                "note_globale_sur_30": 21.0 if fields else 0.0,
+                "est_validee": bool(fields),
+                "commentaire_general": "Évaluation simulée.",
+            }
+        if "userAnswers" in payload:
+            correct_answers = payload.get("correctAnswers") or {}
+            results = [
+                {
+                    "questionId": question_id,
+                    "isCorrect": answer == correct_answers.get(question_id),
+                    "score": 100 if answer == correct_answers.get(question_id) else 0,
+                    "feedback": "Évaluation simulée.",
+                }
+                for question_id, answer in (payload.get("userAnswers") or {}).items()
+            ]
+            total = sum(result["score"] for result in results)
+            return {
+                "score": round(total / len(results)) if results else 0,
+                "feedback": "Évaluation simulée.",
+                "questionResults": results,
+                "totalScore": total,
+                "maxPossibleScore": 100 * len(results),
+            }
+        if "course_progress" in payload:
+            courses = [str(course.get("course")) for course in payload["course_progress"] or []]
+            if "today" in payload:
+                return {
+                    "recommendation": "Planning simulé.",
+                    "planning": [
+                        {"day": "Lundi", "duration": "30", "focus": course, "activities": []} for course in courses
+                    ],
+                    "priorities": courses[:3],
+                    "tips": [],
+                }
+            return {
+                "overview": "Rapport simulé.",
+                "strengths": [],
+                "weaknesses": [],
+                "trends": "",
+                "recommendations": [],
+                "nextSteps": "",
+            }
+        return {
+            "feedback": "Analyse simulée.",
+            "strengths": [],
+            "improvements": [],
+        }
+
+
+def create_provider() -> AIProvider:
+    """
+    Build the provider selected by AI_PROVIDER
+    """
+    if settings.AI_PROVIDER == "mock":
+        return MockProvider(settings.AI_MOCK_LATENCY)
+    if settings.AI_PROVIDER == "fabrile":
+        if not settings.AI_API_TOKEN or not settings.AI_ORGANIZATION_ID:
+            raise AIProviderError("AI_API_TOKEN and AI_ORGANIZATION_ID must be set for the fabrile provider")
+        return FabrileProvider(
+            settings.AI_API_URL,
+            settings.AI_API_TOKEN,
+            settings.AI_ORGANIZATION_ID,
+            settings.AI_REQUEST_TIMEOUT,
+        )
+    raise AIProviderError(f"Unknown AI provider: {settings.AI_PROVIDER}")
@@ -0,0 +1,310 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from app.api.services.ai_gateway import AIGatewayUnavailableError, ai_gateway
+from app.api.services.prompt_registry import prompt_registry
+from app.api.services.reference_data import course_catalog
+from app.api.services.supabase import fetch_rows, supabase
+from app.core.config import settings
+from app.core.events import event_bus
+from app.core.lifespan import register_worker, work_tracker
+from app.core.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Reports precomputed from slowly changing data (table ai_reports, migration 15)
+REPORT_TYPES = ("study_planning", "progress_report")
+
+REPORT_COLUMNS = "id, user_id, report_type, input_version, report_version, fingerprint, report, valid, generated_at, dirty"
+
+
+def _round(value: Any, digits: int = 0) -> Optional[float]:
+    return None if value is None else round(float(value), digits)
+
+
+async def collect_inputs(user_id: str, report_type: str, today: date) -> Dict[str, Any]:
+    """
+    Inputs of a report: course progress with quiz scores and the recent daily logs
+
+    Values are rounded and timestamps left out, so that only meaningful changes
+    alter the fingerprint. The study plan also depends on the current date.
+    """
+    since = today - timedelta(days=settings.AI_REPORTS_LOG_DAYS - 1)
+    progress, logs, quizzes = await asyncio.gather(
+        fetch_rows(
+            supabase.table("user_course_progress")
+            .select("course_id, progression_rate, total_study_time, confidence_level, exam_date, exam_grade")
+            .eq("user_id", user_id)
+        ),
+        fetch_rows(
+            supabase.table("daily_logs")
+            .select("date, sessions_completed, total_time, goal_met")
+            .eq("user_id", user_id)
+            .gte("date", since.isoformat())
+            .lte("date", today.isoformat())
+            .order("date")
+        ),
+        fetch_rows(
+            supabase.table("quiz_results")
+            .select("course_id, quiz_number, score")
+            .eq("user_id", user_id)
+        ),
+    )
+
+    scores: Dict[str, List[Any]] = {}
+    for quiz in sorted(quizzes, key=lambda quiz: (str(quiz.get("course_id")), quiz.get("quiz_number") or 0)):
+        scores.setdefault(str(quiz.get("course_id")), []).append(_round(quiz.get("score")))
+
+    courses = []
+    for row in sorted(progress, key=lambda row: str(row.get("course_id"))):
+        course = await course_catalog.aget(row.get("course_id")) or {}
+        courses.append({
+            "course": course.get("name") or str(row.get("course_id")),
+            "progression_rate": _round(row.get("progression_rate")),
+            "confidence_level": _round(row.get("confidence_level"), 1),
+            "total_study_time": row.get("total_study_time") or 0,
+            "exam_date": row.get("exam_date"),
+            "exam_grade": row.get("exam_grade"),
+            "quiz_scores": scores.get(str(row.get("course_id")), []),
+        })
+
+    inputs: Dict[str, Any] = {
+        "course_progress": courses,
+        "daily_logs": [
+            {
+                "date": log.get("date"),
+                "sessions_completed": log.get("sessions_completed") or 0,
+                "total_time": log.get("total_time") or 0,
+                "goal_met": bool(log.get("goal_met")),
+            }
+            for log in logs
+        ],
+    }
+    if report_type == "study_planning":
+        inputs["today"] = today.isoformat()
+    return inputs
+
+
+def fingerprint(report_type: str, inputs: Dict[str, Any]) -> str:
+    """
+    SHA-256 of the inputs and of the prompt version: the report is regenerated only when it changes
+    """
+    canonical = json.dumps(
+        {"prompt": prompt_registry.get(report_type).version, "inputs": inputs},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, dt_time.min).astimezone()
+
+
+def is_stale(row: Dict[str, Any], today: date) -> bool:
+    """
+    Whether a stored report must be regenerated: inputs changed, or a study plan from a previous day
+    """
+    if row.get("report") is None or row.get("dirty"):
+        return True
+    if row["report_type"] == "study_planning":
+        generated_at = row.get("generated_at")
+        if isinstance(generated_at, str):
+            generated_at = datetime.fromisoformat(generated_at.replace("Z", "+00:00"))
+        return generated_at is None or generated_at < _day_start(today)
+    return False
+
+
+class ReportService:
+    """
+    Precomputed study plans and progress reports
+
+    Triggers bump ai_reports.input_version when the progress, daily logs or quiz
+    scores change significantly. A background job regenerates these dirty
+    reports every AI_REPORTS_INTERVAL seconds and renews the study plans each
+    night; a report whose input fingerprint did not change is only marked up to
+    date, without calling the AI. Requests are served from the table: a stale
+    report is returned at once and refreshed in the background
+    (event "report.ready").
+    """
+
+    def __init__(self) -> None:
+        self._flight = SingleFlight()
+        self._refreshing: set = set()
+        self._last_nightly: Optional[date] = None
+
+    async def _load(self, user_id: str, report_type: str) -> Optional[Dict[str, Any]]:
+        rows = await fetch_rows(
+            supabase.table("ai_reports")
+            .select(REPORT_COLUMNS)
+            .eq("user_id", user_id)
+            .eq("report_type", report_type)
+        )
+        return rows[0] if rows else None
+
+    async def _claim(self, row: Dict[str, Any]) -> bool:
+        # Another worker may be generating the same report
+        response = await asyncio.to_thread(
+            lambda: supabase.rpc(
+                "claim_ai_report", {"p_id": row["id"], "p_seconds": settings.AI_REPORTS_CLAIM_SECONDS}
+            ).execute()
+        )
+        return bool(response.data)
+
+    async def _save(self, user_id: str, report_type: str, fields: Dict[str, Any]) -> None:
+        row = {"user_id": user_id, "report_type": report_type, "claimed_until": None, **fields}
+        await asyncio.to_thread(
+            lambda: supabase.table("ai_reports")
+            .upsert(row, on_conflict="user_id,report_type")
+            .execute()
+        )
+
+    async def refresh(self, user_id: str, report_type: str, row: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Regenerate a report if its input fingerprint changed, and store it
+
+        Returns:
+            {"report", "generated_at", "valid", "stale": False}
+        """
+        today = date.today()
+        # Read before the inputs: changes made during the generation leave the report dirty
+        version = (row or {}).get("input_version") or 1
+        inputs = await collect_inputs(user_id, report_type, today)
+        digest = fingerprint(report_type, inputs)
+
+        if row and row.get("report") is not None and row.get("fingerprint") == digest:
+            await self._save(user_id, report_type, {"report_version": version})
+            event_bus.publish(user_id, "report.ready", {"type": report_type, "generated_at": row.get("generated_at")})
+            return {"report": row["report"], "generated_at": row.get("generated_at"), "valid": row.get("valid"), "stale": False}
+
+        response = await ai_gateway.interact(user_id, report_type, inputs, "reports")
+        generated_at = datetime.now(timezone.utc).isoformat()
+        if response["valid"]:
+            await self._save(user_id, report_type, {
+                "report_version": version,
+                "fingerprint": digest,
+                "report": response["result"],
+                "valid": True,
+                "generated_at": generated_at,
+            })
+            event_bus.publish(user_id, "report.ready", {"type": report_type, "generated_at": generated_at})
+        elif row:
+            # Keep the previous report; the job tries again at its next pass
+            await self._save(user_id, report_type, {})
+        return {"report": response["result"], "generated_at": generated_at, "valid": response["valid"], "stale": False}
+
+    async def _refresh_claimed(self, row: Dict[str, Any]) -> None:
+        key = (row["user_id"], row["report_type"])
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        try:
+            if await self._claim(row):
+                await self.refresh(row["user_id"], row["report_type"], row)
+        except Exception as e:
+            logger.warning("Could not refresh %s report of %s: %s", row["report_type"], row["user_id"], e)
+        finally:
+            self._refreshing.discard(key)
+
+    async def get(self, user_id: str, report_type: str) -> Dict[str, Any]:
+        """
+        Return the stored report at once, refreshing it in the background when stale
+
+        Only the first request of a user, before any report exists, waits for the AI.
+        """
+        row = await self._load(user_id, report_type)
+        if row and row.get("report") is not None:
+            stale = is_stale(row, date.today())
+            if stale and (user_id, report_type) not in self._refreshing:
+                try:
+                    work_tracker.spawn("ai_report", self._refresh_claimed(row))
+                except Exception as e:
+                    logger.warning("Could not schedule %s report refresh: %s", report_type, e)
+            return {"report": row["report"], "generated_at": row.get("generated_at"), "valid": row.get("valid"), "stale": stale}
+
+        return await self._flight.do((user_id, report_type), lambda: self.refresh(user_id, report_type, row))
+
+    async def run_pass(self) -> int:
+        """
+        Regenerate the dirty reports, and after AI_REPORTS_NIGHTLY_HOUR the study plans of previous days
+
+        Returns:
+            Number of reports examined
+        """
+        rows = await fetch_rows(
+            supabase.table("ai_reports")
+            .select(REPORT_COLUMNS)
+            .eq("dirty", True)
+            .limit(settings.AI_REPORTS_BATCH_SIZE)
+        )
+        today = date.today()
+        nightly = self._last_nightly != today and datetime.now().hour >= settings.AI_REPORTS_NIGHTLY_HOUR
+        if nightly:
+            outdated = await fetch_rows(
+                supabase.table("ai_reports")
+                .select(REPORT_COLUMNS)
+                .eq("report_type", "study_planning")
+                .lt("generated_at", _day_start(today).isoformat())
+                .limit(settings.AI_REPORTS_BATCH_SIZE)
+            )
+            seen = {row["id"] for row in rows}
+            rows.extend(row for row in outdated if row["id"] not in seen)
+            # The nightly run is over once a pass finds no study plan left to renew
+            if not outdated:
+                self._last_nightly = today
+
+        semaphore = asyncio.Semaphore(settings.AI_REPORTS_CONCURRENCY)
+
+        async def refresh(row: Dict[str, Any]) -> None:
+            async with semaphore:
+                await self._refresh_claimed(row)
+
+        await asyncio.gather(*(refresh(row) for row in rows))
+        return len(rows)
+
+
+report_service = ReportService()
+
+
+# Lifespan integration: periodic regeneration of dirty reports
+
+_job_task: Optional[asyncio.Task] = None
+
+
+async def _job_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.AI_REPORTS_INTERVAL)
+        try:
+            examined = await report_service.run_pass()
+            if examined:
+                logger.info("AI reports pass: %d report(s) examined", examined)
+        except Exception as e:
+            logger.warning("AI reports pass failed, retrying in %ss: %s", settings.AI_REPORTS_INTERVAL, e)
+
+
+async def _start_job() -> None:
+    global _job_task
+    if settings.AI_REPORTS_INTERVAL <= 0:
+        return
+    try:
+        ai_gateway._provider()
+    except AIGatewayUnavailableError as e:
+        logger.warning("AI reports job disabled: %s", e)
+        return
+    _job_task = asyncio.get_running_loop().create_task(_job_loop())
+
+
+async def _stop_job() -> None:
+    global _job_task
+    if _job_task is not None:
+        _job_task.cancel()
+        await asyncio.gather(_job_task, return_exceptions=True)
+        _job_task = None
+
+
+register_worker("ai_reports", _start_job, _stop_job)
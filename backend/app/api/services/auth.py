@@ -1,5 +1,5 @@
 from typing import Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import BaseModel
@@ -8,6 +8,7 @@ from app.core.config import settings
 from app.api.services.supabase import supabase
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login", auto_error=False)
 
 
 class TokenPayload(BaseModel):
@@ -52,3 +53,27 @@ async def get_current_active_user(current_user = Depends(get_current_user)):
     if not current_user.aud == "authenticated":
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme)):
+    """
+    Return the current user when a valid token is sent, None otherwise
+    """
+    if not token:
+        return None
+    try:
+        return await get_current_active_user(await get_current_user(token))
+    except HTTPException:
+        return None
+
+
+async def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(None),
+):
+    """
+    Current user for EventSource connections, which cannot send headers:
+    the token may also be passed as ?access_token=
+    """
+    user = await get_current_user(token or access_token or "")
+    return await get_current_active_user(user)
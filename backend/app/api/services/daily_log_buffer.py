@@ -0,0 +1,181 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.api.services.supabase import supabase
+from app.core.config import settings
+from app.core.lifespan import register_warmup, register_worker
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, str]
+
+
+class DailyLogAccumulator:
+    """
+    In-memory sum of daily_logs counter increments, flushed in batches
+
+    Heartbeats only add to a (user_id, date) entry; `flush` applies every pending
+    increment with one call to the increment_daily_logs RPC (migration 10), which
+    adds them atomically in the database. Increments are additive, so several
+    workers can each keep their own accumulator. Increments that could not be
+    written at shutdown are appended to a spool file, replayed at the next startup.
+    """
+
+    def __init__(self, spool_path: str) -> None:
+        self.spool_path = spool_path
+        self._pending: Dict[Key, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def add(self, user_id: str, day: date, sessions_completed: int = 0, total_time: int = 0) -> Dict[str, int]:
+        """
+        Record an increment and return the totals pending for this day
+        """
+        with self._lock:
+            entry = self._pending.setdefault((user_id, day.isoformat()), {"sessions_completed": 0, "total_time": 0})
+            entry["sessions_completed"] += sessions_completed
+            entry["total_time"] += total_time
+            return dict(entry)
+
+    def pending_for(self, user_id: str) -> Dict[str, Dict[str, int]]:
+        """
+        Increments not yet written for a user, by ISO date
+        """
+        with self._lock:
+            return {day: dict(entry) for (owner, day), entry in self._pending.items() if owner == user_id}
+
+    @property
+    def size(self) -> int:
+        return len(self._pending)
+
+    def _take(self) -> Dict[Key, Dict[str, int]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def _restore(self, pending: Dict[Key, Dict[str, int]]) -> None:
+        # Put back increments whose write failed, summed with those received since
+        with self._lock:
+            for key, increment in pending.items():
+                entry = self._pending.setdefault(key, {"sessions_completed": 0, "total_time": 0})
+                entry["sessions_completed"] += increment["sessions_completed"]
+                entry["total_time"] += increment["total_time"]
+
+    @staticmethod
+    def _rows(pending: Dict[Key, Dict[str, int]]) -> List[Dict[str, Any]]:
+        return [
+            {"user_id": user_id, "date": day, **increment}
+            for (user_id, day), increment in pending.items()
+        ]
+
+    def flush(self) -> int:
+        """
+        Write all pending increments in one batch
+
+        Returns:
+            Number of daily logs updated
+        """
+        with self._flush_lock:
+            pending = self._take()
+            if not pending:
+                return 0
+            try:
+                supabase.rpc("increment_daily_logs", {"p_increments": self._rows(pending)}).execute()
+            except Exception:
+                self._restore(pending)
+                raise
+            return len(pending)
+
+    def spool(self) -> int:
+        """
+        Append pending increments to the spool file (last resort at shutdown)
+        """
+        pending = self._take()
+        if not pending:
+            return 0
+        directory = os.path.dirname(self.spool_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.spool_path, "a", encoding="utf-8") as spool_file:
+            for row in self._rows(pending):
+                spool_file.write(json.dumps(row) + "\n")
+        return len(pending)
+
+    def load_spool(self) -> int:
+        """
+        Move the increments left by a previous shutdown back into memory
+        """
+        # Renamed first so that only one of several starting workers replays it
+        claimed_path = f"{self.spool_path}.{os.getpid()}"
+        try:
+            os.replace(self.spool_path, claimed_path)
+        except FileNotFoundError:
+            return 0
+
+        count = 0
+        with open(claimed_path, encoding="utf-8") as spool_file:
+            for line in spool_file:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                self.add(
+                    row["user_id"],
+                    date.fromisoformat(row["date"]),
+                    row.get("sessions_completed", 0),
+                    row.get("total_time", 0),
+                )
+                count += 1
+        os.remove(claimed_path)
+        return count
+
+
+daily_log_buffer = DailyLogAccumulator(settings.DAILY_LOG_SPOOL_PATH)
+
+
+# Lifespan integration: replay the spool at startup, flush periodically and at shutdown
+
+async def _replay_spool() -> None:
+    replayed = await asyncio.to_thread(daily_log_buffer.load_spool)
+    if replayed:
+        logger.info("Replaying %d spooled daily log increment(s)", replayed)
+        await asyncio.to_thread(daily_log_buffer.flush)
+
+
+_flush_task: Optional[asyncio.Task] = None
+
+
+async def _flush_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.DAILY_LOG_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(daily_log_buffer.flush)
+        except Exception as e:
+            logger.warning("Daily log flush failed, retrying in %ss: %s", settings.DAILY_LOG_FLUSH_INTERVAL, e)
+
+
+async def _start_flush() -> None:
+    global _flush_task
+    _flush_task = asyncio.get_running_loop().create_task(_flush_loop())
+
+
+async def _stop_flush() -> None:
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        await asyncio.gather(_flush_task, return_exceptions=True)
+        _flush_task = None
+    try:
+        await asyncio.to_thread(daily_log_buffer.flush)
+    except Exception as e:
+        spooled = daily_log_buffer.spool()
+        logger.error("Final daily log flush failed, %d increment(s) spooled to %s: %s",
+                     spooled, daily_log_buffer.spool_path, e)
+
+
+register_warmup("daily_log_spool", _replay_spool)
+register_worker("daily_log_flush", _start_flush, _stop_flush)
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.api.services.reference_data import course_catalog
+from app.api.services.supabase import supabase
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMAT_VERSION = 1
+
+# Chapter metadata: the extracted content (json_data) is left out
+CHAPTER_COLUMNS = (
+    "id, course_id, title, description, order_index, chapter_type, content_type, source_url, "
+    "file_path, file_size, file_hash, file_uploaded_at, created_at, updated_at"
+)
+
+# (section, table, columns, owner column), in export order; chapters follow the user's courses
+EXPORT_SECTIONS: Tuple[Tuple[str, str, str, str], ...] = (
+    ("profile", "user_profiles", "*", "id"),
+    ("courses", "user_courses", "*", "user_id"),
+    ("chapters", "chapters", CHAPTER_COLUMNS, "course_id"),
+    ("course_progress", "user_course_progress", "*", "user_id"),
+    ("chapter_progress", "chapter_progress", "*", "user_id"),
+    ("activities", "activities", "*", "user_id"),
+    ("daily_logs", "daily_logs", "*", "user_id"),
+    ("quiz_results", "quiz_results", "*", "user_id"),
+)
+
+
+class ExportBusyError(RuntimeError):
+    """
+    Too many exports are running on this worker
+    """
+
+
+class ExportSlot:
+    """
+    An export slot reserved on the worker, released once
+    """
+
+    def __init__(self, exporter: "DataExporter") -> None:
+        self._exporter = exporter
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._exporter._running -= 1
+
+
+def _line(kind: str, data: Any) -> str:
+    return json.dumps({"type": kind, "data": data}, ensure_ascii=False, default=str) + "\n"
+
+
+def _fetch_page(query, section: str) -> Tuple[List[Dict[str, Any]], bytes]:
+    # Runs in a worker thread: the query and the encoding of its rows stay off the event loop
+    rows = query.execute().data or []
+    if section == "courses":
+        for row in rows:
+            course = course_catalog.get(row.get("course_id"))
+            row["course_name"] = course["name"] if course else None
+    return rows, "".join(_line(section, row) for row in rows).encode()
+
+
+class DataExporter:
+    """
+    Streams all of a user's study data as NDJSON
+
+    Each table is read in pages of EXPORT_PAGE_SIZE rows ordered by id, the
+    next page starting after the last id read (keyset pagination, an index
+    range read whatever the offset), so memory stays bounded by one page.
+    Queries and encoding run in worker threads, and new exports are refused
+    while EXPORT_MAX_CONCURRENT are running on the worker: the slot is reserved
+    by the request (reserve) and released when its stream ends.
+
+    Lines are {"type": <section>, "data": <row>}, between an "export" header
+    and an "end" line with the row count of each section; a stream without
+    the "end" line is incomplete.
+    """
+
+    def __init__(self) -> None:
+        self._running = 0
+
+    def reserve(self) -> ExportSlot:
+        """
+        Reserve an export slot, or raise ExportBusyError when EXPORT_MAX_CONCURRENT exports are already running
+
+        Check and reservation run without yielding to the event loop: concurrent requests cannot all pass.
+        """
+        if self._running >= settings.EXPORT_MAX_CONCURRENT:
+            raise ExportBusyError(f"{self._running} export(s) already running, retry later")
+        self._running += 1
+        return ExportSlot(self)
+
+    async def _pages(
+        self, section: str, table: str, columns: str, owner_column: str, owners: List[str]
+    ) -> AsyncIterator[Tuple[List[Dict[str, Any]], bytes]]:
+        last_id: Optional[str] = None
+        while True:
+            query = supabase.table(table).select(columns).in_(owner_column, owners).order("id")
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            rows, payload = await asyncio.to_thread(_fetch_page, query.limit(settings.EXPORT_PAGE_SIZE), section)
+            if rows:
+                yield rows, payload
+            if len(rows) < settings.EXPORT_PAGE_SIZE:
+                return
+            last_id = rows[-1]["id"]
+
+    async def stream(self, user_id: str, slot: ExportSlot) -> AsyncIterator[bytes]:
+        """
+        Yield the export of a user, one page of rows at a time, and release its slot at the end
+        """
+        counts: Dict[str, int] = {}
+        try:
+            yield _line("export", {
+                "user_id": str(user_id),
+                "exported_at": datetime.now(timezone.utc).isoformat(),
+                "format_version": EXPORT_FORMAT_VERSION,
+                "sections": [section for section, *_ in EXPORT_SECTIONS],
+            }).encode()
+
+            course_ids: List[str] = []
+            for section, table, columns, owner_column in EXPORT_SECTIONS:
+                owners = course_ids if section == "chapters" else [str(user_id)]
+                counts[section] = 0
+                if not owners:
+                    continue
+                async for rows, payload in self._pages(section, table, columns, owner_column, owners):
+                    counts[section] += len(rows)
+                    if section == "courses":
+                        course_ids.extend(
+                            str(row["course_id"]) for row in rows
+                            if row.get("course_id") and str(row["course_id"]) not in course_ids
+                        )
+                    yield payload
+
+            yield _line("end", {"counts": counts}).encode()
+        except Exception as e:
+            logger.warning("Export of user %s failed: %s", user_id, e)
+            yield _line("error", {"detail": f"Export interrupted: {str(e)}", "counts": counts}).encode()
+        finally:
+            slot.release()
+
+
+data_exporter = DataExporter()
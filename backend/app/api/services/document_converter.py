@@ -1,13 +1,20 @@
+import asyncio
 import os
 import subprocess
 import tempfile
+import threading
 import uuid
 from pathlib import Path
+from typing import Optional
 from fastapi import UploadFile, HTTPException
 import logging
 
 logger = logging.getLogger(__name__)
 
+class DocumentConversionError(Exception):
+    """Échec d'une conversion LibreOffice."""
+
+
 class DocumentConverter:
     """Service pour convertir différents formats de documents en PDF."""
     
@@ -31,6 +38,58 @@ class DocumentConverter:
         'application/rtf': '.rtf',
     }
     
+    # LibreOffice ne supporte pas plusieurs conversions simultanées sur le même profil :
+    # les conversions d'un worker sont sérialisées et utilisent un profil propre au processus
+    _soffice_lock = threading.Lock()
+    
+    @staticmethod
+    def convert_file(input_path: str, output_dir: str, target_format: str = "pdf", timeout: Optional[float] = None) -> str:
+        """
+        Convertit un fichier local avec LibreOffice (appel bloquant).
+        
+        Args:
+            input_path: Chemin du fichier à convertir
+            output_dir: Répertoire où écrire le fichier converti
+            target_format: Format cible (extension sans le point : pdf, docx, pptx...)
+            timeout: Durée maximale de la conversion en secondes
+            
+        Returns:
+            Chemin du fichier converti
+            
+        Raises:
+            DocumentConversionError: Si la conversion échoue
+        """
+        profile_dir = os.path.join(tempfile.gettempdir(), f"soffice-profile-{os.getpid()}")
+        output_path = os.path.join(output_dir, f"{Path(input_path).stem}.{target_format}")
+        
+        # --headless: mode sans interface graphique
+        # --convert-to: format de sortie
+        # --outdir: répertoire de sortie
+        command = [
+            "soffice",
+            f"-env:UserInstallation={Path(profile_dir).as_uri()}",
+            "--headless",
+            "--convert-to", target_format,
+            "--outdir", output_dir,
+            input_path
+        ]
+        try:
+            with DocumentConverter._soffice_lock:
+                process = subprocess.run(command, capture_output=True, text=True, check=True, timeout=timeout)
+        except subprocess.CalledProcessError as e:
+            raise DocumentConversionError(f"Échec de la conversion en {target_format}: {e.stderr}") from e
+        except subprocess.TimeoutExpired as e:
+            raise DocumentConversionError(f"Conversion en {target_format} interrompue après {timeout}s") from e
+        except FileNotFoundError as e:
+            raise DocumentConversionError("LibreOffice (soffice) n'est pas installé") from e
+        
+        # soffice peut terminer sans erreur sans produire de fichier (format illisible)
+        if not os.path.exists(output_path):
+            raise DocumentConversionError(f"Aucun fichier {target_format} produit: {process.stdout or process.stderr}")
+        
+        logger.info(f"Conversion réussie: {process.stdout}")
+        return output_path
+    
     @staticmethod
     async def convert_to_pdf(file: UploadFile) -> tuple[str, bytes]:
         """
@@ -58,64 +117,31 @@ class DocumentConverter:
                 detail=f"Format de fichier non pris en charge. Formats supportés: {supported_formats}"
             )
         
-        # Créer un répertoire temporaire pour les fichiers
-        temp_dir = tempfile.mkdtemp()
-        
-        try:
+        # Créer un répertoire temporaire pour les fichiers (supprimé avec son contenu)
+        with tempfile.TemporaryDirectory() as temp_dir:
             # Générer un nom de fichier unique
             extension = DocumentConverter.SUPPORTED_FORMATS[file.content_type]
-            temp_filename = f"{uuid.uuid4()}{extension}"
-            temp_filepath = os.path.join(temp_dir, temp_filename)
+            temp_filepath = os.path.join(temp_dir, f"{uuid.uuid4()}{extension}")
             
             # Écrire le fichier temporaire
             content = await file.read()
             with open(temp_filepath, "wb") as temp_file:
                 temp_file.write(content)
             
-            # Nom du fichier PDF de sortie
-            output_filename = f"{Path(temp_filename).stem}.pdf"
-            output_filepath = os.path.join(temp_dir, output_filename)
-            
-            # Conversion avec LibreOffice
+            # Conversion avec LibreOffice, hors de la boucle d'événements
             try:
-                # Utiliser soffice (LibreOffice) pour la conversion
-                # --headless: mode sans interface graphique
-                # --convert-to pdf: convertir en PDF
-                # --outdir: répertoire de sortie
-                process = subprocess.run([
-                    "soffice",
-                    "--headless",
-                    "--convert-to", "pdf",
-                    "--outdir", temp_dir,
-                    temp_filepath
-                ], capture_output=True, text=True, check=True)
-                
-                logger.info(f"Conversion réussie: {process.stdout}")
-                
-                # Lire le fichier PDF généré
-                with open(output_filepath, "rb") as pdf_file:
-                    pdf_content = pdf_file.read()
-                
-                # Retourner le nom original avec extension .pdf et le contenu
-                original_name = Path(file.filename).stem
-                return f"{original_name}.pdf", pdf_content
-                
-            except subprocess.CalledProcessError as e:
-                logger.error(f"Erreur lors de la conversion: {e.stderr}")
+                output_filepath = await asyncio.to_thread(DocumentConverter.convert_file, temp_filepath, temp_dir, "pdf")
+            except DocumentConversionError as e:
+                logger.error(f"Erreur lors de la conversion: {str(e)}")
                 raise HTTPException(
                     status_code=500,
                     detail="Erreur lors de la conversion du document en PDF"
                 )
-                
-        finally:
-            # Nettoyer les fichiers temporaires
-            for temp_file in os.listdir(temp_dir):
-                try:
-                    os.remove(os.path.join(temp_dir, temp_file))
-                except Exception as e:
-                    logger.warning(f"Impossible de supprimer le fichier temporaire {temp_file}: {e}")
             
-            try:
-                os.rmdir(temp_dir)
-            except Exception as e:
-                logger.warning(f"Impossible de supprimer le répertoire temporaire {temp_dir}: {e}")
+            # Lire le fichier PDF généré
+            with open(output_filepath, "rb") as pdf_file:
+                pdf_content = pdf_file.read()
+            
+            # Retourner le nom original avec extension .pdf et le contenu
+            original_name = Path(file.filename).stem
+            return f"{original_name}.pdf", pdf_content
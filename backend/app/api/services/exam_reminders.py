@@ -0,0 +1,245 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.api.services.reference_data import course_catalog
+from app.api.services.supabase import fetch_rows, supabase
+from app.core.config import settings
+from app.core.events import event_bus
+from app.core.lifespan import register_worker
+
+logger = logging.getLogger(__name__)
+
+
+class NotifierError(RuntimeError):
+    """
+    A reminder could not be delivered
+    """
+
+
+class Notifier(ABC):
+    """
+    Delivery channel of exam reminders
+    """
+
+    @abstractmethod
+    async def send(self, reminder: Dict[str, Any]) -> None:
+        """
+        Deliver a reminder, or raise NotifierError
+        """
+
+    async def close(self) -> None:
+        pass
+
+
+class LogNotifier(Notifier):
+    """
+    Local stand-in: logs the reminder and sends it to the user's open event streams
+    """
+
+    async def send(self, reminder: Dict[str, Any]) -> None:
+        logger.info(
+            "Exam reminder %s for user %s: %s in %s day(s)",
+            reminder["reminder"], reminder["user_id"], reminder["course_name"], reminder["days_left"],
+        )
+        event_bus.publish(reminder["user_id"], "exam.reminder", reminder)
+
+
+class WebhookNotifier(Notifier):
+    """
+    Posts each reminder as JSON to REMINDER_WEBHOOK_URL (email or push delivery service)
+    """
+
+    def __init__(self, url: str, timeout: float) -> None:
+        self.url = url
+        self.client = httpx.AsyncClient(timeout=timeout)
+
+    async def send(self, reminder: Dict[str, Any]) -> None:
+        try:
+            response = await self.client.post(self.url, json=reminder)
+        except httpx.HTTPError as e:
+            raise NotifierError(f"Reminder webhook unreachable: {e}") from e
+        if response.status_code >= 400:
+            raise NotifierError(f"Reminder webhook error {response.status_code}: {response.text[:500]}")
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def create_notifier() -> Notifier:
+    """
+    Build the notifier selected by REMINDER_NOTIFIER
+    """
+    if settings.REMINDER_NOTIFIER == "log":
+        return LogNotifier()
+    if settings.REMINDER_NOTIFIER == "webhook":
+        if not settings.REMINDER_WEBHOOK_URL:
+            raise NotifierError("REMINDER_WEBHOOK_URL must be set for the webhook notifier")
+        return WebhookNotifier(settings.REMINDER_WEBHOOK_URL, settings.REMINDER_WEBHOOK_TIMEOUT)
+    raise NotifierError(f"Unknown reminder notifier: {settings.REMINDER_NOTIFIER}")
+
+
+async def fetch_user_reminders(user_id: str) -> List[Dict[str, Any]]:
+    """
+    Exam reminders of a user, next reminder first (reminders all sent last)
+    """
+    return await fetch_rows(
+        supabase.table("j_reminders")
+        .select("*")
+        .eq("user_id", user_id)
+        .order("next_reminder_on")
+    )
+
+
+def _as_date(value: Any) -> date:
+    return value if isinstance(value, date) else datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+class ReminderDispatcher:
+    """
+    Sends the exam reminders due on a day
+
+    Reminder dates are computed by trigger when exam_date is set or changed on
+    user_courses (table j_reminders, migration 18).
+    Due reminders are claimed in batches by claim_due_j_reminders, so a
+    reminder is sent once even with several workers. Only the reminders sent
+    (or whose exam is over) are moved to their next reminder date
+    (complete_j_reminders); the claims of failed sends are released and the
+    day's run is retried at the next check. After downtime, only the latest
+    due reminder is sent, late, with the days actually left.
+    """
+
+    def __init__(self, notifier: Notifier) -> None:
+        self.notifier = notifier
+        self._last_run: Optional[date] = None
+
+    async def _claim(self, today: date) -> List[Dict[str, Any]]:
+        response = await asyncio.to_thread(
+            supabase.rpc("claim_due_j_reminders", {
+                "p_today": today.isoformat(),
+                "p_limit": settings.REMINDERS_BATCH_SIZE,
+                "p_lease_seconds": settings.REMINDERS_CLAIM_TIMEOUT,
+            }).execute
+        )
+        return response.data or []
+
+    async def _complete(self, ids: List[str], today: date) -> None:
+        await asyncio.to_thread(
+            supabase.rpc("complete_j_reminders", {"p_ids": ids, "p_today": today.isoformat()}).execute
+        )
+
+    async def _release(self, ids: List[str]) -> None:
+        await asyncio.to_thread(supabase.rpc("release_j_reminders", {"p_ids": ids}).execute)
+
+    async def _send(self, row: Dict[str, Any], today: date) -> Optional[bool]:
+        """
+        Send a claimed reminder: True when sent, False when the exam is over, None on failure
+        """
+        exam_date = _as_date(row["exam_date"])
+        if exam_date < today:
+            return False
+        course = await course_catalog.aget(row.get("course_id"))
+        reminder = {
+            "id": row["id"],
+            "user_id": row["user_id"],
+            "user_course_id": row["user_course_id"],
+            "course_id": row.get("course_id"),
+            "course_name": course["name"] if course else None,
+            "reminder": row["reminder"],
+            "exam_date": exam_date.isoformat(),
+            "days_left": (exam_date - today).days,
+        }
+        try:
+            await self.notifier.send(reminder)
+            return True
+        except Exception as e:
+            logger.warning("Could not send %s reminder %s: %s", row["reminder"], row["id"], e)
+            return None
+
+    async def run(self, today: Optional[date] = None) -> Tuple[int, int]:
+        """
+        Send every reminder due on a day (today by default)
+
+        Failed reminders stay claimed until the end of the run, then are released.
+
+        Returns:
+            (number of reminders sent, number of failed sends)
+        """
+        today = today or date.today()
+        sent = 0
+        failed: List[str] = []
+        try:
+            while True:
+                rows = await self._claim(today)
+                if not rows:
+                    return sent, len(failed)
+                results = await asyncio.gather(*(self._send(row, today) for row in rows))
+                done = [str(row["id"]) for row, result in zip(rows, results) if result is not None]
+                failed.extend(str(row["id"]) for row, result in zip(rows, results) if result is None)
+                if done:
+                    await self._complete(done, today)
+                sent += sum(1 for result in results if result)
+        finally:
+            if failed:
+                await self._release(failed)
+
+    async def run_daily(self) -> int:
+        """
+        Send the reminders of the day once after REMINDERS_HOUR, again at each check while sends fail
+        """
+        today = date.today()
+        if self._last_run == today or datetime.now().hour < settings.REMINDERS_HOUR:
+            return 0
+        sent, failed = await self.run(today)
+        if failed:
+            logger.warning("Exam reminders: %d send(s) failed, retrying in %ss", failed, settings.REMINDERS_INTERVAL)
+        else:
+            self._last_run = today
+        return sent
+
+
+# Lifespan integration: daily dispatch of exam reminders
+
+_dispatcher: Optional[ReminderDispatcher] = None
+_job_task: Optional[asyncio.Task] = None
+
+
+async def _job_loop() -> None:
+    while True:
+        try:
+            sent = await _dispatcher.run_daily()
+            if sent:
+                logger.info("Exam reminders: %d sent", sent)
+        except Exception as e:
+            logger.warning("Exam reminders run failed, retrying in %ss: %s", settings.REMINDERS_INTERVAL, e)
+        await asyncio.sleep(settings.REMINDERS_INTERVAL)
+
+
+async def _start_job() -> None:
+    global _dispatcher, _job_task
+    if settings.REMINDERS_INTERVAL <= 0:
+        return
+    try:
+        _dispatcher = ReminderDispatcher(create_notifier())
+    except NotifierError as e:
+        logger.warning("Exam reminders job disabled: %s", e)
+        return
+    _job_task = asyncio.get_running_loop().create_task(_job_loop())
+
+
+async def _stop_job() -> None:
+    global _dispatcher, _job_task
+    if _job_task is not None:
+        _job_task.cancel()
+        await asyncio.gather(_job_task, return_exceptions=True)
+        _job_task = None
+    if _dispatcher is not None:
+        await _dispatcher.notifier.close()
+        _dispatcher = None
+
+
+register_worker("exam_reminders", _start_job, _stop_job)
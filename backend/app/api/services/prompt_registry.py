@@ -0,0 +1,349 @@
+import hashlib
+import json
+import logging
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.api.services.ai_prompts import AI_BATCH_INSTRUCTIONS, AI_BATCH_TYPES, AI_PROMPT_REVISIONS, AI_PROMPTS
+from app.core.config import settings
+
+try:
+    import tiktoken
+except ImportError:  # optional: token counts are estimated without it
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Heading of the chapter excerpts added to a request
+CONTEXT_HEADER = "Extraits du chapitre (les plus pertinents pour cette demande) :"
+# Marker replacing the end of a student input cut to fit the budget
+TRUNCATION_MARKER = " […]"
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_TERM_RE = re.compile(r"\w{3,}")
+# Frequent French words, ignored when ranking chapter chunks
+_STOP_WORDS = frozenset("""
+    les des une que qui dans pour par sur avec est sont pas plus ses son cette ces aux
+    mais comme ont été être fait faire tout tous elle elles ils nous vous leur leurs
+    entre donc dont car aussi sans sous très peut même autre autres ainsi alors
+""".split())
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Number of tokens of a text: exact with tiktoken, estimated otherwise
+
+    The estimate counts one token per punctuation sign and one per 4 characters
+    of each word, which slightly overestimates French text.
+    """
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text))
+    return sum(max(1, math.ceil(len(token) / 4)) for token in _TOKEN_RE.findall(text))
+
+
+def _terms(text: str) -> List[str]:
+    return [term for term in _TERM_RE.findall(text.lower()) if term not in _STOP_WORDS and not term.isdigit()]
+
+
+class PromptTemplate:
+    """
+    Instructions of an interaction type, normalized and measured once at registration
+    """
+
+    def __init__(self, name: str, text: str, revision: int) -> None:
+        # Trailing spaces and runs of blank lines cost tokens without helping the model
+        lines = [line.rstrip() for line in text.strip().splitlines()]
+        self.text = re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+        self.name = name
+        self.revision = revision
+        # The digest changes the version even if the revision was not bumped
+        self.version = f"{revision}-{hashlib.sha256(self.text.encode('utf-8')).hexdigest()[:8]}"
+        self.tokens = count_tokens(self.text)
+
+
+class PromptRegistry:
+    """
+    Versioned instruction templates by interaction type
+    """
+
+    def __init__(self) -> None:
+        self._templates: Dict[str, PromptTemplate] = {}
+
+    def register(self, name: str, text: str, revision: int = 1) -> PromptTemplate:
+        template = PromptTemplate(name, text, revision)
+        if template.tokens >= settings.AI_PROMPT_TOKEN_BUDGET:
+            logger.warning(
+                "Prompt %s (%d tokens) exceeds AI_PROMPT_TOKEN_BUDGET (%d)",
+                name, template.tokens, settings.AI_PROMPT_TOKEN_BUDGET,
+            )
+        self._templates[name] = template
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        return self._templates[name]
+
+    def versions(self) -> Dict[str, str]:
+        return {name: template.version for name, template in self._templates.items()}
+
+
+class ContextChunk:
+    """
+    Passage of a chapter, with its token count and term frequencies
+    """
+
+    __slots__ = ("position", "label", "text", "tokens", "terms")
+
+    def __init__(self, position: int, label: str, text: str) -> None:
+        self.position = position
+        self.label = label
+        self.text = text
+        self.tokens = count_tokens(text)
+        self.terms = Counter(_terms(text))
+
+
+def _table_text(rows: Any) -> str:
+    return "\n".join(" | ".join(str(cell or "").strip() for cell in row) for row in rows or [] if any(row))
+
+
+def _page_passages(json_data: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    """
+    (label, text) of each block of extracted text, in document order (PDF, DOCX and PPTX layouts)
+    """
+    unit = "Diapositive" if json_data.get("type") == "pptx" else "Page"
+    for index, page in enumerate(json_data.get("pages") or []):
+        if not isinstance(page, dict):
+            continue
+        label = f"{unit} {page.get('slide_num') or page.get('page_num') or index + 1}"
+        blocks = page.get("content_blocks")
+        if blocks:
+            for block in blocks:
+                if block.get("type") in ("paragraph", "text"):
+                    yield label, block.get("text") or ""
+                elif block.get("type") == "table":
+                    yield label, _table_text(block.get("data"))
+        else:
+            yield label, page.get("text") or ""
+            for table in page.get("tables") or []:
+                yield label, _table_text(table)
+
+
+def chunk_chapter(json_data: Optional[Dict[str, Any]], chunk_tokens: int) -> List[ContextChunk]:
+    """
+    Split the extracted content of a chapter into passages of about chunk_tokens tokens
+
+    Paragraphs are kept whole when they fit; a chunk never spans two pages.
+    """
+    chunks: List[ContextChunk] = []
+    if not isinstance(json_data, dict):
+        return chunks
+
+    def flush(label: str, parts: List[str]) -> None:
+        text = "\n".join(parts).strip()
+        if text:
+            chunks.append(ContextChunk(len(chunks), label, text))
+
+    current_label, parts, size = None, [], 0
+    for label, text in _page_passages(json_data):
+        if label != current_label:
+            if current_label is not None:
+                flush(current_label, parts)
+            current_label, parts, size = label, [], 0
+        for paragraph in re.split(r"\n\s*\n", text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            tokens = count_tokens(paragraph)
+            if size and size + tokens > chunk_tokens:
+                flush(label, parts)
+                parts, size = [], 0
+            if tokens > chunk_tokens:
+                # Oversized paragraph (PDF pages often have no blank lines): split on lines
+                for line in paragraph.splitlines():
+                    line_tokens = count_tokens(line)
+                    if size and size + line_tokens > chunk_tokens:
+                        flush(label, parts)
+                        parts, size = [], 0
+                    parts.append(line)
+                    size += line_tokens
+            else:
+                parts.append(paragraph)
+                size += tokens
+    if current_label is not None:
+        flush(current_label, parts)
+    return chunks
+
+
+def rank_chunks(chunks: List[ContextChunk], query: str) -> List[ContextChunk]:
+    """
+    Chunks sorted by BM25 relevance to the query (document order when nothing matches)
+    """
+    query_terms = set(_terms(query))
+    if not chunks or not query_terms:
+        return list(chunks)
+    average_length = sum(sum(chunk.terms.values()) for chunk in chunks) / len(chunks) or 1.0
+    document_frequency = Counter(term for chunk in chunks for term in query_terms if term in chunk.terms)
+
+    def score(chunk: ContextChunk) -> float:
+        length = sum(chunk.terms.values())
+        total = 0.0
+        for term in query_terms:
+            frequency = chunk.terms.get(term, 0)
+            if not frequency:
+                continue
+            idf = math.log(1 + (len(chunks) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            total += idf * frequency * 2.2 / (frequency + 1.2 * (0.25 + 0.75 * length / average_length))
+        return total
+
+    return sorted(chunks, key=lambda chunk: (-score(chunk), chunk.position))
+
+
+def fit_content(content: Any, max_tokens: int) -> Tuple[str, int, bool]:
+    """
+    Serialize the student input, shortening its longest texts until it fits in max_tokens
+
+    JSON payloads stay valid: only string values are cut, longest first.
+
+    Returns:
+        (text, tokens, truncated)
+    """
+    def serialize(value: Any) -> str:
+        return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+    text = serialize(content)
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text, tokens, False
+
+    if isinstance(content, str):
+        # Cut proportionally, then adjust: the token count is not linear in characters
+        length = int(len(content) * max_tokens / tokens)
+        while length > 0:
+            text = content[:length] + TRUNCATION_MARKER
+            tokens = count_tokens(text)
+            if tokens <= max_tokens:
+                break
+            length = int(length * 0.9)
+        return text, tokens, True
+
+    content = json.loads(json.dumps(content))
+
+    def longest_string(value: Any, holder: Any = None, key: Any = None, best: Any = None) -> Any:
+        if isinstance(value, str):
+            if best is None or len(value) > len(best[0]):
+                best = (value, holder, key)
+        elif isinstance(value, dict):
+            for child_key, child in value.items():
+                best = longest_string(child, value, child_key, best)
+        elif isinstance(value, list):
+            for index, child in enumerate(value):
+                best = longest_string(child, value, index, best)
+        return best
+
+    while tokens > max_tokens:
+        best = longest_string(content)
+        if best is None or best[1] is None or len(best[0]) <= 80:
+            break
+        value, holder, key = best
+        if value.endswith(TRUNCATION_MARKER):
+            value = value[:-len(TRUNCATION_MARKER)]
+        # Remove the excess from this string alone (JSON escaping makes it a slight underestimate)
+        value_tokens = count_tokens(value)
+        keep = max(int(len(value) * (value_tokens - (tokens - max_tokens) - 2) / value_tokens), 64)
+        holder[key] = value[:min(keep, len(value) - 16)] + TRUNCATION_MARKER
+        text = serialize(content)
+        tokens = count_tokens(text)
+    return text, tokens, True
+
+
+class AssembledPrompt:
+    """
+    Request content (chapter excerpts and student input) fitted to the token budget
+    """
+
+    __slots__ = ("body", "tokens", "context_chunks", "truncated")
+
+    def __init__(self, body: str, tokens: int, context_chunks: int, truncated: bool) -> None:
+        self.body = body
+        self.tokens = tokens
+        self.context_chunks = context_chunks
+        self.truncated = truncated
+
+
+def assemble(
+    template: PromptTemplate,
+    content: Any,
+    chunks: Optional[List[ContextChunk]] = None,
+    budget: Optional[int] = None,
+) -> AssembledPrompt:
+    """
+    Build the request body sent after the instructions, within the token budget
+
+    The instructions are always counted, even when a reused thread does not
+    resend them, so the same request gives the same body. The student input is
+    kept up to AI_PROMPT_INPUT_MAX_TOKENS; the rest of the budget goes to the
+    chapter chunks most relevant to it, given back in document order. The
+    student input comes last, where the model expects the payload to evaluate.
+    """
+    budget = budget or settings.AI_PROMPT_TOKEN_BUDGET
+    available = max(budget - template.tokens, 0)
+    text, tokens, truncated = fit_content(content, min(settings.AI_PROMPT_INPUT_MAX_TOKENS, available))
+    available -= tokens
+
+    selected: List[ContextChunk] = []
+    if chunks:
+        available -= count_tokens(CONTEXT_HEADER) + 2
+        for chunk in rank_chunks(chunks, text):
+            # Label line and separator
+            cost = chunk.tokens + 8
+            if cost <= available:
+                selected.append(chunk)
+                available -= cost
+        truncated = truncated or len(selected) < len(chunks)
+
+    if not selected:
+        return AssembledPrompt(text, tokens, 0, truncated)
+    excerpts = "\n\n".join(f"[{chunk.label}]\n{chunk.text}" for chunk in sorted(selected, key=lambda chunk: chunk.position))
+    body = f"{CONTEXT_HEADER}\n\n{excerpts}\n\n---\n\n{text}"
+    return AssembledPrompt(body, count_tokens(body), len(selected), truncated)
+
+
+class ChunkCache:
+    """
+    In-memory LRU of chunked chapters, keyed by (chapter id, file hash)
+
+    The file hash changes with every upload, so a stale entry is never served.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str], List[ContextChunk]]" = OrderedDict()
+
+    def get(self, key: Tuple[str, str]) -> Optional[List[ContextChunk]]:
+        chunks = self._entries.get(key)
+        if chunks is not None:
+            self._entries.move_to_end(key)
+        return chunks
+
+    def put(self, key: Tuple[str, str], chunks: List[ContextChunk]) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key] = chunks
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+prompt_registry = PromptRegistry()
+for _name, _text in AI_PROMPTS.items():
+    prompt_registry.register(_name, _text, AI_PROMPT_REVISIONS.get(_name, 1))
+for _name in AI_BATCH_TYPES:
+    prompt_registry.register(
+        f"{_name}_batch", f"{AI_PROMPTS[_name]}\n{AI_BATCH_INSTRUCTIONS}", AI_PROMPT_REVISIONS.get(_name, 1)
+    )
@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.api.services.supabase import supabase
+from app.core.config import settings
+from app.core.events import event_bus
+from app.core.lifespan import register_warmup, register_worker
+
+logger = logging.getLogger(__name__)
+
+# Minimum delay between two refreshes triggered by a cache miss
+MISS_REFRESH_INTERVAL = 5.0
+# Broadcast to the other workers when a cache is written through the API
+CHANGED_EVENT = "reference_data.changed"
+
+
+class ReferenceDataCache:
+    """
+    Versioned in-memory copy of a small, rarely modified table
+
+    The whole table is reloaded periodically by a background worker and on
+    demand when an unknown id is requested; writes made through the API
+    update the cache directly, and the other workers reload it when a fan-out
+    is configured (EVENTS_REDIS_URL; otherwise within REFERENCE_DATA_REFRESH_INTERVAL).
+    Reloads requested on the event loop run in a worker thread: handlers use
+    aget/aall, which wait for them.
+    `version` increases every time the content changes.
+    """
+
+    def __init__(self, table: str, columns: str = "*") -> None:
+        self.table = table
+        self.columns = columns
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._pending: Optional[asyncio.Task] = None
+        self._attempted_at = float("-inf")
+
+    def refresh(self) -> bool:
+        """
+        Reload the table from Supabase
+
+        The query runs without the lock (writes applied meanwhile through upsert
+        or remove are kept: the result is then discarded).
+
+        Returns:
+            True if the content changed
+        """
+        self._attempted_at = time.monotonic()
+        version = self.version
+        response = supabase.table(self.table).select(self.columns).execute()
+        rows = {str(row["id"]): row for row in response.data or []}
+        with self._lock:
+            if self.version != version:
+                return False
+            changed = rows != self._rows
+            if changed:
+                self._rows = rows
+                self.version += 1
+            self.loaded_at = time.monotonic()
+            return changed
+
+    def refresh_soon(self) -> None:
+        """
+        Reload the table without blocking the event loop
+
+        On the event loop, the reload runs in a worker thread (one at a time)
+        and the current content is served meanwhile; elsewhere (scripts, worker
+        threads) it runs at once.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.refresh()
+            return
+        if self._pending is None:
+            self._pending = loop.create_task(self._refresh_in_thread())
+
+    async def _refresh_in_thread(self) -> None:
+        try:
+            await asyncio.to_thread(self.refresh)
+        except Exception as e:
+            logger.warning("Reference data %s refresh failed: %s", self.table, e)
+        finally:
+            self._pending = None
+
+    async def _reload(self) -> None:
+        # Joins the reload already running, else starts one at most once per MISS_REFRESH_INTERVAL
+        if self._pending is None:
+            if time.monotonic() - self._attempted_at <= MISS_REFRESH_INTERVAL:
+                return
+            self._pending = asyncio.get_running_loop().create_task(self._refresh_in_thread())
+        await asyncio.shield(self._pending)
+
+    def _is_stale(self) -> bool:
+        # Scripts and jobs running without the lifespan refresh lazily
+        max_age = settings.REFERENCE_DATA_REFRESH_INTERVAL * 2
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > max_age
+
+    async def ensure_loaded(self) -> None:
+        """
+        Load the table in a worker thread when it was never loaded or is stale
+        """
+        if self._is_stale():
+            await self._reload()
+
+    async def aget(self, row_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        Return a copy of the row, or None if it does not exist (on the event loop)
+
+        A cold cache or an unknown id (possibly created by another worker) is
+        reloaded in a worker thread before answering.
+        """
+        if row_id is None:
+            return None
+        await self.ensure_loaded()
+        key = str(row_id)
+        if key not in self._rows:
+            await self._reload()
+        row = self._rows.get(key)
+        return dict(row) if row is not None else None
+
+    async def aall(self) -> List[Dict[str, Any]]:
+        await self.ensure_loaded()
+        return [dict(row) for row in self._rows.values()]
+
+    def get(self, row_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        Return a copy of the row, or None if it does not exist (worker threads and scripts; see aget)
+        """
+        if row_id is None:
+            return None
+        if self._is_stale():
+            self.refresh_soon()
+        key = str(row_id)
+        row = self._rows.get(key)
+        if row is None and time.monotonic() - self._attempted_at > MISS_REFRESH_INTERVAL:
+            # Possibly created by another worker since the last refresh
+            self.refresh_soon()
+            row = self._rows.get(key)
+        return dict(row) if row is not None else None
+
+    def all(self) -> List[Dict[str, Any]]:
+        if self._is_stale():
+            self.refresh_soon()
+        return [dict(row) for row in self._rows.values()]
+
+    def upsert(self, row: Dict[str, Any]) -> None:
+        """
+        Apply a write made through the API without waiting for the next refresh
+        """
+        with self._lock:
+            rows = dict(self._rows)
+            rows[str(row["id"])] = row
+            self._rows = rows
+            self.version += 1
+        event_bus.broadcast(CHANGED_EVENT, {"table": self.table})
+
+    def remove(self, row_id: Any) -> None:
+        with self._lock:
+            if str(row_id) in self._rows:
+                rows = dict(self._rows)
+                del rows[str(row_id)]
+                self._rows = rows
+                self.version += 1
+        event_bus.broadcast(CHANGED_EVENT, {"table": self.table})
+
+    def invalidate(self) -> None:
+        """
+        Force a reload on next access
+        """
+        self.loaded_at = None
+
+
+activity_types = ReferenceDataCache("activity_types")
+course_catalog = ReferenceDataCache("courses")
+
+REFERENCE_CACHES = (activity_types, course_catalog)
+
+
+def _on_reference_data_changed(data: Dict[str, Any]) -> None:
+    # Written through the API on another worker
+    for cache in REFERENCE_CACHES:
+        if cache.table == data.get("table"):
+            cache.refresh_soon()
+
+
+event_bus.on_broadcast(CHANGED_EVENT, _on_reference_data_changed)
+
+
+async def attach_activity_types(activities: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Resolve `activity_type_id` locally, in place of an `activity_types(*)` join
+    """
+    activities = list(activities)
+    for activity in activities:
+        activity["activity_types"] = await activity_types.aget(activity.get("activity_type_id")) or {}
+    return activities
+
+
+# Lifespan integration: warm at startup, then refresh periodically
+
+async def _warm_reference_data() -> None:
+    await asyncio.gather(*(asyncio.to_thread(cache.refresh) for cache in REFERENCE_CACHES))
+
+
+_refresh_task: Optional[asyncio.Task] = None
+
+
+async def _refresh_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.REFERENCE_DATA_REFRESH_INTERVAL)
+        for cache in REFERENCE_CACHES:
+            try:
+                if await asyncio.to_thread(cache.refresh):
+                    logger.info("Reference data %s refreshed (version %d)", cache.table, cache.version)
+            except Exception as e:
+                logger.warning("Reference data %s refresh failed: %s", cache.table, e)
+
+
+async def _start_refresh() -> None:
+    global _refresh_task
+    _refresh_task = asyncio.get_running_loop().create_task(_refresh_loop())
+
+
+async def _stop_refresh() -> None:
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        await asyncio.gather(_refresh_task, return_exceptions=True)
+        _refresh_task = None
+
+
+register_warmup("reference_data", _warm_reference_data)
+register_worker("reference_data_refresh", _start_refresh, _stop_refresh)
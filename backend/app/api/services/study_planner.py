@@ -0,0 +1,257 @@
+import math
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# Duration of an activity type without measurements, in minutes
+DEFAULT_ACTIVITY_MINUTES = 30
+# Granularity of the weekly time budget, in minutes
+TIME_UNIT = 5
+
+# Days of user_profiles.availability (SettingsForm), Monday first
+WEEKDAYS = ("lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche")
+
+_SLOT_RE = re.compile(r"^\s*(\d{1,2})h(\d{2})?\s*-\s*(\d{1,2})h(\d{2})?\s*$")
+
+
+def week_start(day: date) -> date:
+    """
+    Monday of the week of a day
+    """
+    return day - timedelta(days=day.weekday())
+
+
+def parse_slot(slot: str) -> Optional[Tuple[int, int]]:
+    """
+    Bounds of an availability slot such as "18h-22h", in minutes from midnight
+
+    A slot ending before it starts ("22h-2h") runs past midnight and stays on its day.
+    """
+    match = _SLOT_RE.match(slot)
+    if not match:
+        return None
+    start = int(match.group(1)) * 60 + int(match.group(2) or 0)
+    end = int(match.group(3)) * 60 + int(match.group(4) or 0)
+    if end <= start:
+        end += 24 * 60
+    return start, end
+
+
+def _clock(minutes: int) -> str:
+    minutes %= 24 * 60
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _as_date(value: Any) -> Optional[date]:
+    if not value:
+        return None
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    return value
+
+
+def exam_priority(exam_date: Optional[date], today: date) -> int:
+    """
+    Urgency of a course: 3 when the exam is within a week, 2 within a month, 1 later, 0 without exam
+    """
+    if exam_date is None:
+        return 0
+    days_until_exam = (exam_date - today).days
+    if days_until_exam <= 7:
+        return 3
+    if days_until_exam <= 30:
+        return 2
+    return 1
+
+
+def activity_priority(activity: Dict[str, Any]) -> float:
+    """
+    Priority of an activity: required activities count twice, scaled by the type weight
+    """
+    activity_type = activity.get("activity_types") or {}
+    return (2 if activity_type.get("is_required", False) else 1) * (activity_type.get("weight") or 1.0)
+
+
+class _Day:
+    __slots__ = ("date", "slots", "capacity", "used", "items")
+
+    def __init__(self, day: date, slots: List[List[Any]], capacity: int) -> None:
+        self.date = day
+        # [name, start, end, used minutes] per availability slot
+        self.slots = slots
+        self.capacity = capacity
+        self.used = 0
+        self.items: List[Tuple[Dict[str, Any], Optional[List[Any]], int]] = []
+
+    def place(self, item: Dict[str, Any]) -> bool:
+        minutes = item["minutes"]
+        if self.used + minutes > self.capacity:
+            return False
+        for slot in self.slots:
+            name, start, end, used = slot
+            if end - start - used >= minutes:
+                self.items.append((item, slot, start + used))
+                slot[3] += minutes
+                self.used += minutes
+                return True
+        return False
+
+
+class WeeklyPlanner:
+    """
+    Plans the remaining days of a week at once
+
+    Activities are chosen by a 0/1 knapsack over the time left for the week
+    (weekly goal minus the time already studied, and no more than the days can
+    hold), maximizing the sum of their values: activity priority scaled by the
+    exam urgency and the progress left in the course. The chosen activities are
+    then assigned earliest deadline first (the day before their course's exam)
+    to the first availability slot that holds them, within the daily goal;
+    activities that do not fit are replaced by the next best ones. Reviews of
+    the spaced-repetition schedule are planned no earlier than their due date.
+    """
+
+    def __init__(
+        self,
+        first_day: date,
+        last_day: date,
+        availability: Optional[Dict[str, List[str]]],
+        daily_goal: int,
+        weekly_budget: int,
+        today: Optional[date] = None,
+    ) -> None:
+        self.today = today or date.today()
+        self.weekly_budget = max(0, weekly_budget)
+        self.days: List[_Day] = []
+        availability = {day.lower(): slots for day, slots in (availability or {}).items()}
+        # Without any availability, every day is open up to the daily goal
+        any_slot = any(parse_slot(slot) for slots in availability.values() for slot in slots or [])
+
+        day = first_day
+        while day <= last_day:
+            if any_slot:
+                slots = [
+                    [slot, *bounds, 0]
+                    for slot in availability.get(WEEKDAYS[day.weekday()]) or []
+                    if (bounds := parse_slot(slot))
+                ]
+                slots.sort(key=lambda slot: slot[1])
+            else:
+                slots = [[None, 0, daily_goal, 0]]
+            open_minutes = sum(end - start for _, start, end, _ in slots)
+            self.days.append(_Day(day, slots, min(daily_goal, open_minutes)))
+            day += timedelta(days=1)
+
+    def item(
+        self,
+        activity: Dict[str, Any],
+        course: Dict[str, Any],
+        exam_date: Any = None,
+        progression_rate: Optional[float] = None,
+        minutes: Optional[int] = None,
+        review: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Candidate activity with its duration, value and the indexes of the first and last days it may be planned
+
+        A review (review_items row) is planned from its due date; overdue reviews are worth more.
+        """
+        exam_date = _as_date(exam_date)
+        priority = activity_priority(activity)
+        progress_left = 100 - (progression_rate or 0)
+        value = priority * (1 + exam_priority(exam_date, self.today)) * (1 + progress_left / 100)
+
+        deadline = len(self.days) - 1
+        if exam_date is not None and self.days and exam_date >= self.days[0].date:
+            # Study before the exam day, or on it when the exam is the first day
+            deadline = min(deadline, max(0, (exam_date - self.days[0].date).days - 1))
+
+        release = 0
+        if review is not None:
+            due_date = _as_date(review.get("due_date")) or self.today
+            if self.days:
+                release = min(deadline, max(0, (due_date - self.days[0].date).days))
+            # A due review is worth more than an activity of a course not started
+            overdue = max(0, (self.today - due_date).days)
+            value = priority * (1 + exam_priority(exam_date, self.today)) * (2 + min(overdue + 1, 8) / 8)
+        return {
+            "activity": activity,
+            "course": course,
+            "minutes": max(TIME_UNIT, math.ceil((minutes or DEFAULT_ACTIVITY_MINUTES) / TIME_UNIT) * TIME_UNIT),
+            "priority": priority,
+            "value": value,
+            "release": release,
+            "deadline": deadline,
+            "review": review,
+        }
+
+    def _knapsack(self, items: List[Dict[str, Any]], capacity: int) -> List[Dict[str, Any]]:
+        units = capacity // TIME_UNIT
+        best = [0.0] * (units + 1)
+        taken: List[bytearray] = []
+        for item in items:
+            weight = item["minutes"] // TIME_UNIT
+            keep = bytearray(units + 1)
+            for used in range(units, weight - 1, -1):
+                candidate = best[used - weight] + item["value"]
+                if candidate > best[used]:
+                    best[used] = candidate
+                    keep[used] = 1
+            taken.append(keep)
+
+        chosen = []
+        used = units
+        for index in range(len(items) - 1, -1, -1):
+            if taken[index][used]:
+                chosen.append(items[index])
+                used -= items[index]["minutes"] // TIME_UNIT
+        return chosen
+
+    def _place(self, item: Dict[str, Any]) -> bool:
+        return any(day.place(item) for day in self.days[item["release"]:item["deadline"] + 1])
+
+    def solve(self, items: List[Dict[str, Any]]) -> Dict[date, Dict[str, Any]]:
+        """
+        Plan the candidate items over the days
+
+        Returns:
+            {day: {"activities": [...], "total_time": minutes}} for every day of the plan
+        """
+        capacity = min(self.weekly_budget, sum(day.capacity for day in self.days))
+        chosen = self._knapsack(items, capacity)
+        chosen_ids = {id(item) for item in chosen}
+
+        remaining = capacity
+        for item in sorted(chosen, key=lambda item: (item["deadline"], -item["value"] / item["minutes"])):
+            if item["minutes"] <= remaining and self._place(item):
+                remaining -= item["minutes"]
+        # Fill the time left by activities that did not fit with the best others
+        for item in sorted(items, key=lambda item: -item["value"] / item["minutes"]):
+            if id(item) not in chosen_ids and item["minutes"] <= remaining and self._place(item):
+                remaining -= item["minutes"]
+
+        plan = {}
+        for day in self.days:
+            day.items.sort(key=lambda entry: entry[2])
+            plan[day.date] = {
+                "activities": [
+                    {
+                        "id": item["activity"]["id"],
+                        "type": (item["activity"].get("activity_types") or {}).get("name"),
+                        "course_name": item["course"].get("name"),
+                        "chapter_title": item["activity"]["chapters"]["title"] if item["activity"].get("chapters") else None,
+                        "estimated_time": item["minutes"],
+                        "priority": item["priority"],
+                        "slot": slot[0],
+                        "start_time": _clock(start) if slot[0] else None,
+                        "review": {
+                            "id": item["review"]["id"],
+                            "due_date": item["review"].get("due_date"),
+                            "quiz_number": item["review"].get("quiz_number"),
+                        } if item["review"] else None,
+                    }
+                    for item, slot, start in day.items
+                ],
+                "total_time": day.used,
+            }
+        return plan
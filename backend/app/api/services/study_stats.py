@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+from app.api.services.daily_log_buffer import daily_log_buffer
+from app.api.services.study_planner import week_start
+from app.api.services.supabase import fetch_rows, supabase
+
+# Weekly and monthly totals of daily_logs, maintained by trigger (table study_stats, migration 19)
+STATS_COLUMNS = "period_start, sessions_completed, total_time, days_logged, goal_met_days"
+# Longest series served at once (ten years of weeks)
+MAX_STATS_PERIODS = 520
+
+
+def period_start(day: date, granularity: str) -> date:
+    """
+    First day of the week (Monday) or month of a day
+    """
+    if granularity == "week":
+        return week_start(day)
+    return day.replace(day=1)
+
+
+def next_period(start: date, granularity: str) -> date:
+    """
+    First day of the period following the one starting on a day
+    """
+    if granularity == "week":
+        return start + timedelta(days=7)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def period_count(first: date, last: date, granularity: str) -> int:
+    """
+    Number of periods from the one of first to the one of last
+    """
+    first, last = period_start(first, granularity), period_start(last, granularity)
+    if granularity == "week":
+        return (last - first).days // 7 + 1
+    return (last.year - first.year) * 12 + last.month - first.month + 1
+
+
+async def fetch_study_stats(user_id: str, granularity: str, first: date, last: date) -> List[Dict[str, Any]]:
+    """
+    Study totals of a user per period from first to last, periods without study included
+
+    Only the rollups are read (range read on study_stats_user_period_key); the
+    heartbeat increments not written yet are added to their period.
+    """
+    first, last = period_start(first, granularity), period_start(last, granularity)
+    rows = await fetch_rows(
+        supabase.table("study_stats")
+        .select(STATS_COLUMNS)
+        .eq("user_id", user_id)
+        .eq("granularity", granularity)
+        .gte("period_start", first.isoformat())
+        .lte("period_start", last.isoformat())
+    )
+    by_start = {row["period_start"][:10]: row for row in rows}
+
+    periods = []
+    start = first
+    while start <= last:
+        end = next_period(start, granularity)
+        row = by_start.get(start.isoformat()) or {}
+        periods.append({
+            "period_start": start,
+            "period_end": end - timedelta(days=1),
+            "sessions_completed": row.get("sessions_completed") or 0,
+            "total_time": row.get("total_time") or 0,
+            "days_logged": row.get("days_logged") or 0,
+            "goal_met_days": row.get("goal_met_days") or 0,
+        })
+        start = end
+
+    for day, increment in daily_log_buffer.pending_for(user_id).items():
+        start = period_start(date.fromisoformat(day), granularity)
+        if first <= start <= last:
+            period = periods[period_count(first, start, granularity) - 1]
+            period["sessions_completed"] += increment["sessions_completed"]
+            period["total_time"] += increment["total_time"]
+    return periods
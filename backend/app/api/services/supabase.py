@@ -1,14 +1,97 @@
-from supabase import create_client, Client
+import asyncio
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from supabase import Client
 
 from app.core.config import settings
+from app.core.metrics import instrument_http_client
+
+
+class InstrumentedClient(Client):
+    """
+    Supabase client whose Auth, PostgREST and Storage calls are timed per request
+    """
+
+    @staticmethod
+    def _init_supabase_auth_client(*args, **kwargs):
+        auth_client = Client._init_supabase_auth_client(*args, **kwargs)
+        instrument_http_client(auth_client._http_client, "auth")
+        return auth_client
+
+    @staticmethod
+    def _init_postgrest_client(*args, **kwargs):
+        # Called again whenever the client resets its sessions on auth events
+        postgrest_client = Client._init_postgrest_client(*args, **kwargs)
+        instrument_http_client(postgrest_client.session, "postgrest")
+        return postgrest_client
+
+    @staticmethod
+    def _init_storage_client(*args, **kwargs):
+        storage_client = Client._init_storage_client(*args, **kwargs)
+        instrument_http_client(storage_client.session, "storage")
+        return storage_client
+
+
+class LazySupabaseClient:
+    """
+    Proxy deferring the construction of a Supabase client
+
+    The client is built by the application lifespan (`connect`), or on first
+    use when the module is used outside of the API (scripts, background jobs).
+    """
+
+    def __init__(self, factory: Callable[[], Client]) -> None:
+        self._factory = factory
+        self._client: Optional[Client] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_connected(self) -> bool:
+        return self._client is not None
+
+    def connect(self) -> Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+        if client is None:
+            return
+        # Only close the HTTP sessions that were actually opened
+        sessions = [client.auth._http_client]
+        if client._postgrest is not None:
+            sessions.append(client._postgrest.session)
+        if client._storage is not None:
+            sessions.append(client._storage.session)
+        for session in sessions:
+            session.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.connect(), name)
 
 
 def get_supabase_client() -> Client:
     """
     Create and return a Supabase client
     """
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    return InstrumentedClient(settings.SUPABASE_URL, settings.SUPABASE_KEY)
 
 
-# Singleton instance
-supabase = get_supabase_client()
+# Singleton instance, built by the application lifespan
+supabase = LazySupabaseClient(get_supabase_client)
+
+
+async def fetch_rows(query) -> List[Dict[str, Any]]:
+    """
+    Execute a query builder in a worker thread and return its rows
+
+    The Supabase client is synchronous: awaiting several fetch_rows calls with
+    asyncio.gather runs the queries concurrently without blocking the event loop.
+    """
+    response = await asyncio.to_thread(query.execute)
+    return response.data or []
@@ -1,6 +1,7 @@
 import os
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
+from ..api.services.supabase import InstrumentedClient, LazySupabaseClient
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -12,5 +13,13 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("Les variables d'environnement SUPABASE_URL et SUPABASE_KEY doivent être définies")
 
-# Créer le client Supabase
-supabase_client: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+def create_supabase_client() -> Client:
+    """
+    Crée le client Supabase utilisé par le service d'extraction
+    """
+    return InstrumentedClient(SUPABASE_URL, SUPABASE_KEY)
+
+
+# Client Supabase, construit au démarrage de l'application (lifespan)
+supabase_client = LazySupabaseClient(create_supabase_client)
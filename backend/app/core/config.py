@@ -1,5 +1,5 @@
 import secrets
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 from pydantic import AnyHttpUrl, validator
 from pydantic_settings import BaseSettings
@@ -29,6 +29,135 @@ class Settings(BaseSettings):
     # Environment
     ENVIRONMENT: str = "development"
 
+    # Observability. With several workers, serve.py sets METRICS_MULTIPROC_DIR: each worker writes
+    # its metrics there every METRICS_FLUSH_INTERVAL seconds and /metrics merges those of all workers
+    METRICS_ENABLED: bool = True
+    METRICS_MULTIPROC_DIR: Optional[str] = None
+    METRICS_FLUSH_INTERVAL: float = 5.0
+
+    # Production server (serve.py): workers default to the number of usable CPUs
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    WEB_CONCURRENCY: Optional[int] = None
+    KEEP_ALIVE: int = 5
+    BACKLOG: int = 2048
+    # Recycle a worker after MAX_REQUESTS (+ random jitter) to bound memory growth
+    MAX_REQUESTS: int = 1000
+    MAX_REQUESTS_JITTER: int = 100
+    WORKER_TIMEOUT: int = 120
+    GRACEFUL_TIMEOUT: int = 30
+
+    # Lifespan: startup warm-up and graceful drain of background work (seconds)
+    WARMUP_TIMEOUT: float = 10.0
+    SHUTDOWN_DRAIN_TIMEOUT: float = 25.0
+
+    # In-memory reference data (activity_types, courses) refresh period (seconds). Writes made on
+    # another worker are seen at once with EVENTS_REDIS_URL, otherwise after at most this period
+    REFERENCE_DATA_REFRESH_INTERVAL: float = 300.0
+
+    # Delta sync (GET /sync): changes newer than (now - overlap) are sent again on the
+    # next poll to cover late commits; older cursors than the tombstone retention get a full sync
+    SYNC_CURSOR_OVERLAP_SECONDS: float = 5.0
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30
+    # Rows read per query, at most PostgREST's max-rows (1000 on Supabase)
+    SYNC_PAGE_SIZE: int = 1000
+
+    # Study heartbeats: daily_logs increments are written in batches every interval (seconds);
+    # those that cannot be written at shutdown are kept in the spool file until the next start
+    DAILY_LOG_FLUSH_INTERVAL: float = 30.0
+    DAILY_LOG_SPOOL_PATH: str = "daily_log_spool.jsonl"
+
+    # Recommendations are planned for the rest of the week at once; the remaining days are
+    # planned again when a past day's logged time differs from its plan by more than the
+    # tolerance (minutes). At most STUDY_PLAN_MAX_CANDIDATES activities and the
+    # STUDY_PLAN_MAX_REVIEWS earliest due reviews (migration 17) are considered
+    STUDY_PLAN_REPLAN_TOLERANCE: int = 15
+    STUDY_PLAN_MAX_CANDIDATES: int = 200
+    STUDY_PLAN_MAX_REVIEWS: int = 50
+    # Activity durations learned from start/complete timestamps (migration 16): a user's median
+    # is weighted against the all-users median (once it has ACTIVITY_DURATION_MIN_SAMPLES
+    # samples) as ACTIVITY_DURATION_PRIOR_SAMPLES samples; all-users statistics are cached (seconds)
+    ACTIVITY_DURATION_MIN_SAMPLES: int = 5
+    ACTIVITY_DURATION_PRIOR_SAMPLES: int = 5
+    ACTIVITY_DURATION_GLOBAL_TTL: float = 600.0
+    # Exam reminders (J-7, J-3, J-1; migration 18): the reminders of the day are sent once after
+    # REMINDERS_HOUR, checked every REMINDERS_INTERVAL seconds (0 disables the job). Notifier
+    # "log" (logs and event streams, for local use) or "webhook" (POST to REMINDER_WEBHOOK_URL).
+    # Failed sends are retried at the next check; a reminder claimed by a worker stopped before
+    # sending it is claimed again after REMINDERS_CLAIM_TIMEOUT seconds
+    REMINDERS_INTERVAL: float = 900
+    REMINDERS_HOUR: int = 8
+    REMINDERS_BATCH_SIZE: int = 200
+    REMINDERS_CLAIM_TIMEOUT: int = 600
+    REMINDER_NOTIFIER: str = "log"
+    REMINDER_WEBHOOK_URL: Optional[str] = None
+    REMINDER_WEBHOOK_TIMEOUT: float = 10.0
+
+    # Server-sent events (GET /events): streams end after EVENTS_MAX_STREAM_SECONDS and the
+    # browser reconnects, so shutdowns are not held by idle streams. Set EVENTS_REDIS_URL
+    # (requires the redis package) to deliver events published by any worker and to reload the
+    # reference data of every worker when one of them writes it
+    EVENTS_KEEPALIVE_INTERVAL: float = 15.0
+    EVENTS_MAX_STREAM_SECONDS: float = 300.0
+    EVENTS_QUEUE_SIZE: int = 100
+    EVENTS_REDIS_URL: Optional[str] = None
+    EVENTS_REDIS_CHANNEL: str = "halpi:events"
+
+    # Data export (GET /export): rows read per query, concurrent exports per worker
+    EXPORT_PAGE_SIZE: int = 1000
+    EXPORT_MAX_CONCURRENT: int = 2
+
+    # Chapter files are uploaded by clients straight to this Storage bucket with signed
+    # URLs; keep the maximum size in line with the bucket's file_size_limit (migration 12)
+    CHAPTER_STORAGE_BUCKET: str = "chapters"
+    CHAPTER_UPLOAD_MAX_BYTES: int = 50 * 1024 * 1024
+
+    # Legacy and OpenDocument chapter files are converted by LibreOffice before extraction;
+    # converted files are cached on disk by source SHA-256 (0 disables the cache)
+    CONVERSION_TIMEOUT: float = 120.0
+    CONVERSION_CACHE_DIR: str = "conversion_cache"
+    CONVERSION_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # AI gateway (POST /ai/interact): provider "fabrile" or "mock" (local answers, no network).
+    # Agents are looked up in AI_AGENT_IDS (JSON object by interaction type), then AI_DEFAULT_AGENT_ID
+    AI_PROVIDER: str = "fabrile"
+    AI_API_URL: str = "https://api.fabrile.ai/api/v1"
+    AI_API_TOKEN: Optional[str] = None
+    AI_ORGANIZATION_ID: Optional[str] = None
+    AI_DEFAULT_AGENT_ID: Optional[str] = None
+    AI_AGENT_IDS: Dict[str, str] = {}
+    AI_REQUEST_TIMEOUT: float = 90.0
+    AI_MOCK_LATENCY: float = 0.5
+    # Provider calls at once per worker and per user; requests wait up to AI_QUEUE_TIMEOUT, then get a 429
+    AI_MAX_CONCURRENCY: int = 16
+    AI_MAX_CONCURRENCY_PER_USER: int = 2
+    AI_QUEUE_TIMEOUT: float = 10.0
+    # Threads are reused per (user, activity, type) until they hold AI_THREAD_MAX_MESSAGES messages or expire
+    AI_THREAD_MAX_MESSAGES: int = 20
+    AI_THREAD_TTL: float = 24 * 3600.0
+    # Answers of deterministic interactions (concept_identification) are cached in memory
+    AI_CACHE_SIZE: int = 2048
+    AI_CACHE_TTL: float = 24 * 3600.0
+    # Token budget of a request (instructions, chapter excerpts, student input): the student
+    # input keeps up to AI_PROMPT_INPUT_MAX_TOKENS, the chapter excerpts most relevant to it
+    # (chunks of about AI_CONTEXT_CHUNK_TOKENS) fill the rest. Counts are exact with tiktoken
+    AI_PROMPT_TOKEN_BUDGET: int = 6000
+    AI_PROMPT_INPUT_MAX_TOKENS: int = 2500
+    AI_CONTEXT_CHUNK_TOKENS: int = 300
+    AI_CONTEXT_CACHE_SIZE: int = 256
+    # Quiz answers and concept cards of an activity submitted within AI_BATCH_WINDOW seconds
+    # are graded by one request of at most AI_BATCH_MAX_ITEMS items
+    AI_BATCH_WINDOW: float = 0.05
+    AI_BATCH_MAX_ITEMS: int = 20
+    # Study plans and progress reports: dirty reports regenerated every AI_REPORTS_INTERVAL
+    # seconds (0 disables the job), study plans renewed after AI_REPORTS_NIGHTLY_HOUR
+    AI_REPORTS_INTERVAL: float = 300
+    AI_REPORTS_NIGHTLY_HOUR: int = 3
+    AI_REPORTS_BATCH_SIZE: int = 50
+    AI_REPORTS_CONCURRENCY: int = 4
+    AI_REPORTS_LOG_DAYS: int = 28
+    AI_REPORTS_CLAIM_SECONDS: int = 300
+
     class Config:
         case_sensitive = True
         env_file = ".env"
@@ -0,0 +1,224 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.lifespan import register_worker
+from app.core.metrics import EVENT_STREAMS
+
+logger = logging.getLogger(__name__)
+
+
+class Event:
+    __slots__ = ("id", "name", "data")
+
+    def __init__(self, id: int, name: str, data: Dict[str, Any]) -> None:
+        self.id = id
+        self.name = name
+        self.data = data
+
+    def encode(self) -> str:
+        """
+        Server-sent events wire format
+        """
+        return f"id: {self.id}\nevent: {self.name}\ndata: {json.dumps(self.data, default=str)}\n\n"
+
+
+class Subscription:
+    """
+    Bounded queue of events for one open stream; the oldest event is dropped when full
+    """
+
+    def __init__(self, user_id: str) -> None:
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def put(self, event: Event) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class EventBus:
+    """
+    In-process publish/subscribe of per-user events
+
+    `publish` may be called from any thread (extraction and conversion run in
+    worker threads). When a fan-out is attached (Redis, see below), events are
+    also forwarded to the other workers, which deliver them to their own streams.
+    Worker-level events (`broadcast`, e.g. cache invalidations) are only sent
+    to the other workers, which pass them to the handlers registered with `on_broadcast`.
+    """
+
+    def __init__(self) -> None:
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._ids = itertools.count(1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._fanout: Optional["RedisFanout"] = None
+        self._broadcast_handlers: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+        self._lock = threading.Lock()
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: str):
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+            EVENT_STREAMS.set(self.stream_count)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscriptions = self._subscriptions.get(user_id, set())
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    self._subscriptions.pop(user_id, None)
+                EVENT_STREAMS.set(self.stream_count)
+
+    @property
+    def stream_count(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def publish(self, user_id: Optional[str], name: str, data: Dict[str, Any]) -> None:
+        """
+        Send an event to the open streams of a user (no-op without user)
+        """
+        if not user_id:
+            return
+        user_id = str(user_id)
+        self.deliver(user_id, name, data)
+        if self._fanout is not None:
+            self._fanout.forward(user_id, name, data)
+
+    def deliver(self, user_id: str, name: str, data: Dict[str, Any]) -> None:
+        """
+        Deliver an event to the streams opened on this worker only
+        """
+        if user_id not in self._subscriptions or self._loop is None:
+            return
+        event = Event(next(self._ids), name, data)
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._dispatch(user_id, event)
+        else:
+            self._loop.call_soon_threadsafe(self._dispatch, user_id, event)
+
+    def _dispatch(self, user_id: str, event: Event) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def on_broadcast(self, name: str, handler: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        Call handler(data) on the event loop when another worker broadcasts an event
+        """
+        self._broadcast_handlers.setdefault(name, []).append(handler)
+
+    def broadcast(self, name: str, data: Dict[str, Any]) -> None:
+        """
+        Send a worker-level event to the other workers (no-op without fan-out)
+        """
+        if self._fanout is not None:
+            self._fanout.forward(None, name, data)
+
+    def handle_broadcast(self, name: str, data: Dict[str, Any]) -> None:
+        for handler in self._broadcast_handlers.get(name, ()):
+            try:
+                handler(data)
+            except Exception as e:
+                logger.warning("Handler of broadcast %s failed: %s", name, e)
+
+
+event_bus = EventBus()
+
+
+class RedisFanout:
+    """
+    Cross-worker fan-out over a Redis pub/sub channel (optional `redis` package)
+    """
+
+    def __init__(self, bus: EventBus, url: str, channel: str) -> None:
+        import redis.asyncio as redis_asyncio
+
+        self.bus = bus
+        self.channel = channel
+        self.redis = redis_asyncio.from_url(url)
+        self._loop = asyncio.get_running_loop()
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.channel)
+        self._listener = self._loop.create_task(self._listen(pubsub))
+
+    async def _listen(self, pubsub) -> None:
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    payload = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    continue
+                # Events published by this worker were already delivered locally
+                if payload.get("origin") == self.bus.origin:
+                    continue
+                if payload.get("user_id") is None:
+                    self.bus.handle_broadcast(payload["event"], payload["data"])
+                else:
+                    self.bus.deliver(payload["user_id"], payload["event"], payload["data"])
+        finally:
+            await pubsub.aclose()
+
+    def forward(self, user_id: Optional[str], name: str, data: Dict[str, Any]) -> None:
+        message = json.dumps({
+            "origin": self.bus.origin,
+            "user_id": user_id,
+            "event": name,
+            "data": data,
+        }, default=str)
+        asyncio.run_coroutine_threadsafe(self._send(message), self._loop)
+
+    async def _send(self, message: str) -> None:
+        try:
+            await self.redis.publish(self.channel, message)
+        except Exception as e:
+            logger.warning("Event fan-out failed: %s", e)
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        await self.redis.aclose()
+
+
+async def _start_fanout() -> None:
+    if not settings.EVENTS_REDIS_URL:
+        return
+    try:
+        fanout = RedisFanout(event_bus, settings.EVENTS_REDIS_URL, settings.EVENTS_REDIS_CHANNEL)
+    except ImportError:
+        logger.warning("EVENTS_REDIS_URL is set but the redis package is not installed: events stay local to each worker")
+        return
+    await fanout.start()
+    event_bus._fanout = fanout
+
+
+async def _stop_fanout() -> None:
+    fanout, event_bus._fanout = event_bus._fanout, None
+    if fanout is not None:
+        await fanout.stop()
+
+
+register_worker("event_fanout", _start_fanout, _stop_fanout)
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Coroutine, Dict, List, Set, Tuple
+
+from fastapi import FastAPI
+
+from app.core.config import settings
+from app.core.metrics import IN_FLIGHT_WORK
+from app.core.startup import startup_report
+
+logger = logging.getLogger(__name__)
+
+
+class ShuttingDownError(RuntimeError):
+    """
+    Raised when new background work is submitted while the worker is draining
+    """
+
+
+class WorkTracker:
+    """
+    Keeps track of the background work running in this worker
+
+    Work spawned here outlives the request that started it, so the lifespan can
+    wait for it (with a deadline) before the worker exits on SIGTERM.
+    """
+
+    def __init__(self) -> None:
+        self.draining = False
+        self._tasks: Dict[asyncio.Task, str] = {}
+        self._counts: Dict[str, int] = {}
+
+    def _update(self, kind: str, delta: int) -> None:
+        self._counts[kind] = self._counts.get(kind, 0) + delta
+        IN_FLIGHT_WORK.set(self._counts[kind], kind=kind)
+
+    def spawn(self, kind: str, coroutine: Coroutine) -> asyncio.Task:
+        """
+        Run a coroutine in the background, tracked until it completes
+        """
+        if self.draining:
+            coroutine.close()
+            raise ShuttingDownError("Le serveur est en cours d'arrêt")
+
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks[task] = kind
+        self._update(kind, 1)
+        task.add_done_callback(self._on_done)
+        return task
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        kind = self._tasks.pop(task, None)
+        if kind is None:
+            return
+        self._update(kind, -1)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Background %s failed: %s", kind, task.exception())
+
+    @asynccontextmanager
+    async def track(self, kind: str):
+        """
+        Track work performed inline by a request (e.g. a document conversion)
+        """
+        if self.draining:
+            raise ShuttingDownError("Le serveur est en cours d'arrêt")
+        self._update(kind, 1)
+        try:
+            yield
+        finally:
+            self._update(kind, -1)
+
+    @property
+    def pending(self) -> int:
+        return sum(self._counts.values())
+
+    async def drain(self, timeout: float) -> int:
+        """
+        Refuse new work, wait for running work until the deadline, then cancel it
+
+        Returns:
+            Number of background tasks cancelled at the deadline
+        """
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        remaining = list(self._tasks)
+        for task in remaining:
+            logger.warning("Cancelling background %s at shutdown deadline", self._tasks.get(task))
+            task.cancel()
+        if remaining:
+            await asyncio.gather(*remaining, return_exceptions=True)
+        return len(remaining)
+
+
+work_tracker = WorkTracker()
+
+
+# Warm-up hooks and background workers, registered by the modules that own them
+
+WarmupHook = Callable[[], Awaitable[None]]
+
+_warmup_hooks: List[Tuple[str, WarmupHook]] = []
+_workers: List[Tuple[str, Callable[[], Awaitable[None]], Callable[[], Awaitable[None]]]] = []
+_started_workers: Set[str] = set()
+
+
+def register_warmup(name: str, hook: WarmupHook) -> None:
+    """
+    Register a coroutine run at startup, before the worker accepts traffic
+    """
+    _warmup_hooks.append((name, hook))
+
+
+def register_worker(
+    name: str,
+    start: Callable[[], Awaitable[None]],
+    stop: Callable[[], Awaitable[None]],
+) -> None:
+    """
+    Register a background worker started with the app and stopped after the drain
+    """
+    _workers.append((name, start, stop))
+
+
+def _supabase_clients():
+    # Imported here: the client modules must not build anything at import time
+    from app.api.services.supabase import supabase
+    from app.config.supabase import supabase_client
+
+    return {"api": supabase, "extraction": supabase_client}
+
+
+async def _warm_connection_pool(client) -> None:
+    # A cheap query opens the TLS connection of the PostgREST session
+    await asyncio.to_thread(
+        lambda: client.table("courses").select("id").limit(1).execute()
+    )
+
+
+async def _run_warmup(name: str, hook: WarmupHook) -> None:
+    started_at = time.perf_counter()
+    try:
+        await asyncio.wait_for(hook(), timeout=settings.WARMUP_TIMEOUT)
+    except Exception as e:
+        # A failed warm-up only means a colder start: never block the boot
+        logger.warning("Warm-up %s failed: %s", name, e)
+    finally:
+        startup_report.record(f"warmup:{name}", time.perf_counter() - started_at)
+
+
+async def _start_workers() -> None:
+    for name, start, _ in _workers:
+        try:
+            await start()
+            _started_workers.add(name)
+        except Exception as e:
+            logger.error("Background worker %s failed to start: %s", name, e)
+
+
+async def _stop_workers() -> None:
+    for name, _, stop in reversed(_workers):
+        if name not in _started_workers:
+            continue
+        try:
+            await stop()
+        except Exception as e:
+            logger.error("Background worker %s failed to stop: %s", name, e)
+        _started_workers.discard(name)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Worker lifecycle: open the Supabase pools, warm caches, start background workers,
+    and on shutdown drain in-flight work before closing everything
+    """
+    clients = _supabase_clients()
+    for name, client in clients.items():
+        with startup_report.phase(f"supabase_client:{name}"):
+            client.connect()
+
+    warmups = [
+        (f"pool:{name}", lambda client=client: _warm_connection_pool(client))
+        for name, client in clients.items()
+    ]
+    warmups.extend(_warmup_hooks)
+    await asyncio.gather(*(_run_warmup(name, hook) for name, hook in warmups))
+
+    await _start_workers()
+
+    startup_report.mark_ready()
+    startup_report.log()
+
+    yield
+
+    # Uvicorn stops accepting connections and waits for open requests before
+    # running this: only detached background work is left to drain
+    logger.info("Draining %d background task(s) before shutdown", work_tracker.pending)
+    cancelled = await work_tracker.drain(settings.SHUTDOWN_DRAIN_TIMEOUT)
+    if cancelled:
+        logger.warning("%d background task(s) cancelled at shutdown", cancelled)
+
+    await _stop_workers()
+
+    for client in clients.values():
+        client.close()
@@ -0,0 +1,552 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+# Default latency buckets, in seconds
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Buckets for the number of upstream calls made by one request (N+1 detection)
+CALL_COUNT_BUCKETS: Tuple[float, ...] = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """
+    Minimal thread-safe Prometheus histogram with labels
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str],
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._lock = threading.Lock()
+        # label values -> (bucket counts, sum, count)
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [[0] * len(self.buckets), 0.0, 0]
+                self._series[key] = series
+            for index, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> List[List]:
+        """
+        [label values, bucket counts, sum, count] of each series
+        """
+        with self._lock:
+            return [[list(key), list(series[0]), series[1], series[2]] for key, series in self._series.items()]
+
+    @staticmethod
+    def merge(snapshots: Iterable[List[List]]) -> Dict[Tuple[str, ...], List]:
+        """
+        Add up the series of several workers
+        """
+        merged: Dict[Tuple[str, ...], List] = {}
+        for snapshot in snapshots:
+            for key, bucket_counts, total, count in snapshot:
+                series = merged.setdefault(tuple(key), [[0] * len(bucket_counts), 0.0, 0])
+                series[0] = [a + b for a, b in zip(series[0], bucket_counts)]
+                series[1] += total
+                series[2] += count
+        return merged
+
+    def render(self, series: Optional[Dict[Tuple[str, ...], List]] = None) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        if series is None:
+            series = self.merge([self.snapshot()])
+        for key, (bucket_counts, total, count) in sorted(series.items()):
+            label_pairs = [
+                f'{label}="{_escape_label(value)}"'
+                for label, value in zip(self.labels, key)
+            ]
+            for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+                bucket_labels = ",".join(label_pairs + [f'le="{_format_value(upper_bound)}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {bucket_count}")
+            series_labels = "{" + ",".join(label_pairs) + "}" if label_pairs else ""
+            lines.append(f"{self.name}_sum{series_labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{series_labels} {count}")
+        return lines
+
+
+class Gauge:
+    """
+    Minimal thread-safe Prometheus gauge with labels
+
+    Across workers (multiprocess mode, see below) the values of the running
+    workers are added up ("sum"), or kept apart with a worker label ("all").
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str], multiprocess_mode: str = "sum") -> None:
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.multiprocess_mode = multiprocess_mode
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def snapshot(self) -> List[List]:
+        """
+        [label values, value] of each series
+        """
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, snapshots: Dict[str, List[List]]) -> Dict[Tuple[str, ...], float]:
+        """
+        Combine the series of several workers ({worker: snapshot}) according to multiprocess_mode
+        """
+        merged: Dict[Tuple[str, ...], float] = {}
+        for worker, snapshot in snapshots.items():
+            for key, value in snapshot:
+                key = tuple(key)
+                if self.multiprocess_mode == "all":
+                    merged[(worker, *key)] = value
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], float]] = None) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} gauge",
+        ]
+        labels = self.labels
+        if values is None:
+            values = {tuple(key): value for key, value in self.snapshot()}
+        elif self.multiprocess_mode == "all":
+            labels = ("worker", *self.labels)
+        for key, value in sorted(values.items()):
+            label_pairs = ",".join(
+                f'{label}="{_escape_label(label_value)}"'
+                for label, label_value in zip(labels, key)
+            )
+            series_labels = "{" + label_pairs + "}" if label_pairs else ""
+            lines.append(f"{self.name}{series_labels} {_format_value(value)}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "halpi_http_request_duration_seconds",
+    "Latency of API requests by route",
+    labels=("method", "route", "status"),
+)
+UPSTREAM_LATENCY = Histogram(
+    "halpi_upstream_call_duration_seconds",
+    "Latency of Supabase calls (PostgREST, Storage, Auth) by target",
+    labels=("service", "method", "target"),
+)
+UPSTREAM_CALLS_PER_REQUEST = Histogram(
+    "halpi_upstream_calls_per_request",
+    "Number of Supabase calls made while serving one API request",
+    labels=("route", "service"),
+    buckets=CALL_COUNT_BUCKETS,
+)
+UPSTREAM_TIME_PER_REQUEST = Histogram(
+    "halpi_upstream_time_per_request_seconds",
+    "Cumulated time spent in Supabase calls while serving one API request",
+    labels=("route", "service"),
+)
+STARTUP_PHASE_SECONDS = Gauge(
+    "halpi_startup_phase_seconds",
+    "Duration of worker startup phases (imports, client construction, lazy imports)",
+    labels=("phase",),
+    multiprocess_mode="all",
+)
+IN_FLIGHT_WORK = Gauge(
+    "halpi_in_flight_work",
+    "Background work (extraction, conversion) currently running in the worker",
+    labels=("kind",),
+)
+EVENT_STREAMS = Gauge(
+    "halpi_event_streams",
+    "Server-sent event streams (GET /events) currently open in the worker",
+    labels=(),
+)
+AI_REQUEST_LATENCY = Histogram(
+    "halpi_ai_request_duration_seconds",
+    "Duration of AI gateway interactions by type and outcome (ok, cached, fallback, error)",
+    labels=("type", "outcome"),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0),
+)
+AI_PROMPT_TOKENS = Histogram(
+    "halpi_ai_prompt_tokens",
+    "Tokens of the messages sent to the AI provider by interaction type",
+    labels=("type",),
+    buckets=(250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 12000, 16000),
+)
+AI_CALLS_IN_FLIGHT = Gauge(
+    "halpi_ai_calls_in_flight",
+    "AI provider calls currently running in the worker",
+    labels=(),
+)
+
+REGISTRY: List[Union[Histogram, Gauge]] = [
+    REQUEST_LATENCY,
+    UPSTREAM_LATENCY,
+    UPSTREAM_CALLS_PER_REQUEST,
+    UPSTREAM_TIME_PER_REQUEST,
+    STARTUP_PHASE_SECONDS,
+    IN_FLIGHT_WORK,
+    EVENT_STREAMS,
+    AI_REQUEST_LATENCY,
+    AI_PROMPT_TOKENS,
+    AI_CALLS_IN_FLIGHT,
+]
+
+
+def render_metrics() -> str:
+    """
+    Render every registered metric in the Prometheus text exposition format
+
+    With METRICS_MULTIPROC_DIR (several workers, set by serve.py), the metrics
+    of every worker are merged, whichever worker serves the scrape.
+    """
+    if settings.METRICS_MULTIPROC_DIR:
+        return render_multiprocess_metrics(settings.METRICS_MULTIPROC_DIR)
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Multiprocess mode: each worker writes a snapshot of its metrics every
+# METRICS_FLUSH_INTERVAL seconds (and before answering a scrape) to
+# <METRICS_MULTIPROC_DIR>/<pid>-<id>.json; /metrics adds them up.
+# Histograms of stopped workers still count (their files are merged into
+# archive.json after ARCHIVE_AFTER seconds); gauges only count running workers.
+
+ARCHIVE_FILE = "archive.json"
+LOCK_FILE = "archive.lock"
+# A worker silent for this long has stopped (gunicorn kills hung workers after WORKER_TIMEOUT)
+ARCHIVE_AFTER = 600.0
+
+_snapshot_name: Optional[Tuple[int, str]] = None
+
+
+def _worker_file(directory: str) -> str:
+    global _snapshot_name
+    # Named after the pid and a random id once in the worker: forked workers get their own file
+    if _snapshot_name is None or _snapshot_name[0] != os.getpid():
+        _snapshot_name = (os.getpid(), f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+    return os.path.join(directory, _snapshot_name[1])
+
+
+def _write_json(path: str, data: Dict) -> None:
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(temporary, path)
+
+
+def _read_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def flush_metrics(directory: Optional[str] = None) -> None:
+    """
+    Write the snapshot of this worker's metrics to the multiprocess directory
+    """
+    directory = directory or settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        return
+    _write_json(_worker_file(directory), {
+        "pid": os.getpid(),
+        "written_at": time.time(),
+        "metrics": {metric.name: metric.snapshot() for metric in REGISTRY},
+    })
+
+
+def _archive_stopped_workers(directory: str, stopped: List[str]) -> None:
+    # One worker at a time (lock file, portable): the archive is a read-modify-write
+    lock_path = os.path.join(directory, LOCK_FILE)
+    try:
+        descriptor = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(lock_path) > ARCHIVE_AFTER:
+                os.remove(lock_path)
+        except OSError:
+            pass
+        return
+    try:
+        os.close(descriptor)
+        archive = _read_json(os.path.join(directory, ARCHIVE_FILE)) or {"metrics": {}}
+        snapshots = [archive] + [snapshot for snapshot in map(_read_json, stopped) if snapshot]
+        _write_json(os.path.join(directory, ARCHIVE_FILE), {"metrics": {
+            metric.name: [
+                [list(key), *series]
+                for key, series in metric.merge(s["metrics"].get(metric.name, []) for s in snapshots).items()
+            ]
+            for metric in REGISTRY if metric.kind == "histogram"
+        }})
+        for path in stopped:
+            os.remove(path)
+    finally:
+        os.remove(lock_path)
+
+
+def render_multiprocess_metrics(directory: str) -> str:
+    """
+    Merge the snapshots of every worker in the Prometheus text exposition format
+    """
+    flush_metrics(directory)
+    lock_path = os.path.join(directory, LOCK_FILE)
+    # A scrape reading the files while stopped workers are archived would count them twice
+    for _ in range(20):
+        if not os.path.exists(lock_path):
+            break
+        time.sleep(0.05)
+    now = time.time()
+    live_after = now - settings.METRICS_FLUSH_INTERVAL * 3
+    snapshots: List[Dict] = []
+    live: Dict[str, Dict] = {}
+    stopped: List[str] = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(directory, name)
+        snapshot = _read_json(path)
+        if snapshot is None:
+            continue
+        snapshots.append(snapshot)
+        written_at = snapshot.get("written_at")
+        if written_at is None:
+            continue
+        if written_at >= live_after:
+            live[str(snapshot["pid"])] = snapshot
+        elif written_at < now - ARCHIVE_AFTER:
+            stopped.append(path)
+
+    lines: List[str] = []
+    for metric in REGISTRY:
+        if metric.kind == "histogram":
+            lines.extend(metric.render(metric.merge(s["metrics"].get(metric.name, []) for s in snapshots)))
+        else:
+            lines.extend(metric.render(metric.merge(
+                {worker: s["metrics"].get(metric.name, []) for worker, s in live.items()}
+            )))
+    if stopped:
+        _archive_stopped_workers(directory, stopped)
+    return "\n".join(lines) + "\n"
+
+
+class RequestTrace:
+    """
+    Upstream calls made while serving the current request
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.calls: List[Tuple[str, float]] = []
+        self.closed = False
+
+    def add(self, service: str, duration: float) -> None:
+        with self._lock:
+            # Background tasks run after the response: keep them out of the request
+            if not self.closed:
+                self.calls.append((service, duration))
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+
+    def summary(self) -> Dict[str, Tuple[int, float]]:
+        """
+        Return {service: (call count, total duration in seconds)}
+        """
+        result: Dict[str, Tuple[int, float]] = {}
+        with self._lock:
+            for service, duration in self.calls:
+                count, total = result.get(service, (0, 0.0))
+                result[service] = (count + 1, total + duration)
+        return result
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def get_current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def record_upstream_call(service: str, method: str, target: str, duration: float) -> None:
+    """
+    Record one upstream call, globally and on the trace of the current request
+    """
+    UPSTREAM_LATENCY.observe(duration, service=service, method=method, target=target)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(service, duration)
+
+
+# Supabase data-access hook
+
+_STARTED_AT_KEY = "halpi_started_at"
+
+
+def _upstream_target(service: str, url: httpx.URL) -> str:
+    """
+    Reduce an upstream URL to a low-cardinality label (table, rpc or API resource)
+    """
+    segments = [segment for segment in urlsplit(str(url)).path.split("/") if segment]
+    # Drop the "/rest/v1", "/storage/v1", "/auth/v1" prefix
+    if len(segments) >= 2 and segments[1] == "v1":
+        segments = segments[2:]
+    if not segments:
+        return "/"
+    if service == "postgrest" and segments[0] == "rpc" and len(segments) > 1:
+        return f"rpc/{segments[1]}"
+    return segments[0]
+
+
+def instrument_http_client(http_client: httpx.Client, service: str) -> httpx.Client:
+    """
+    Install event hooks timing every call made through an httpx client
+    """
+
+    def on_request(request: httpx.Request) -> None:
+        request.extensions[_STARTED_AT_KEY] = time.perf_counter()
+
+    def on_response(response: httpx.Response) -> None:
+        # Read the body here so the measured duration covers the full transfer
+        response.read()
+        started_at = response.request.extensions.get(_STARTED_AT_KEY)
+        if started_at is None:
+            return
+        record_upstream_call(
+            service,
+            response.request.method,
+            _upstream_target(service, response.request.url),
+            time.perf_counter() - started_at,
+        )
+
+    hooks = http_client.event_hooks
+    http_client.event_hooks = {
+        "request": hooks["request"] + [on_request],
+        "response": hooks["response"] + [on_response],
+    }
+    return http_client
+
+
+# Request-level middleware
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path_format"):
+        return route.path_format
+    return "unmatched"
+
+
+def _server_timing(total: float, summary: Dict[str, Tuple[int, float]]) -> str:
+    entries = [f"app;dur={total * 1000:.1f}"]
+    for service, (count, duration) in sorted(summary.items()):
+        entries.append(f'{service};dur={duration * 1000:.1f};desc="{count} calls"')
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency and the Supabase calls of each request
+
+    Upstream calls are also reported to the client in a `Server-Timing` header.
+    """
+
+    def __init__(self, app, excluded_paths: Sequence[str] = ()) -> None:
+        self.app = app
+        self.excluded_paths = set(excluded_paths)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope.get("path") in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = _current_trace.set(trace)
+        started_at = time.perf_counter()
+        finished_at: Optional[float] = None
+        status_code = 500
+
+        async def send_with_timing(message) -> None:
+            nonlocal status_code, finished_at
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                header = _server_timing(time.perf_counter() - started_at, trace.summary())
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", header.encode("latin-1")))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished_at = time.perf_counter()
+                trace.close()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            trace.close()
+            route = _route_label(scope)
+            REQUEST_LATENCY.observe(
+                (finished_at or time.perf_counter()) - started_at,
+                method=scope.get("method", ""),
+                route=route,
+                status=str(status_code),
+            )
+            summary = trace.summary()
+            for service in ("postgrest", "storage", "auth"):
+                count, duration = summary.get(service, (0, 0.0))
+                UPSTREAM_CALLS_PER_REQUEST.observe(count, route=route, service=service)
+                if count:
+                    UPSTREAM_TIME_PER_REQUEST.observe(duration, route=route, service=service)
@@ -1,3 +1,5 @@
+import logging
+import re
 from datetime import datetime, timedelta
 from typing import Any, Optional, Union
 
@@ -8,6 +10,10 @@ from app.core.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Loggers of the request lines written by uvicorn (also under gunicorn's UvicornWorker) and gunicorn
+ACCESS_LOGGERS = ("uvicorn.access", "gunicorn.access")
+_ACCESS_TOKEN_PARAM = re.compile(r"(access_token=)[^&\s\"]+")
+
 
 def create_access_token(
     subject: Union[str, Any], expires_delta: Optional[timedelta] = None
@@ -38,3 +44,34 @@ def get_password_hash(password: str) -> str:
     Hash a password
     """
     return pwd_context.hash(password)
+
+
+class AccessTokenFilter(logging.Filter):
+    """
+    Mask the ?access_token= of event streams (EventSource cannot send headers) in access logs
+    """
+
+    @staticmethod
+    def _redact(value: Any) -> Any:
+        if isinstance(value, str) and "access_token=" in value:
+            return _ACCESS_TOKEN_PARAM.sub(r"\1[redacted]", value)
+        return value
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # The arguments are redacted in place: uvicorn's access formatter unpacks them
+        if isinstance(record.args, dict):
+            record.args = {key: self._redact(value) for key, value in record.args.items()}
+        elif record.args:
+            record.args = tuple(self._redact(value) for value in record.args)
+        record.msg = self._redact(record.msg)
+        return True
+
+
+def install_access_log_filter() -> None:
+    """
+    Keep JWTs passed in query strings out of the access logs of every worker
+    """
+    for name in ACCESS_LOGGERS:
+        access_logger = logging.getLogger(name)
+        if not any(isinstance(f, AccessTokenFilter) for f in access_logger.filters):
+            access_logger.addFilter(AccessTokenFilter())
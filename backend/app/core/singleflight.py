@@ -0,0 +1,37 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls sharing a key into a single execution
+
+    The first caller for a key runs the coroutine; callers arriving while it is
+    in flight await the same result (or exception). The key is forgotten as soon
+    as the call completes: results are not cached. Scope is one event loop,
+    i.e. one worker process.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        # Retrieve the exception if every caller went away (avoids "never retrieved")
+        if not future.cancelled():
+            future.exception()
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> T:
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(function())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        # Shielded: a caller disconnecting must not cancel the work shared with the others
+        return await asyncio.shield(future)
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
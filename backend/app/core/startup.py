@@ -0,0 +1,53 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+from app.core.metrics import STARTUP_PHASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """
+    Timings of the worker startup phases (module imports, client construction)
+
+    Lazy imports performed later (document extraction libraries) are recorded
+    too, so the cost moved out of the boot path stays visible.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.created_at = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases.append((name, seconds))
+        STARTUP_PHASE_SECONDS.set(seconds, phase=name)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started_at)
+
+    def mark_ready(self) -> float:
+        """
+        Record the time elapsed since the report was created (first app import)
+        """
+        elapsed = time.perf_counter() - self.created_at
+        self.record("ready", elapsed)
+        return elapsed
+
+    def log(self) -> None:
+        with self._lock:
+            phases = list(self.phases)
+        details = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in phases)
+        logger.info("Startup timings: %s", details)
+
+
+startup_report = StartupReport()
@@ -1,12 +1,32 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from app.api.api import api_router
+import asyncio
+import logging
+from typing import Optional
+
+from app.core.startup import startup_report
+
+with startup_report.phase("import:fastapi"):
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import Response
+
+with startup_report.phase("import:app.api"):
+    from app.api.api import api_router
+
 from app.core.config import settings
+from app.core.lifespan import lifespan, register_worker
+from app.core.metrics import MetricsMiddleware, PROMETHEUS_CONTENT_TYPE, flush_metrics, render_metrics
+from app.core.security import install_access_log_filter
+
+# Importé par chaque worker : les jetons ?access_token= des flux d'événements sont masqués des logs d'accès
+install_access_log_filter()
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="HALPI V2 API",
     description="API pour la plateforme d'apprentissage du windsurf assistée par IA",
     version="2.0.0",
+    lifespan=lifespan,
 )
 
 # Configuration CORS
@@ -16,8 +36,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Mesure de latence par route et des appels Supabase de chaque requête
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, excluded_paths=["/metrics", f"{settings.API_V1_STR}/events"])
+
 # Inclure les routes API
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -34,7 +59,53 @@ async def root():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Métriques au format Prometheus (latence par route, appels Supabase par requête)
+
+    Avec plusieurs workers (METRICS_MULTIPROC_DIR), celles de tous les workers
+    sont additionnées, quel que soit le worker qui répond.
+    """
+    content = await asyncio.to_thread(render_metrics)
+    return Response(content=content, media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+# Écriture périodique des métriques du worker pour /metrics (mode multi-workers)
+_flush_task: Optional[asyncio.Task] = None
+
+
+async def _flush_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.METRICS_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(flush_metrics)
+        except OSError as e:
+            logger.warning("Could not write the metrics of the worker: %s", e)
+
+
+async def _start_metrics_flush() -> None:
+    global _flush_task
+    if settings.METRICS_MULTIPROC_DIR:
+        await asyncio.to_thread(flush_metrics)
+        _flush_task = asyncio.get_running_loop().create_task(_flush_loop())
+
+
+async def _stop_metrics_flush() -> None:
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        await asyncio.gather(_flush_task, return_exceptions=True)
+        _flush_task = None
+        # Dernières valeurs du worker : ses histogrammes restent comptés après son arrêt
+        await asyncio.to_thread(flush_metrics)
+
+
+register_worker("metrics_flush", _start_metrics_flush, _stop_metrics_flush)
+
+
 if __name__ == "__main__":
     import uvicorn
     
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    # Serveur de développement ; en production, utiliser serve.py (multi-workers)
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=settings.ENVIRONMENT == "development")
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List, Literal
 
 # Type de contenu possible pour un chapitre
@@ -25,3 +25,20 @@ class ChapterContent(BaseModel):
     content_type: ContentType = 'course'  # Type de contenu: cours, exercice, examen
     pages: List[Dict[str, Any]] = []  # Liste des pages avec leur contenu
     metadata: Dict[str, Any] = {}  # Métadonnées du document
+
+class ChapterUploadRequest(BaseModel):
+    """
+    Modèle pour la demande d'une URL d'upload signée
+    """
+    chapter_id: str
+    filename: str
+    size: int = Field(..., gt=0)  # Taille du fichier en octets
+
+class ChapterUploadFinalizeRequest(BaseModel):
+    """
+    Modèle pour la finalisation d'un upload envoyé directement à Storage
+    """
+    chapter_id: str
+    file_path: str  # Valeur renvoyée par /chapters/upload-url
+    sha256: Optional[str] = Field(None, pattern=r"^[0-9a-fA-F]{64}$")  # Empreinte calculée par le client
+    extract: bool = True  # Lancer l'extraction en arrière-plan
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
 from typing import Dict, Any, Optional, List
 from ..services.chapter_service import extract_chapter_content, extract_all_course_chapters
 from ..dependencies.auth import get_current_user
-from ..models.chapter import ChapterExtractRequest, ChapterExtractAllRequest
+from ..services.chapter_upload_service import ChapterNotFoundError, create_chapter_upload, finalize_chapter_upload
+from ..models.chapter import ChapterExtractRequest, ChapterExtractAllRequest, ChapterUploadRequest, ChapterUploadFinalizeRequest
 
 router = APIRouter(
     prefix="/chapters",
@@ -46,21 +47,47 @@ async def extract_all_chapters(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'extraction du contenu: {str(e)}")
 
-@router.post("/upload")
-async def upload_chapter_file(
-    file: UploadFile = File(...),
-    chapter_id: str = Form(...),
+@router.post("/upload-url")
+async def create_upload_url(
+    request: ChapterUploadRequest,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
-    Télécharge un fichier et l'associe à un chapitre
+    Délivre une URL signée pour envoyer un fichier de chapitre directement à Storage
     """
     try:
-        # Logique d'upload à implémenter
+        return create_chapter_upload(request.chapter_id, request.filename, request.size, current_user.id)
+    except ChapterNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la création de l'URL d'upload: {str(e)}")
+
+@router.post("/upload/finalize")
+async def finalize_upload(
+    request: ChapterUploadFinalizeRequest,
+    background_tasks: BackgroundTasks,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    Associe au chapitre le fichier envoyé à Storage et lance son extraction
+    """
+    try:
+        chapter = finalize_chapter_upload(request.chapter_id, request.file_path, current_user.id, request.sha256)
+        if request.extract:
+            background_tasks.add_task(extract_chapter_content, request.chapter_id)
         return {
             "success": True,
-            "chapter_id": chapter_id,
-            "filename": file.filename
+            "chapter_id": request.chapter_id,
+            "file_path": chapter.get("file_path"),
+            "file_size": chapter.get("file_size"),
+            "file_hash": chapter.get("file_hash"),
+            "extraction_started": request.extract
         }
+    except ChapterNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur lors de l'upload du fichier: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la finalisation de l'upload: {str(e)}")
@@ -1,41 +1,103 @@
+import asyncio
 import os
 import json
+import hashlib
+import shutil
 import tempfile
-from typing import Dict, Any, List, Optional
+import importlib
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional
 import io
 import base64
 from ..config.supabase import supabase_client
+from ..core.config import settings
+from ..core.startup import startup_report
+from ..api.services.document_converter import DocumentConverter
+from .conversion_cache import conversion_cache
 
-# Importation conditionnelle des bibliothèques d'extraction
-try:
-    import pdfplumber
-    PDFPLUMBER_AVAILABLE = True
-except ImportError:
-    PDFPLUMBER_AVAILABLE = False
+# Les bibliothèques d'extraction (pdfplumber, python-docx, python-pptx, PIL) sont
+# lourdes à importer : elles sont chargées à la première extraction seulement,
+# pour ne pas ralentir le démarrage des workers qui n'en ont pas besoin.
+_optional_modules: Dict[str, Any] = {}
+_optional_modules_lock = threading.Lock()
 
-try:
-    import docx
-    from docx.document import Document as DocxDocument
-    from docx.oxml.table import CT_Tbl
-    from docx.oxml.text.paragraph import CT_P
-    from docx.table import _Cell, Table
-    from docx.text.paragraph import Paragraph
-    PYTHON_DOCX_AVAILABLE = True
-except ImportError:
-    PYTHON_DOCX_AVAILABLE = False
 
-try:
-    from pptx import Presentation
-    from pptx.shapes.picture import Picture
-    PYTHON_PPTX_AVAILABLE = True
-except ImportError:
-    PYTHON_PPTX_AVAILABLE = False
+def _import_optional(module_name: str) -> Optional[Any]:
+    """
+    Importe une bibliothèque d'extraction à la demande
+
+    Args:
+        module_name: Nom du module à importer (ex: "pdfplumber")
+
+    Returns:
+        Le module, ou None s'il n'est pas installé
+    """
+    if module_name not in _optional_modules:
+        with _optional_modules_lock:
+            if module_name not in _optional_modules:
+                started_at = time.perf_counter()
+                try:
+                    module = importlib.import_module(module_name)
+                except ImportError:
+                    module = None
+                startup_report.record(f"lazy_import:{module_name}", time.perf_counter() - started_at)
+                _optional_modules[module_name] = module
+    return _optional_modules[module_name]
+
+# Formats convertis par LibreOffice avant l'extraction, avec le format cible
+# (docx et pptx conservent la structure, pdf pour les tableurs)
+CONVERTED_FORMATS = {
+    ".doc": "docx",
+    ".odt": "docx",
+    ".rtf": "docx",
+    ".txt": "docx",
+    ".ppt": "pptx",
+    ".odp": "pptx",
+    ".xls": "pdf",
+    ".xlsx": "pdf",
+    ".ods": "pdf",
+}
 
-try:
-    from PIL import Image
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
+# Formats lus directement par les fonctions d'extraction
+EXTRACTED_FORMATS = {".pdf", ".docx", ".pptx"}
+
+
+def convert_for_extraction(source_path: str, content_hash: str, workspace: str) -> str:
+    """
+    Convertit un fichier dans un format lisible par l'extraction (appel bloquant)
+    
+    Le fichier converti est mis en cache par empreinte du fichier source : un fichier
+    déjà converti n'est pas reconverti.
+    
+    Args:
+        source_path: Chemin du fichier source, dans l'espace de travail
+        content_hash: Empreinte SHA-256 du fichier source
+        workspace: Répertoire temporaire de l'extraction
+        
+    Returns:
+        Chemin du fichier converti, dans l'espace de travail
+    """
+    target_format = CONVERTED_FORMATS[os.path.splitext(source_path)[1].lower()]
+    parse_path = os.path.join(workspace, f"{os.path.splitext(os.path.basename(source_path))[0]}.{target_format}")
+    
+    cached_path = conversion_cache.get(content_hash, target_format)
+    if cached_path is None:
+        converted_path = DocumentConverter.convert_file(
+            source_path, workspace, target_format, timeout=settings.CONVERSION_TIMEOUT
+        )
+        conversion_cache.put(content_hash, target_format, converted_path)
+        return converted_path
+    
+    # Lien vers l'entrée du cache : une éviction pendant l'extraction ne supprime pas le fichier lu
+    try:
+        os.link(cached_path, parse_path)
+    except FileNotFoundError:
+        # Entrée supprimée entre-temps : reconvertir
+        return DocumentConverter.convert_file(source_path, workspace, target_format, timeout=settings.CONVERSION_TIMEOUT)
+    except OSError:
+        shutil.copyfile(cached_path, parse_path)
+    return parse_path
 
 async def extract_chapter_content(chapter_id: str) -> Dict[str, Any]:
     """
@@ -72,25 +134,34 @@ async def extract_chapter_content(chapter_id: str) -> Dict[str, Any]:
         if not response:
             raise ValueError(f"Fichier non trouvé dans le stockage: {file_path}")
         
+        # Empreinte du fichier réellement stocké (celle annoncée à l'upload n'est pas vérifiée)
+        file_hash = hashlib.sha256(response).hexdigest()
+        
         # 3. Déterminer le type de fichier et extraire le contenu
         file_extension = os.path.splitext(file_name)[1].lower()
         
         # Récupérer le type de contenu (cours, exercice, examen)
         content_type = chapter.get("content_type", "course")
         
-        # Créer un fichier temporaire pour traiter le document
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-            temp_file.write(response)
-            temp_file_path = temp_file.name
-        
-        try:
+        # Espace de travail temporaire : fichier source et éventuel fichier converti
+        with tempfile.TemporaryDirectory() as workspace:
+            source_path = os.path.join(workspace, os.path.basename(file_name))
+            with open(source_path, "wb") as source_file:
+                source_file.write(response)
+            
+            # Les formats illisibles directement (.doc, .ppt, OpenDocument...) passent d'abord par LibreOffice
+            parse_path = source_path
+            if file_extension in CONVERTED_FORMATS:
+                parse_path = await asyncio.to_thread(convert_for_extraction, source_path, file_hash, workspace)
+            parse_extension = os.path.splitext(parse_path)[1].lower()
+            
             # Extraire le contenu selon le type de fichier
-            if file_extension == '.pdf':
-                content = extract_pdf_content(temp_file_path)
-            elif file_extension == '.docx':
-                content = extract_docx_content(temp_file_path)
-            elif file_extension in ['.pptx', '.ppt']:
-                content = extract_pptx_content(temp_file_path)
+            if parse_extension == '.pdf':
+                content = extract_pdf_content(parse_path)
+            elif parse_extension == '.docx':
+                content = extract_docx_content(parse_path)
+            elif parse_extension == '.pptx':
+                content = extract_pptx_content(parse_path)
             else:
                 content = {
                     "title": chapter.get("title", "Document inconnu"),
@@ -99,20 +170,20 @@ async def extract_chapter_content(chapter_id: str) -> Dict[str, Any]:
                     "metadata": {"format": file_extension}
                 }
             
+            # Conserver le format d'origine d'un fichier converti
+            if parse_path != source_path:
+                content.setdefault("metadata", {})["source_format"] = file_extension
+            
             # Ajouter le type de contenu
             content["content_type"] = content_type
-        finally:
-            # Supprimer le fichier temporaire
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
         
         # 4. Mettre à jour le chapitre avec le contenu JSON extrait
         update_response = supabase_client.table("chapters").update(
-            {"json_data": content}
+            {"json_data": content, "file_hash": file_hash}
         ).eq("id", chapter_id).execute()
         
-        if update_response.error:
-            raise ValueError(f"Erreur lors de la mise à jour du chapitre: {update_response.error}")
+        if not update_response.data:
+            raise ValueError(f"Erreur lors de la mise à jour du chapitre: {chapter_id}")
         
         return content
         
@@ -127,12 +198,17 @@ async def extract_chapter_content(chapter_id: str) -> Dict[str, Any]:
             "metadata": {"error": str(e)}
         }
 
-async def extract_all_course_chapters(course_id: str) -> int:
+async def extract_all_course_chapters(
+    course_id: str,
+    on_progress: Optional[Callable[[str, int, int, bool], None]] = None
+) -> int:
     """
     Extrait le contenu de tous les chapitres d'un cours
     
     Args:
         course_id: ID du cours dont les chapitres doivent être extraits
+        on_progress: Appelée après chaque chapitre avec (chapter_id, chapitres traités,
+            nombre total de chapitres, succès de l'extraction)
         
     Returns:
         Nombre de chapitres traités
@@ -145,14 +221,19 @@ async def extract_all_course_chapters(course_id: str) -> int:
             return 0
         
         # 2. Extraire le contenu de chaque chapitre
+        total = len(chapters_response.data)
         processed_count = 0
-        for chapter in chapters_response.data:
+        for index, chapter in enumerate(chapters_response.data, start=1):
+            succeeded = False
             try:
-                await extract_chapter_content(chapter["id"])
+                content = await extract_chapter_content(chapter["id"])
                 processed_count += 1
+                succeeded = content.get("type") != "error"
             except Exception as e:
                 # Journaliser l'erreur mais continuer avec les autres chapitres
                 print(f"Erreur lors de l'extraction du chapitre {chapter['id']}: {str(e)}")
+            if on_progress:
+                on_progress(chapter["id"], index, total, succeeded)
         
         return processed_count
         
@@ -170,56 +251,48 @@ def extract_pdf_content(file_path: str) -> Dict[str, Any]:
     Returns:
         Dictionnaire contenant le contenu extrait
     """
-    if not PYMUPDF_AVAILABLE:
+    pdfplumber = _import_optional("pdfplumber")
+    if pdfplumber is None:
         return {
             "title": os.path.basename(file_path),
             "type": "pdf",
-            "pages": [{"text": "PyMuPDF non disponible pour l'extraction PDF"}],
-            "metadata": {"error": "PyMuPDF non installé"}
+            "pages": [{"text": "pdfplumber non disponible pour l'extraction PDF"}],
+            "metadata": {"error": "pdfplumber non installé"}
         }
     
     try:
         # Ouvrir le document PDF
-        doc = fitz.open(file_path)
-        
-        # Extraire les métadonnées
-        metadata = {
-            "title": doc.metadata.get("title", ""),
-            "author": doc.metadata.get("author", ""),
-            "subject": doc.metadata.get("subject", ""),
-            "keywords": doc.metadata.get("keywords", ""),
-            "page_count": len(doc)
-        }
-        
-        # Extraire le contenu de chaque page
-        pages = []
-        for page_num, page in enumerate(doc):
-            # Extraire le texte
-            text = page.get_text()
-            
-            # Extraire les images (optionnel, peut être lourd)
-            images = []
-            for img_index, img in enumerate(page.get_images(full=True)):
-                xref = img[0]
-                base_image = doc.extract_image(xref)
-                if base_image:
-                    image_bytes = base_image["image"]
-                    image_ext = base_image["ext"]
-                    image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-                    images.append({
-                        "index": img_index,
-                        "format": image_ext,
-                        "data": f"data:image/{image_ext};base64,{image_base64}"
-                    })
+        with pdfplumber.open(file_path) as pdf:
+            # Extraire les métadonnées
+            doc_metadata = pdf.metadata or {}
+            metadata = {
+                "title": doc_metadata.get("Title", ""),
+                "author": doc_metadata.get("Author", ""),
+                "subject": doc_metadata.get("Subject", ""),
+                "keywords": doc_metadata.get("Keywords", ""),
+                "page_count": len(pdf.pages)
+            }
             
-            pages.append({
-                "page_num": page_num + 1,
-                "text": text,
-                "images": images
-            })
-        
-        # Fermer le document
-        doc.close()
+            # Extraire le contenu de chaque page
+            pages = []
+            for page_num, page in enumerate(pdf.pages):
+                # Extraire le texte en conservant la mise en page
+                text = page.extract_text() or ""
+                
+                # Extraire les tableaux
+                tables = page.extract_tables() or []
+                
+                pages.append({
+                    "page_num": page_num + 1,
+                    "text": text,
+                    "tables": tables,
+                    "images": [],
+                    "has_images": len(page.images) > 0,
+                    "has_tables": len(tables) > 0
+                })
+                
+                # Libérer le cache de la page (les gros PDF consomment beaucoup de mémoire)
+                page.flush_cache()
         
         return {
             "title": metadata.get("title") or os.path.basename(file_path),
@@ -247,7 +320,8 @@ def extract_docx_content(file_path: str) -> Dict[str, Any]:
     Returns:
         Dictionnaire contenant le contenu extrait
     """
-    if not PYTHON_DOCX_AVAILABLE or not PIL_AVAILABLE:
+    docx = _import_optional("docx")
+    if docx is None or _import_optional("PIL") is None:
         return {
             "title": os.path.basename(file_path),
             "type": "docx",
@@ -255,6 +329,12 @@ def extract_docx_content(file_path: str) -> Dict[str, Any]:
             "metadata": {"error": "python-docx ou PIL non installé"}
         }
     
+    from docx.document import Document as DocxDocument
+    from docx.oxml.table import CT_Tbl
+    from docx.oxml.text.paragraph import CT_P
+    from docx.table import _Cell, Table
+    from docx.text.paragraph import Paragraph
+    
     try:
         # Ouvrir le document DOCX
         doc = docx.Document(file_path)
@@ -403,7 +483,7 @@ def extract_pptx_content(file_path: str) -> Dict[str, Any]:
     Returns:
         Dictionnaire contenant le contenu extrait
     """
-    if not PYTHON_PPTX_AVAILABLE or not PIL_AVAILABLE:
+    if _import_optional("pptx") is None or _import_optional("PIL") is None:
         return {
             "title": os.path.basename(file_path),
             "type": "pptx",
@@ -411,6 +491,9 @@ def extract_pptx_content(file_path: str) -> Dict[str, Any]:
             "metadata": {"error": "python-pptx ou PIL non installé"}
         }
     
+    from pptx import Presentation
+    from pptx.shapes.picture import Picture
+    
     try:
         # Ouvrir la présentation
         prs = Presentation(file_path)
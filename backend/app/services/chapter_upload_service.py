@@ -0,0 +1,158 @@
+import os
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from ..config.supabase import supabase_client
+from ..core.config import settings
+from .chapter_service import CONVERTED_FORMATS, EXTRACTED_FORMATS
+
+# Formats acceptés à l'upload (lus directement ou convertis avant l'extraction)
+UPLOAD_EXTENSIONS = EXTRACTED_FORMATS | set(CONVERTED_FORMATS)
+
+# Durée de validité des URL d'upload signées, fixée par Supabase Storage (secondes)
+SIGNED_UPLOAD_URL_TTL = 2 * 60 * 60
+
+
+class ChapterNotFoundError(LookupError):
+    """
+    Chapitre ou fichier introuvable
+    """
+
+
+def _get_chapter(chapter_id: str, user_id: str) -> Dict[str, Any]:
+    """
+    Chapitre d'un cours suivi par l'utilisateur
+
+    Le client Supabase du backend ignore les politiques RLS : l'inscription au cours
+    est vérifiée ici. Un chapitre d'un autre cours est traité comme introuvable.
+    """
+    response = supabase_client.table("chapters") \
+        .select("id, course_id, file_path") \
+        .eq("id", chapter_id) \
+        .execute()
+    if not response.data:
+        raise ChapterNotFoundError(f"Chapitre non trouvé: {chapter_id}")
+    chapter = response.data[0]
+
+    enrollment = supabase_client.table("user_courses") \
+        .select("id") \
+        .eq("user_id", str(user_id)) \
+        .eq("course_id", chapter["course_id"]) \
+        .limit(1) \
+        .execute()
+    if not enrollment.data:
+        raise ChapterNotFoundError(f"Chapitre non trouvé: {chapter_id}")
+    return chapter
+
+
+def _split_file_path(file_path: str) -> Tuple[str, str]:
+    bucket_name, _, object_path = file_path.partition("/")
+    return bucket_name, object_path
+
+
+def create_chapter_upload(chapter_id: str, filename: str, size: int, user_id: str) -> Dict[str, Any]:
+    """
+    Délivre une URL signée pour envoyer un fichier de chapitre directement à Storage
+
+    Le fichier ne transite pas par l'API : le client l'envoie avec l'URL (ou le jeton)
+    puis appelle finalize_chapter_upload avec le file_path renvoyé.
+
+    Args:
+        chapter_id: ID du chapitre
+        filename: Nom du fichier d'origine (détermine l'extension)
+        size: Taille annoncée du fichier en octets
+        user_id: ID de l'utilisateur, qui doit suivre le cours du chapitre
+
+    Returns:
+        URL et jeton d'upload, emplacement du fichier dans le bucket
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in UPLOAD_EXTENSIONS:
+        raise ValueError(f"Format non pris en charge: {extension or filename}")
+    if size > settings.CHAPTER_UPLOAD_MAX_BYTES:
+        raise ValueError(f"Fichier trop volumineux: {size} octets (maximum {settings.CHAPTER_UPLOAD_MAX_BYTES})")
+
+    chapter = _get_chapter(chapter_id, user_id)
+
+    # Un nom unique par upload : un nouvel envoi n'écrase jamais le fichier en cours d'extraction
+    object_path = f"{chapter['course_id']}/{chapter_id}/{uuid.uuid4().hex}{extension}"
+    bucket_name = settings.CHAPTER_STORAGE_BUCKET
+    signed = supabase_client.storage.from_(bucket_name).create_signed_upload_url(object_path)
+
+    return {
+        "chapter_id": chapter_id,
+        "bucket": bucket_name,
+        "path": object_path,
+        "file_path": f"{bucket_name}/{object_path}",
+        # storage3 joins the base URL and the returned path with a doubled slash
+        "upload_url": re.sub(r"(?<!:)/{2,}", "/", signed["signed_url"]),
+        "token": signed["token"],
+        "expires_in": SIGNED_UPLOAD_URL_TTL
+    }
+
+
+def _get_object_metadata(bucket_name: str, object_path: str) -> Optional[Dict[str, Any]]:
+    folder, _, name = object_path.rpartition("/")
+    objects = supabase_client.storage.from_(bucket_name).list(folder, {"search": name, "limit": 10})
+    for storage_object in objects or []:
+        if storage_object.get("name") == name:
+            return storage_object.get("metadata") or {}
+    return None
+
+
+def finalize_chapter_upload(chapter_id: str, file_path: str, user_id: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Associe au chapitre un fichier envoyé avec create_chapter_upload
+
+    La taille est lue dans les métadonnées de Storage. L'empreinte SHA-256 annoncée
+    par le client est enregistrée telle quelle ; l'extraction, qui télécharge le
+    fichier de toute façon, la recalcule.
+
+    Args:
+        chapter_id: ID du chapitre
+        file_path: Emplacement renvoyé par create_chapter_upload
+        user_id: ID de l'utilisateur, qui doit suivre le cours du chapitre
+        sha256: Empreinte SHA-256 du fichier calculée par le client
+
+    Returns:
+        Chapitre mis à jour (file_path, file_size, file_hash)
+    """
+    bucket_name, object_path = _split_file_path(file_path)
+    # Seuls les fichiers délivrés pour ce chapitre peuvent lui être associés
+    if bucket_name != settings.CHAPTER_STORAGE_BUCKET or f"/{chapter_id}/" not in f"/{object_path}":
+        raise ValueError(f"Emplacement de fichier invalide pour le chapitre {chapter_id}: {file_path}")
+
+    chapter = _get_chapter(chapter_id, user_id)
+
+    metadata = _get_object_metadata(bucket_name, object_path)
+    if metadata is None:
+        raise ChapterNotFoundError(f"Fichier non trouvé dans le stockage: {file_path}")
+    file_size = metadata.get("size")
+    if file_size is not None and file_size > settings.CHAPTER_UPLOAD_MAX_BYTES:
+        supabase_client.storage.from_(bucket_name).remove([object_path])
+        raise ValueError(f"Fichier trop volumineux: {file_size} octets (maximum {settings.CHAPTER_UPLOAD_MAX_BYTES})")
+
+    update_data = {
+        "file_path": file_path,
+        "file_size": file_size,
+        "file_hash": sha256.lower() if sha256 else None,
+        "file_uploaded_at": datetime.now(timezone.utc).isoformat(),
+        "json_data": None
+    }
+    response = supabase_client.table("chapters") \
+        .update(update_data) \
+        .eq("id", chapter_id) \
+        .execute()
+
+    # Supprimer l'ancien fichier du chapitre, remplacé par celui-ci
+    previous_path = chapter.get("file_path")
+    if previous_path and previous_path != file_path:
+        previous_bucket, previous_object = _split_file_path(previous_path)
+        try:
+            supabase_client.storage.from_(previous_bucket).remove([previous_object])
+        except Exception as e:
+            print(f"Impossible de supprimer l'ancien fichier {previous_path}: {str(e)}")
+
+    return response.data[0] if response.data else {"id": chapter_id, **update_data}
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import threading
+from typing import Optional
+
+from ..core.config import settings
+
+
+class ConversionCache:
+    """
+    Cache disque des fichiers convertis par LibreOffice, indexé par empreinte SHA-256
+
+    Une conversion prend plusieurs secondes : un même fichier source (ré-extraction,
+    fichier partagé entre plusieurs chapitres) n'est converti qu'une fois par worker.
+    Les entrées les moins récemment utilisées sont supprimées au-delà de max_bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _entry_path(self, content_hash: str, target_format: str) -> str:
+        return os.path.join(self.directory, f"{content_hash}.{target_format}")
+
+    def get(self, content_hash: str, target_format: str) -> Optional[str]:
+        """
+        Chemin du fichier converti en cache, ou None
+        """
+        path = self._entry_path(content_hash, target_format)
+        try:
+            # La date de modification sert d'ordre d'utilisation pour l'éviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, content_hash: str, target_format: str, source_path: str) -> str:
+        """
+        Copie un fichier converti dans le cache et renvoie son chemin
+        """
+        if self.max_bytes <= 0:
+            return source_path
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._entry_path(content_hash, target_format)
+        # Copie puis renommage : une lecture concurrente ne voit jamais un fichier partiel
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".part", delete=False) as partial:
+            with open(source_path, "rb") as source:
+                shutil.copyfileobj(source, partial)
+        os.replace(partial.name, path)
+        self._evict()
+        return path
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.endswith(".part"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+conversion_cache = ConversionCache(settings.CONVERSION_CACHE_DIR, settings.CONVERSION_CACHE_MAX_BYTES)
@@ -1,4 +1,7 @@
 import uvicorn
 
+from app.core.config import settings
+
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True)
+    # Serveur de développement (un seul processus) ; en production, utiliser serve.py
+    uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=settings.ENVIRONMENT == "development")
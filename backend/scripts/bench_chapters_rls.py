@@ -0,0 +1,199 @@
+"""
+Benchmark des politiques RLS de chapters / chapter_progress (migration 07)
+
+Crée un schéma jetable `halpi_bench` dans un Postgres local, y installe les
+politiques d'origine (migrations 03 et 05) sur une table chapters volumineuse,
+mesure les requêtes typiques en tant qu'utilisateur connecté, applique
+migrations/07_optimize_chapters_rls.sql puis mesure à nouveau.
+
+Pour reproduire Supabase, le script crée si besoin le rôle `authenticated` et
+une fonction `auth.uid()` lisant `request.jwt.claims`, comme celle de Supabase.
+
+Usage (depuis le dossier backend) :
+    python scripts/bench_chapters_rls.py --dsn postgresql://postgres@localhost:5432/postgres [--users 5000]
+
+Ne jamais pointer --dsn vers la base Supabase : le schéma halpi_bench est supprimé.
+"""
+import argparse
+import random
+import re
+
+from pg_bench import DEFAULT_DSN, load_migration, measure, print_comparison, recreate_schema, run_psql
+
+SCHEMA = "halpi_bench"
+SEARCH_PATH = f"{SCHEMA}, public"
+
+SUPABASE_SQL = """
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+        CREATE ROLE authenticated NOLOGIN;
+    END IF;
+END $$;
+
+CREATE SCHEMA IF NOT EXISTS auth;
+GRANT USAGE ON SCHEMA auth TO authenticated;
+
+DO $$
+BEGIN
+    IF to_regprocedure('auth.uid()') IS NULL THEN
+        CREATE FUNCTION auth.uid() RETURNS UUID LANGUAGE sql STABLE AS
+        'SELECT nullif(current_setting(''request.jwt.claims'', true)::jsonb ->> ''sub'', '''')::uuid';
+    END IF;
+END $$;
+"""
+
+SCHEMA_SQL = """
+CREATE TABLE courses (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    name TEXT NOT NULL
+);
+
+CREATE TABLE user_courses (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    course_id UUID NOT NULL REFERENCES courses(id)
+);
+
+CREATE TABLE chapters (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    course_id UUID NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    order_index INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX idx_chapters_course_order ON chapters(course_id, order_index);
+
+CREATE TABLE chapter_progress (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    chapter_id UUID NOT NULL REFERENCES chapters(id) ON DELETE CASCADE,
+    progress_percentage INTEGER NOT NULL DEFAULT 0,
+    completed BOOLEAN NOT NULL DEFAULT FALSE,
+    UNIQUE(user_id, chapter_id)
+);
+CREATE INDEX idx_chapter_progress_user_id ON chapter_progress(user_id);
+CREATE INDEX idx_chapter_progress_chapter_id ON chapter_progress(chapter_id);
+
+GRANT USAGE ON SCHEMA {schema} TO authenticated;
+GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA {schema} TO authenticated;
+"""
+
+DATA_SQL = """
+CREATE TEMPORARY TABLE bench_users AS
+SELECT n, gen_random_uuid() AS user_id FROM generate_series(1, {users}) AS n;
+
+INSERT INTO courses (name) SELECT 'Cours ' || n FROM generate_series(1, {courses}) AS n;
+
+CREATE TEMPORARY TABLE bench_courses AS
+SELECT row_number() OVER (ORDER BY id) - 1 AS n, id FROM courses;
+
+INSERT INTO user_courses (user_id, course_id)
+SELECT u.user_id, c.id
+FROM bench_users u, generate_series(0, {courses_per_user} - 1) AS k, bench_courses c
+WHERE c.n = (u.n * 7 + k) % {courses};
+
+INSERT INTO chapters (course_id, title, order_index)
+SELECT c.id, 'Chapitre ' || n, n FROM courses c, generate_series(1, {chapters_per_course}) AS n;
+
+-- Progression sur le premier tiers des chapitres de chaque cours suivi
+INSERT INTO chapter_progress (user_id, chapter_id, progress_percentage, completed)
+SELECT uc.user_id, ch.id, (random() * 100)::int, random() < 0.3
+FROM user_courses uc
+JOIN chapters ch ON ch.course_id = uc.course_id AND ch.order_index <= {chapters_per_course} / 3;
+
+ANALYZE;
+"""
+
+# Rôle et JWT tels que positionnés par PostgREST pour un utilisateur connecté
+AUTHENTICATED_SETUP = """
+SET LOCAL ROLE authenticated;
+SET LOCAL request.jwt.claims = '{{"sub": "{user_id}", "role": "authenticated"}}';
+"""
+
+QUERIES = {
+    "chapitres d'un cours": """
+        SELECT * FROM chapters WHERE course_id = '{course_id}' ORDER BY order_index
+    """,
+    "chapitres visibles (tous cours)": """
+        SELECT id, course_id, title FROM chapters
+    """,
+    "progression de l'utilisateur": """
+        SELECT * FROM chapter_progress
+    """,
+    "progression d'un cours (jointure)": """
+        SELECT ch.id, cp.progress_percentage
+        FROM chapters ch
+        LEFT JOIN chapter_progress cp ON cp.chapter_id = ch.id
+        WHERE ch.course_id = '{course_id}'
+    """,
+    "mise à jour des chapitres d'un cours": """
+        UPDATE chapters SET title = title WHERE course_id = '{course_id}'
+    """,
+}
+
+
+def original_policies() -> str:
+    """
+    Politiques RLS telles que créées par les migrations 03 et 05
+    """
+    migration_03 = load_migration("03_add_chapters_tables.sql", SCHEMA)
+    statements = re.findall(
+        r"^(?:ALTER TABLE \S+ ENABLE ROW LEVEL SECURITY|CREATE POLICY .*?);",
+        migration_03,
+        flags=re.MULTILINE | re.DOTALL,
+    )
+    return "\n".join(statement for statement in statements) + "\n" + load_migration("05_add_rls_policies.sql", SCHEMA)
+
+
+def sample_parameters(dsn: str, samples: int, seed: int):
+    rows = run_psql(
+        dsn,
+        "SELECT user_id, course_id FROM user_courses ORDER BY id LIMIT 5000;",
+        search_path=SEARCH_PATH,
+    ).split()
+    pairs = [row.split("|") for row in rows]
+    random.Random(seed).shuffle(pairs)
+    return [{"user_id": user_id, "course_id": course_id} for user_id, course_id in pairs[:samples]]
+
+
+def run_queries(dsn: str, parameters):
+    return {
+        name: measure(dsn, query, parameters, SEARCH_PATH, setup_template=AUTHENTICATED_SETUP)
+        for name, query in QUERIES.items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=DEFAULT_DSN, help="Connexion psql (défaut: $BENCH_DATABASE_URL)")
+    parser.add_argument("--users", type=int, default=5000, help="Nombre d'utilisateurs synthétiques")
+    parser.add_argument("--courses", type=int, default=1000, help="Nombre de cours")
+    parser.add_argument("--chapters-per-course", type=int, default=60, help="Chapitres par cours")
+    parser.add_argument("--samples", type=int, default=9, help="Jeux de paramètres par requête")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"Chargement des données synthétiques ({args.users} utilisateurs, "
+          f"{args.courses * args.chapters_per_course} chapitres) dans {SCHEMA}...")
+    run_psql(args.dsn, SUPABASE_SQL)
+    recreate_schema(args.dsn, SCHEMA)
+    run_psql(args.dsn, SCHEMA_SQL.format(schema=SCHEMA), search_path=SEARCH_PATH)
+    run_psql(args.dsn, DATA_SQL.format(
+        users=args.users,
+        courses=args.courses,
+        courses_per_user=6,
+        chapters_per_course=args.chapters_per_course,
+    ), search_path=SEARCH_PATH)
+    run_psql(args.dsn, original_policies(), search_path=SEARCH_PATH)
+
+    parameters = sample_parameters(args.dsn, args.samples, args.seed)
+    before = run_queries(args.dsn, parameters)
+
+    run_psql(args.dsn, load_migration("07_optimize_chapters_rls.sql", SCHEMA), search_path=SEARCH_PATH)
+    after = run_queries(args.dsn, parameters)
+
+    print_comparison(f"Médiane de {len(parameters)} exécutions (EXPLAIN ANALYZE, rôle authenticated)", before, after)
+
+
+if __name__ == "__main__":
+    main()
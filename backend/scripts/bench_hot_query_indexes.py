@@ -0,0 +1,233 @@
+"""
+Benchmark des index de la migration 06 (EXPLAIN ANALYZE avant/après)
+
+Crée un schéma jetable `halpi_bench` dans un Postgres local, y charge des données
+synthétiques reproduisant les tables lues par le backend, mesure les requêtes
+les plus fréquentes, applique migrations/06_add_hot_query_indexes.sql puis
+mesure à nouveau.
+
+Usage (depuis le dossier backend) :
+    python scripts/bench_hot_query_indexes.py --dsn postgresql://postgres@localhost:5432/postgres [--users 1000]
+
+Ne jamais pointer --dsn vers la base Supabase : le schéma halpi_bench est supprimé.
+"""
+import argparse
+import random
+
+from pg_bench import DEFAULT_DSN, load_migration, measure, print_comparison, recreate_schema, run_psql
+
+SCHEMA = "halpi_bench"
+SEARCH_PATH = f"{SCHEMA}, public"
+
+# Colonnes réellement utilisées par le backend ; index d'origine de la migration 03 inclus
+SCHEMA_SQL = """
+CREATE TABLE courses (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    name TEXT NOT NULL,
+    exam_date DATE
+);
+
+CREATE TABLE user_courses (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    course_id UUID NOT NULL REFERENCES courses(id),
+    importance TEXT
+);
+
+CREATE TABLE chapters (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    course_id UUID NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    order_index INTEGER NOT NULL DEFAULT 0,
+    chapter_type TEXT NOT NULL DEFAULT 'savoir'
+);
+CREATE INDEX idx_chapters_course_id ON chapters(course_id);
+
+CREATE TABLE activities (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    course_id UUID NOT NULL,
+    chapter_id UUID,
+    activity_type_id UUID,
+    status TEXT NOT NULL DEFAULT 'pending',
+    score INTEGER,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE daily_logs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    date DATE NOT NULL,
+    study_time INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE daily_recommendations (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    activity_id UUID,
+    date DATE NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE quiz_results (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    course_id UUID NOT NULL,
+    quiz_number INTEGER NOT NULL,
+    score INTEGER NOT NULL
+);
+
+CREATE TABLE course_steps (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    course_id UUID NOT NULL,
+    step_key TEXT NOT NULL,
+    completed BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+CREATE TABLE user_course_progress (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    course_id UUID NOT NULL,
+    progress_percentage INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+DATA_SQL = """
+CREATE TEMPORARY TABLE bench_users AS
+SELECT n, gen_random_uuid() AS user_id FROM generate_series(1, {users}) AS n;
+
+INSERT INTO courses (name, exam_date)
+SELECT 'Cours ' || n, CURRENT_DATE + (n % 120) FROM generate_series(1, {courses}) AS n;
+
+CREATE TEMPORARY TABLE bench_courses AS
+SELECT row_number() OVER (ORDER BY id) - 1 AS n, id FROM courses;
+
+-- Chaque utilisateur suit {courses_per_user} cours distincts
+INSERT INTO user_courses (user_id, course_id, importance)
+SELECT u.user_id, c.id, 'moyen'
+FROM bench_users u, generate_series(0, {courses_per_user} - 1) AS k, bench_courses c
+WHERE c.n = (u.n * 7 + k) % {courses};
+
+INSERT INTO chapters (course_id, title, order_index)
+SELECT c.id, 'Chapitre ' || n, n FROM courses c, generate_series(1, {chapters_per_course}) AS n;
+
+INSERT INTO activities (user_id, course_id, status, score)
+SELECT uc.user_id, uc.course_id,
+       CASE WHEN random() < 0.7 THEN 'completed' WHEN random() < 0.5 THEN 'in_progress' ELSE 'pending' END,
+       (random() * 100)::int
+FROM user_courses uc, generate_series(1, {activities_per_course});
+
+INSERT INTO daily_logs (user_id, date, study_time)
+SELECT u.user_id, CURRENT_DATE - d, (random() * 240)::int
+FROM bench_users u, generate_series(0, {days} - 1) AS d;
+
+INSERT INTO daily_recommendations (user_id, date, priority)
+SELECT u.user_id, CURRENT_DATE - d, p
+FROM bench_users u, generate_series(0, {days} - 1) AS d, generate_series(1, 3) AS p;
+
+INSERT INTO quiz_results (user_id, course_id, quiz_number, score)
+SELECT uc.user_id, uc.course_id, q, (random() * 100)::int
+FROM user_courses uc, generate_series(1, 10) AS q;
+
+INSERT INTO course_steps (user_id, course_id, step_key, completed)
+SELECT uc.user_id, uc.course_id, 'step_' || s, random() < 0.5
+FROM user_courses uc, generate_series(1, 12) AS s;
+
+INSERT INTO user_course_progress (user_id, course_id, progress_percentage)
+SELECT user_id, course_id, (random() * 100)::int FROM user_courses;
+
+ANALYZE;
+"""
+
+# Requêtes telles qu'émises par PostgREST pour les endpoints concernés
+QUERIES = {
+    "activities non terminées (agenda)": """
+        SELECT * FROM activities
+        WHERE user_id = '{user_id}' AND course_id = '{course_id}' AND status <> 'completed'
+    """,
+    "activities d'un cours (progression)": """
+        SELECT status, score, activity_type_id FROM activities
+        WHERE user_id = '{user_id}' AND course_id = '{course_id}'
+    """,
+    "daily_logs sur 7 jours": """
+        SELECT * FROM daily_logs
+        WHERE user_id = '{user_id}' AND date >= CURRENT_DATE - 7 AND date <= CURRENT_DATE
+        ORDER BY date
+    """,
+    "daily_recommendations du jour": """
+        SELECT * FROM daily_recommendations
+        WHERE user_id = '{user_id}' AND date = CURRENT_DATE
+    """,
+    "quiz_results d'un cours": """
+        SELECT quiz_number, score FROM quiz_results
+        WHERE user_id = '{user_id}' AND course_id = '{course_id}'
+    """,
+    "course_steps terminées": """
+        SELECT step_key FROM course_steps
+        WHERE user_id = '{user_id}' AND course_id = '{course_id}' AND completed
+    """,
+    "user_course_progress": """
+        SELECT * FROM user_course_progress
+        WHERE user_id = '{user_id}' AND course_id = '{course_id}'
+    """,
+    "chapters d'un cours triés": """
+        SELECT * FROM chapters WHERE course_id = '{course_id}' ORDER BY order_index
+    """,
+}
+
+
+def sample_parameters(dsn: str, samples: int, seed: int):
+    rows = run_psql(
+        dsn,
+        "SELECT user_id, course_id FROM user_courses ORDER BY id LIMIT 5000;",
+        search_path=SEARCH_PATH,
+    ).split()
+    pairs = [row.split("|") for row in rows]
+    random.Random(seed).shuffle(pairs)
+    return [{"user_id": user_id, "course_id": course_id} for user_id, course_id in pairs[:samples]]
+
+
+def run_queries(dsn: str, parameters):
+    return {
+        name: measure(dsn, query, parameters, SEARCH_PATH)
+        for name, query in QUERIES.items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=DEFAULT_DSN, help="Connexion psql (défaut: $BENCH_DATABASE_URL)")
+    parser.add_argument("--users", type=int, default=1000, help="Nombre d'utilisateurs synthétiques")
+    parser.add_argument("--courses", type=int, default=200, help="Nombre de cours")
+    parser.add_argument("--samples", type=int, default=9, help="Jeux de paramètres par requête")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"Chargement des données synthétiques ({args.users} utilisateurs) dans {SCHEMA}...")
+    recreate_schema(args.dsn, SCHEMA)
+    run_psql(args.dsn, SCHEMA_SQL, search_path=SEARCH_PATH)
+    run_psql(args.dsn, DATA_SQL.format(
+        users=args.users,
+        courses=args.courses,
+        courses_per_user=5,
+        chapters_per_course=15,
+        activities_per_course=30,
+        days=180,
+    ), search_path=SEARCH_PATH)
+
+    parameters = sample_parameters(args.dsn, args.samples, args.seed)
+    before = run_queries(args.dsn, parameters)
+
+    run_psql(args.dsn, load_migration("06_add_hot_query_indexes.sql", SCHEMA), search_path=SEARCH_PATH)
+    after = run_queries(args.dsn, parameters)
+
+    print_comparison(f"Médiane de {len(parameters)} exécutions (EXPLAIN ANALYZE)", before, after)
+
+    remaining_seq_scans = [name for name, result in after.items() if any(s.startswith("Seq Scan") for s in result["scans"])]
+    if remaining_seq_scans:
+        print(f"\nAttention : parcours séquentiel encore présent pour {', '.join(remaining_seq_scans)}")
+
+
+if __name__ == "__main__":
+    main()
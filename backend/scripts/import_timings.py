@@ -0,0 +1,68 @@
+"""
+Rapport des temps d'import au démarrage d'un worker API
+
+Lance `python -X importtime -c "import app.main"` dans un sous-processus et
+affiche les modules les plus coûteux (temps cumulé), pour vérifier que les
+bibliothèques lourdes ne sont plus chargées au démarrage.
+
+Usage (depuis le dossier backend) :
+    python scripts/import_timings.py [--top 25] [--module app.main]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bibliothèques qui doivent être chargées à la demande uniquement
+HEAVY_MODULES = ("pdfplumber", "pdfminer", "docx", "pptx", "PIL")
+
+
+def collect_import_times(module: str) -> List[Tuple[str, int, int]]:
+    """
+    Retourne la liste (module, temps propre en µs, temps cumulé en µs)
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise SystemExit(f"L'import de {module} a échoué:\n{process.stderr[-2000:]}")
+
+    timings = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append((name.strip(), int(self_us), int(cumulative_us)))
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main", help="Module à importer")
+    parser.add_argument("--top", type=int, default=25, help="Nombre de modules à afficher")
+    args = parser.parse_args()
+
+    timings = collect_import_times(args.module)
+    top_level = {name: cumulative for name, _, cumulative in timings if "." not in name}
+    total_us = sum(top_level.values())
+
+    print(f"Import de {args.module}: {total_us / 1000:.1f} ms ({len(timings)} modules)\n")
+    print(f"{'cumulé (ms)':>12}  {'propre (ms)':>12}  module")
+    for name, self_us, cumulative_us in sorted(timings, key=lambda t: t[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>12.1f}  {self_us / 1000:>12.1f}  {name}")
+
+    loaded_heavy = sorted(name for name in top_level if name in HEAVY_MODULES)
+    if loaded_heavy:
+        print(f"\nAttention: bibliothèques lourdes importées au démarrage: {', '.join(loaded_heavy)}")
+    else:
+        print("\nAucune bibliothèque d'extraction lourde n'est importée au démarrage.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Utilitaires communs aux benchmarks SQL (EXPLAIN ANALYZE sur un Postgres local)
+
+Les benchmarks travaillent dans un schéma dédié, supprimé puis recréé à chaque
+exécution : ils ne doivent jamais être lancés contre la base Supabase de production.
+Seul `psql` est requis (aucune dépendance Python supplémentaire).
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "migrations")
+
+DEFAULT_DSN = os.getenv("BENCH_DATABASE_URL", "postgresql://postgres@localhost:5432/postgres")
+
+
+def run_psql(dsn: str, sql: str, search_path: Optional[str] = None) -> str:
+    """
+    Exécute du SQL avec psql et retourne la sortie brute (sans en-têtes)
+    """
+    if search_path:
+        sql = f"SET search_path TO {search_path};\n{sql}"
+    process = subprocess.run(
+        ["psql", dsn, "-X", "-q", "-A", "-t", "-v", "ON_ERROR_STOP=1"],
+        input=sql,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"Erreur psql:\n{process.stderr.strip()}")
+    return process.stdout
+
+
+def recreate_schema(dsn: str, schema: str) -> None:
+    run_psql(dsn, f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema};")
+
+
+def load_migration(filename: str, schema: str) -> str:
+    """
+    Lit une migration du dossier migrations/ en la redirigeant vers le schéma de test
+    """
+    with open(os.path.join(MIGRATIONS_DIR, filename), encoding="utf-8") as migration:
+        sql = migration.read()
+    # NOTIFY pgrst n'a pas de sens hors Supabase
+    sql = re.sub(r"^NOTIFY .*$", "", sql, flags=re.MULTILINE)
+    return sql.replace("public.", f"{schema}.")
+
+
+def _plan_nodes(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    nodes = [plan]
+    for child in plan.get("Plans", []):
+        nodes.extend(_plan_nodes(child))
+    return nodes
+
+
+def explain_analyze(
+    dsn: str,
+    query: str,
+    search_path: str,
+    setup: str = "",
+) -> Dict[str, Any]:
+    """
+    Exécute EXPLAIN ANALYZE dans une transaction annulée
+
+    Args:
+        setup: SQL exécuté avant la requête dans la même transaction (SET LOCAL ...)
+
+    Returns:
+        {"execution_ms", "planning_ms", "scans": ["Seq Scan on activities", ...]}
+    """
+    output = run_psql(
+        dsn,
+        f"BEGIN;\n{setup}\nEXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query};\nROLLBACK;",
+        search_path=search_path,
+    )
+    result = json.loads(output.strip())[0]
+    scans = []
+    for node in _plan_nodes(result["Plan"]):
+        if "Scan" in node["Node Type"] and node.get("Relation Name"):
+            label = f"{node['Node Type']} on {node['Relation Name']}"
+            if node.get("Index Name"):
+                label += f" using {node['Index Name']}"
+            scans.append(label)
+    return {
+        "execution_ms": result["Execution Time"],
+        "planning_ms": result["Planning Time"],
+        "shared_blocks": result["Plan"].get("Shared Hit Blocks", 0) + result["Plan"].get("Shared Read Blocks", 0),
+        "scans": scans,
+    }
+
+
+def measure(
+    dsn: str,
+    query_template: str,
+    parameters: List[Dict[str, str]],
+    search_path: str,
+    setup_template: str = "",
+) -> Dict[str, Any]:
+    """
+    Médiane d'EXPLAIN ANALYZE sur plusieurs jeux de paramètres
+    """
+    runs = [
+        explain_analyze(
+            dsn,
+            query_template.format(**params),
+            search_path,
+            setup=setup_template.format(**params),
+        )
+        for params in parameters
+    ]
+    return {
+        "execution_ms": statistics.median(run["execution_ms"] for run in runs),
+        "shared_blocks": statistics.median(run["shared_blocks"] for run in runs),
+        "scans": runs[-1]["scans"],
+    }
+
+
+def print_comparison(title: str, before: Dict[str, Dict[str, Any]], after: Dict[str, Dict[str, Any]]) -> None:
+    print(f"\n{title}\n")
+    print(f"{'requête':<34} {'avant (ms)':>11} {'après (ms)':>11} {'gain':>7}  plan après")
+    for name in before:
+        before_ms = before[name]["execution_ms"]
+        after_ms = after[name]["execution_ms"]
+        speedup = before_ms / after_ms if after_ms else float("inf")
+        print(f"{name:<34} {before_ms:>11.3f} {after_ms:>11.3f} {speedup:>6.1f}x  {', '.join(after[name]['scans'])}")
+        if any(scan.startswith("Seq Scan") for scan in before[name]["scans"]):
+            print(f"{'':<34} avant : {', '.join(before[name]['scans'])}")
@@ -0,0 +1,153 @@
+"""
+Point d'entrée de production du backend HALPI V2
+
+Lance plusieurs workers uvicorn (un par cœur disponible par défaut) sous
+gunicorn lorsqu'il est disponible (Linux/macOS), sinon sous le superviseur
+multi-processus d'uvicorn (Windows). uvloop et httptools sont utilisés
+automatiquement s'ils sont installés.
+
+Usage (depuis le dossier backend) :
+    python serve.py
+
+Configuration par variables d'environnement (voir .env.example) : HOST, PORT,
+WEB_CONCURRENCY, KEEP_ALIVE, BACKLOG, MAX_REQUESTS, MAX_REQUESTS_JITTER,
+WORKER_TIMEOUT, GRACEFUL_TIMEOUT, METRICS_MULTIPROC_DIR.
+
+Avec plusieurs workers, /metrics additionne les métriques de tous les workers
+(répertoire partagé METRICS_MULTIPROC_DIR, temporaire par défaut).
+"""
+import importlib.util
+import logging
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger("halpi.serve")
+
+APP_PATH = "app.main:app"
+
+
+def available_cpus() -> int:
+    """
+    Nombre de cœurs utilisables par le processus (respecte l'affinité CPU)
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return max(len(os.sched_getaffinity(0)), 1)
+    return os.cpu_count() or 1
+
+
+def worker_count() -> int:
+    if settings.WEB_CONCURRENCY:
+        return max(settings.WEB_CONCURRENCY, 1)
+    return available_cpus()
+
+
+def prepare_metrics_dir(workers: int) -> Optional[str]:
+    """
+    Répertoire partagé des métriques des workers, vidé au démarrage
+
+    Returns:
+        Le répertoire temporaire créé, à supprimer à l'arrêt
+    """
+    if workers <= 1:
+        return None
+    created = None
+    directory = settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        directory = created = tempfile.mkdtemp(prefix="halpi-metrics-")
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith((".json", ".tmp", ".lock")):
+            os.remove(os.path.join(directory, name))
+    # Lu par les workers forkés (gunicorn) comme par ceux qu'uvicorn relance (environnement)
+    settings.METRICS_MULTIPROC_DIR = directory
+    os.environ["METRICS_MULTIPROC_DIR"] = directory
+    return created
+
+
+def _is_installed(module_name: str) -> bool:
+    return importlib.util.find_spec(module_name) is not None
+
+
+def run_gunicorn(workers: int) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class HalpiApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+
+            return app
+
+    HalpiApplication({
+        "bind": f"{settings.HOST}:{settings.PORT}",
+        "workers": workers,
+        # Le worker uvicorn choisit uvloop/httptools s'ils sont installés
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "keepalive": settings.KEEP_ALIVE,
+        "backlog": settings.BACKLOG,
+        "max_requests": settings.MAX_REQUESTS,
+        "max_requests_jitter": settings.MAX_REQUESTS_JITTER,
+        "timeout": settings.WORKER_TIMEOUT,
+        # Doit rester supérieur à SHUTDOWN_DRAIN_TIMEOUT (drain du lifespan)
+        "graceful_timeout": settings.GRACEFUL_TIMEOUT,
+        "accesslog": "-",
+    }).run()
+
+
+def run_uvicorn(workers: int) -> None:
+    import uvicorn
+
+    if settings.MAX_REQUESTS:
+        # Le superviseur d'uvicorn ne relance pas un worker arrêté : le recyclage
+        # ferait perdre des workers, il n'est donc disponible que sous gunicorn
+        logger.warning("Recyclage des workers (MAX_REQUESTS) indisponible sans gunicorn")
+
+    uvicorn.run(
+        APP_PATH,
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=workers,
+        loop="auto",
+        http="auto",
+        timeout_keep_alive=settings.KEEP_ALIVE,
+        backlog=settings.BACKLOG,
+        timeout_graceful_shutdown=settings.GRACEFUL_TIMEOUT,
+    )
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    workers = worker_count()
+    logger.info(
+        "Démarrage de %d worker(s) sur %s:%d (uvloop: %s, httptools: %s)",
+        workers,
+        settings.HOST,
+        settings.PORT,
+        "oui" if _is_installed("uvloop") else "non",
+        "oui" if _is_installed("httptools") else "non",
+    )
+
+    metrics_dir = prepare_metrics_dir(workers)
+    try:
+        if _is_installed("gunicorn"):
+            run_gunicorn(workers)
+        else:
+            run_uvicorn(workers)
+    finally:
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import os
+from datetime import date
+
+# The settings require a Supabase project; the heartbeat never calls it
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+from fastapi.testclient import TestClient
+
+from app.api.models.pydantic_models import DailyLogUpdate, StudyHeartbeat
+from app.api.services.auth import get_current_active_user
+from app.api.services.daily_log_buffer import daily_log_buffer
+from app.main import app
+
+
+class _User:
+    id = "00000000-0000-0000-0000-000000000001"
+
+
+def test_optional_date_fields_accept_dates():
+    assert StudyHeartbeat(date="2026-10-18").date == date(2026, 10, 18)
+    assert DailyLogUpdate(date="2026-10-18").date == date(2026, 10, 18)
+    assert StudyHeartbeat().date is None
+
+
+def test_heartbeat_with_date():
+    app.dependency_overrides[get_current_active_user] = lambda: _User()
+    try:
+        response = TestClient(app).post(
+            "/api/v1/agenda/heartbeat",
+            json={"date": "2026-10-18", "sessions_completed": 1, "total_time": 25},
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 202
+    assert response.json()["date"] == "2026-10-18"
+    pending = daily_log_buffer.pending_for(_User.id)["2026-10-18"]
+    assert pending["sessions_completed"] >= 1
+    assert pending["total_time"] >= 25
@@ -0,0 +1,55 @@
+-- Migration pour ajouter les index correspondant aux requêtes les plus fréquentes du backend
+-- À exécuter dans l'éditeur SQL de Supabase
+--
+-- Sur une base déjà volumineuse, préférer CREATE INDEX CONCURRENTLY (hors transaction,
+-- une instruction à la fois) pour ne pas bloquer les écritures pendant la création.
+-- Mesure avant/après : backend/scripts/bench_hot_query_indexes.py
+
+-- Activités d'un utilisateur pour un cours, filtrées par statut
+-- (agenda.generate_recommendations, activities.calculate_course_progress, parcours)
+CREATE INDEX IF NOT EXISTS idx_activities_user_course_status
+ON public.activities(user_id, course_id, status);
+
+-- Activités restant à faire : index partiel, plus petit que l'index complet
+-- (agenda.generate_recommendations filtre sur status <> 'completed')
+CREATE INDEX IF NOT EXISTS idx_activities_user_course_pending
+ON public.activities(user_id, course_id)
+WHERE status <> 'completed';
+
+-- Journal quotidien par utilisateur et par date (plages de dates de l'agenda)
+CREATE INDEX IF NOT EXISTS idx_daily_logs_user_date
+ON public.daily_logs(user_id, date);
+
+-- Recommandations du jour d'un utilisateur
+CREATE INDEX IF NOT EXISTS idx_daily_recommendations_user_date
+ON public.daily_recommendations(user_id, date);
+
+-- Scores de quiz d'un utilisateur pour un cours (profile.get_user_course_progress)
+CREATE INDEX IF NOT EXISTS idx_quiz_results_user_course
+ON public.quiz_results(user_id, course_id)
+INCLUDE (quiz_number, score);
+
+-- Étapes terminées d'un cours : index partiel couvrant step_key
+CREATE INDEX IF NOT EXISTS idx_course_steps_user_course_completed
+ON public.course_steps(user_id, course_id)
+INCLUDE (step_key)
+WHERE completed;
+
+-- Progression d'un utilisateur pour un cours (lue et écrite à chaque activité terminée)
+CREATE INDEX IF NOT EXISTS idx_user_course_progress_user_course
+ON public.user_course_progress(user_id, course_id);
+
+-- Chapitres d'un cours triés par ordre : remplace idx_chapters_course_id (préfixe redondant)
+CREATE INDEX IF NOT EXISTS idx_chapters_course_order
+ON public.chapters(course_id, order_index);
+
+DROP INDEX IF EXISTS public.idx_chapters_course_id;
+
+-- Mettre à jour les statistiques pour que le planificateur utilise les nouveaux index
+ANALYZE public.activities;
+ANALYZE public.daily_logs;
+ANALYZE public.daily_recommendations;
+ANALYZE public.quiz_results;
+ANALYZE public.course_steps;
+ANALYZE public.user_course_progress;
+ANALYZE public.chapters;
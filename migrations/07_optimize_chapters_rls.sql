@@ -0,0 +1,97 @@
+-- Migration pour alléger les politiques RLS des tables chapters et chapter_progress
+-- À exécuter dans l'éditeur SQL de Supabase
+--
+-- Les politiques de la migration 03 parcourent user_courses (lui-même soumis à RLS)
+-- en appelant auth.uid() pour chaque ligne examinée, à chaque requête sur chapters.
+-- Ici :
+--   * l'appartenance aux cours est calculée par une fonction STABLE SECURITY DEFINER
+--     (pas de RLS imbriquée sur user_courses, résultat réutilisé pour toute la requête) ;
+--   * auth.uid() est appelé via (SELECT auth.uid()) pour être évalué une seule fois (initPlan) ;
+--   * un index (user_id, course_id) sert la recherche des inscriptions.
+-- Mesure avant/après : backend/scripts/bench_chapters_rls.py
+
+-- Inscriptions d'un utilisateur (RLS de chapters, agenda, liste des cours)
+CREATE INDEX IF NOT EXISTS idx_user_courses_user_course
+ON public.user_courses(user_id, course_id);
+
+-- Cours auxquels l'utilisateur connecté est inscrit
+-- (ROWS : quelques inscriptions par utilisateur, pour que le planificateur passe par les index)
+CREATE OR REPLACE FUNCTION public.current_user_course_ids()
+RETURNS SETOF UUID
+LANGUAGE sql
+STABLE
+ROWS 10
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+    SELECT course_id
+    FROM public.user_courses
+    WHERE user_id = (SELECT auth.uid());
+$$;
+
+-- La fonction ne renvoie que les inscriptions de l'appelant : exécutable par les utilisateurs connectés uniquement
+REVOKE EXECUTE ON FUNCTION public.current_user_course_ids() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.current_user_course_ids() TO authenticated;
+
+-- Politiques de chapters
+DROP POLICY IF EXISTS "Users can view chapters of their courses" ON public.chapters;
+CREATE POLICY "Users can view chapters of their courses"
+ON public.chapters
+FOR SELECT
+TO authenticated
+USING (course_id IN (SELECT public.current_user_course_ids()));
+
+DROP POLICY IF EXISTS "Users can insert chapters for their courses" ON public.chapters;
+CREATE POLICY "Users can insert chapters for their courses"
+ON public.chapters
+FOR INSERT
+TO authenticated
+WITH CHECK (course_id IN (SELECT public.current_user_course_ids()));
+
+DROP POLICY IF EXISTS "Users can update their own chapters" ON public.chapters;
+CREATE POLICY "Users can update their own chapters"
+ON public.chapters
+FOR UPDATE
+TO authenticated
+USING (course_id IN (SELECT public.current_user_course_ids()));
+
+DROP POLICY IF EXISTS "Users can delete their own chapters" ON public.chapters;
+CREATE POLICY "Users can delete their own chapters"
+ON public.chapters
+FOR DELETE
+TO authenticated
+USING (course_id IN (SELECT public.current_user_course_ids()));
+
+-- Politiques de chapter_progress
+DROP POLICY IF EXISTS "Users can view their own chapter progress" ON public.chapter_progress;
+CREATE POLICY "Users can view their own chapter progress"
+ON public.chapter_progress
+FOR SELECT
+TO authenticated
+USING (user_id = (SELECT auth.uid()));
+
+DROP POLICY IF EXISTS "Users can insert their own chapter progress" ON public.chapter_progress;
+CREATE POLICY "Users can insert their own chapter progress"
+ON public.chapter_progress
+FOR INSERT
+TO authenticated
+WITH CHECK (user_id = (SELECT auth.uid()));
+
+DROP POLICY IF EXISTS "Users can update their own chapter progress" ON public.chapter_progress;
+CREATE POLICY "Users can update their own chapter progress"
+ON public.chapter_progress
+FOR UPDATE
+TO authenticated
+USING (user_id = (SELECT auth.uid()));
+
+DROP POLICY IF EXISTS "Users can delete their own chapter progress" ON public.chapter_progress;
+CREATE POLICY "Users can delete their own chapter progress"
+ON public.chapter_progress
+FOR DELETE
+TO authenticated
+USING (user_id = (SELECT auth.uid()));
+
+ANALYZE public.user_courses;
+
+-- Mise à jour du cache de schéma pour Supabase
+NOTIFY pgrst, 'reload schema';
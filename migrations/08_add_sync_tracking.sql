@@ -0,0 +1,111 @@
+-- Migration pour la synchronisation incrémentale (GET /sync)
+-- À exécuter dans l'éditeur SQL de Supabase
+--
+-- Chaque table synchronisée reçoit une colonne updated_at maintenue par trigger et
+-- indexée avec user_id ; les suppressions sont enregistrées dans sync_tombstones
+-- pour que les clients puissent les répercuter dans leur cache local.
+
+-- Table des suppressions (« tombstones »)
+CREATE TABLE IF NOT EXISTS public.sync_tombstones (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL,
+    table_name TEXT NOT NULL,
+    row_id UUID NOT NULL,
+    deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_tombstones_user_deleted
+ON public.sync_tombstones(user_id, deleted_at);
+
+ALTER TABLE public.sync_tombstones ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own tombstones" ON public.sync_tombstones;
+CREATE POLICY "Users can view their own tombstones"
+ON public.sync_tombstones
+FOR SELECT
+TO authenticated
+USING (user_id = (SELECT auth.uid()));
+
+-- Enregistre la suppression d'une ligne appartenant à un utilisateur
+-- (SECURITY DEFINER : l'utilisateur n'a pas le droit d'écrire dans sync_tombstones)
+CREATE OR REPLACE FUNCTION public.record_sync_tombstone()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+BEGIN
+    INSERT INTO public.sync_tombstones (user_id, table_name, row_id)
+    VALUES (OLD.user_id, TG_TABLE_NAME, OLD.id);
+    RETURN OLD;
+END;
+$$;
+
+-- Met à jour updated_at à chaque modification (horloge réelle plutôt que début de transaction)
+CREATE OR REPLACE FUNCTION public.touch_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at = clock_timestamp();
+    RETURN NEW;
+END;
+$$;
+
+-- updated_at, index (user_id, updated_at) et triggers sur chaque table synchronisée
+DO $$
+DECLARE
+    synced_table TEXT;
+BEGIN
+    FOREACH synced_table IN ARRAY ARRAY[
+        'user_courses',
+        'user_course_progress',
+        'activities',
+        'daily_logs',
+        'daily_recommendations',
+        'course_steps',
+        'quiz_results',
+        'chapter_progress'
+    ] LOOP
+        EXECUTE format(
+            'ALTER TABLE public.%I ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()',
+            synced_table
+        );
+        EXECUTE format(
+            'CREATE INDEX IF NOT EXISTS %I ON public.%I(user_id, updated_at)',
+            'idx_' || synced_table || '_user_updated', synced_table
+        );
+
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON public.%I', 'touch_' || synced_table || '_updated_at', synced_table);
+        EXECUTE format(
+            'CREATE TRIGGER %I BEFORE INSERT OR UPDATE ON public.%I FOR EACH ROW EXECUTE FUNCTION public.touch_updated_at()',
+            'touch_' || synced_table || '_updated_at', synced_table
+        );
+
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON public.%I', 'tombstone_' || synced_table, synced_table);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER DELETE ON public.%I FOR EACH ROW EXECUTE FUNCTION public.record_sync_tombstone()',
+            'tombstone_' || synced_table, synced_table
+        );
+    END LOOP;
+END $$;
+
+-- Purge des suppressions plus anciennes que la rétention (SYNC_TOMBSTONE_RETENTION_DAYS côté backend) :
+-- un client dont le curseur est plus ancien refait une synchronisation complète.
+-- Avec pg_cron : SELECT cron.schedule('purge-sync-tombstones', '0 3 * * *', 'SELECT public.purge_sync_tombstones(30)');
+CREATE OR REPLACE FUNCTION public.purge_sync_tombstones(retention_days INTEGER DEFAULT 30)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH purged AS (
+        DELETE FROM public.sync_tombstones
+        WHERE deleted_at < NOW() - make_interval(days => retention_days)
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM purged;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.purge_sync_tombstones(INTEGER) FROM PUBLIC;
+
+-- Mise à jour du cache de schéma pour Supabase
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,25 @@
+-- Migration pour appliquer plusieurs changements d'état d'activités en une seule requête
+-- À exécuter dans l'éditeur SQL de Supabase
+--
+-- Utilisée par POST /activities/batch : un seul UPDATE pour toutes les activités,
+-- quelle que soit la combinaison de statuts et de scores.
+-- p_updates : [{"id": "<uuid>", "status": "completed", "score": 80}, ...]
+-- (status ou score absent = valeur inchangée)
+
+CREATE OR REPLACE FUNCTION public.apply_activity_updates(p_user_id UUID, p_updates JSONB)
+RETURNS SETOF public.activities
+LANGUAGE sql
+-- SECURITY INVOKER (par défaut) : les politiques RLS de activities s'appliquent
+AS $$
+    UPDATE public.activities AS a
+    SET status = COALESCE(u.status, a.status),
+        score = COALESCE(u.score, a.score),
+        updated_at = NOW()
+    FROM jsonb_to_recordset(p_updates) AS u(id UUID, status TEXT, score DOUBLE PRECISION)
+    WHERE a.id = u.id
+    AND a.user_id = p_user_id
+    RETURNING a.*;
+$$;
+
+-- Mise à jour du cache de schéma pour Supabase
+NOTIFY pgrst, 'reload schema';
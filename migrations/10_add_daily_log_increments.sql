@@ -0,0 +1,64 @@
+-- Migration pour incrémenter les compteurs de daily_logs de façon atomique
+-- À exécuter dans l'éditeur SQL de Supabase
+--
+-- Utilisée par POST /agenda/heartbeat : le backend cumule les incréments en mémoire
+-- et les applique par lots avec increment_daily_logs (un seul INSERT ... ON CONFLICT).
+
+-- Fusionner les doublons éventuels (création concurrente) avant d'ajouter la contrainte
+WITH ranked AS (
+    SELECT id, user_id, date,
+           ROW_NUMBER() OVER (PARTITION BY user_id, date ORDER BY created_at, id) AS position
+    FROM public.daily_logs
+),
+totals AS (
+    SELECT user_id, date,
+           SUM(sessions_completed) AS sessions_completed,
+           SUM(total_time) AS total_time,
+           BOOL_OR(goal_met) AS goal_met,
+           BOOL_OR(day_closed) AS day_closed
+    FROM public.daily_logs
+    GROUP BY user_id, date
+    HAVING COUNT(*) > 1
+)
+UPDATE public.daily_logs AS d
+SET sessions_completed = t.sessions_completed,
+    total_time = t.total_time,
+    goal_met = t.goal_met,
+    day_closed = t.day_closed
+FROM totals t, ranked r
+WHERE d.id = r.id
+AND r.position = 1
+AND r.user_id = t.user_id
+AND r.date = t.date;
+
+DELETE FROM public.daily_logs AS d
+USING (
+    SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id, date ORDER BY created_at, id) AS position
+    FROM public.daily_logs
+) AS r
+WHERE d.id = r.id
+AND r.position > 1;
+
+-- Un seul journal par utilisateur et par jour (remplace idx_daily_logs_user_date de la migration 06)
+CREATE UNIQUE INDEX IF NOT EXISTS daily_logs_user_date_key
+ON public.daily_logs(user_id, date);
+
+DROP INDEX IF EXISTS public.idx_daily_logs_user_date;
+
+-- Ajoute des incréments à plusieurs journaux, en créant ceux qui n'existent pas encore
+-- p_increments : [{"user_id": "<uuid>", "date": "2024-01-31", "sessions_completed": 1, "total_time": 25}, ...]
+CREATE OR REPLACE FUNCTION public.increment_daily_logs(p_increments JSONB)
+RETURNS SETOF public.daily_logs
+LANGUAGE sql
+AS $$
+    INSERT INTO public.daily_logs AS d (user_id, date, sessions_completed, total_time)
+    SELECT i.user_id, i.date, COALESCE(i.sessions_completed, 0), COALESCE(i.total_time, 0)
+    FROM jsonb_to_recordset(p_increments) AS i(user_id UUID, date DATE, sessions_completed INTEGER, total_time INTEGER)
+    ON CONFLICT (user_id, date) DO UPDATE
+    SET sessions_completed = d.sessions_completed + EXCLUDED.sessions_completed,
+        total_time = d.total_time + EXCLUDED.total_time
+    RETURNING d.*;
+$$;
+
+-- Mise à jour du cache de schéma pour Supabase
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,23 @@
+-- Migration pour garantir une seule recommandation par utilisateur et par jour
+-- À exécuter dans l'éditeur SQL de Supabase
+--
+-- Des générations concurrentes (plusieurs onglets) inséraient des doublons ;
+-- le backend écrit désormais avec un upsert sur (user_id, date).
+
+-- Supprimer les doublons en conservant la première recommandation générée
+DELETE FROM public.daily_recommendations AS d
+USING (
+    SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id, date ORDER BY created_at, id) AS position
+    FROM public.daily_recommendations
+) AS r
+WHERE d.id = r.id
+AND r.position > 1;
+
+-- Contrainte d'unicité utilisée par l'upsert (remplace idx_daily_recommendations_user_date de la migration 06)
+CREATE UNIQUE INDEX IF NOT EXISTS daily_recommendations_user_date_key
+ON public.daily_recommendations(user_id, date);
+
+DROP INDEX IF EXISTS public.idx_daily_recommendations_user_date;
+
+-- Mise à jour du cache de schéma pour Supabase
+NOTIFY pgrst, 'reload schema';
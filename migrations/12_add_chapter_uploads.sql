@@ -0,0 +1,43 @@
+-- Migration pour l'envoi direct des fichiers de chapitres vers Supabase Storage
+-- À exécuter dans l'éditeur SQL de Supabase
+--
+-- Le backend délivre une URL d'upload signée (POST /chapters/upload-url), le client
+-- envoie le fichier directement au bucket, puis POST /chapters/upload/finalize
+-- enregistre le fichier sur le chapitre et lance l'extraction.
+
+-- Colonnes utilisées par le service d'extraction et par la finalisation de l'upload
+ALTER TABLE public.chapters ADD COLUMN IF NOT EXISTS file_path TEXT;
+ALTER TABLE public.chapters ADD COLUMN IF NOT EXISTS content_type TEXT NOT NULL DEFAULT 'course';
+ALTER TABLE public.chapters ADD COLUMN IF NOT EXISTS json_data JSONB;
+ALTER TABLE public.chapters ADD COLUMN IF NOT EXISTS file_size BIGINT;
+ALTER TABLE public.chapters ADD COLUMN IF NOT EXISTS file_hash TEXT;
+ALTER TABLE public.chapters ADD COLUMN IF NOT EXISTS file_uploaded_at TIMESTAMP WITH TIME ZONE;
+
+COMMENT ON COLUMN public.chapters.file_path IS 'Emplacement du fichier source : <bucket>/<chemin>';
+COMMENT ON COLUMN public.chapters.file_hash IS 'SHA-256 (hexadécimal) du fichier source, recalculé à chaque extraction';
+
+-- Retrouver les chapitres partageant le même fichier (même contenu)
+CREATE INDEX IF NOT EXISTS idx_chapters_file_hash ON public.chapters(file_hash) WHERE file_hash IS NOT NULL;
+
+-- Bucket privé des fichiers de chapitres. La taille maximale est appliquée par Storage,
+-- l'URL signée ne limitant pas la taille du fichier envoyé (garder en phase avec
+-- CHAPTER_UPLOAD_MAX_BYTES côté backend)
+INSERT INTO storage.buckets (id, name, public, file_size_limit, allowed_mime_types)
+VALUES (
+    'chapters',
+    'chapters',
+    false,
+    52428800,
+    ARRAY[
+        'application/pdf',
+        'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+        'application/vnd.ms-powerpoint'
+    ]
+)
+ON CONFLICT (id) DO UPDATE
+SET file_size_limit = EXCLUDED.file_size_limit,
+    allowed_mime_types = EXCLUDED.allowed_mime_types;
+
+-- Mise à jour du cache de schéma pour Supabase
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,26 @@
+-- Migration pour accepter les formats bureautiques anciens et OpenDocument dans le bucket des chapitres
+-- À exécuter dans l'éditeur SQL de Supabase
+--
+-- Ces fichiers sont convertis par LibreOffice avant l'extraction (.doc, .odt, .rtf, .txt
+-- en DOCX ; .ppt, .odp en PPTX ; tableurs en PDF).
+
+UPDATE storage.buckets
+SET allowed_mime_types = ARRAY[
+    'application/pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'application/msword',
+    'application/vnd.ms-powerpoint',
+    'application/vnd.ms-excel',
+    'application/vnd.oasis.opendocument.text',
+    'application/vnd.oasis.opendocument.presentation',
+    'application/vnd.oasis.opendocument.spreadsheet',
+    'application/rtf',
+    'text/rtf',
+    'text/plain'
+]
+WHERE id = 'chapters';
+
+-- Mise à jour du cache de schéma pour Supabase
+NOTIFY pgrst, 'reload schema';
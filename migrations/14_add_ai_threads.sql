@@ -0,0 +1,36 @@
+-- Migration pour la réutilisation des threads de la passerelle IA
+-- À exécuter dans l'éditeur SQL de Supabase
+--
+-- La passerelle IA du backend (POST /ai/interact) envoie les consignes une seule fois
+-- par thread, puis réutilise le thread pour les demandes suivantes du même utilisateur,
+-- sur la même activité et pour le même type d'interaction.
+
+CREATE TABLE IF NOT EXISTS public.ai_threads (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    -- Activité concernée, ou 'default' pour les interactions hors activité
+    scope TEXT NOT NULL,
+    interaction_type TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    -- Empreinte des consignes envoyées au début du thread
+    prompt_version TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    last_used_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE (user_id, scope, interaction_type)
+);
+
+-- Les threads ne sont lus et écrits que par le backend ; l'utilisateur peut consulter les siens
+ALTER TABLE public.ai_threads ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own AI threads" ON public.ai_threads;
+CREATE POLICY "Users can view their own AI threads"
+ON public.ai_threads FOR SELECT
+TO authenticated
+USING (user_id = (SELECT auth.uid()));
+
+-- Nettoyage des threads inutilisés
+CREATE INDEX IF NOT EXISTS idx_ai_threads_last_used_at ON public.ai_threads(last_used_at);
+
+-- Mise à jour du cache de schéma pour Supabase
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,128 @@
+-- Migration pour les rapports IA précalculés (planning d'étude et rapport de progression)
+-- À exécuter dans l'éditeur SQL de Supabase
+--
+-- Le backend génère ces rapports hors ligne (GET /ai/reports/{type} les sert depuis cette
+-- table). Les triggers ci-dessous incrémentent input_version quand les données d'entrée
+-- changent de façon significative ; un rapport est à régénérer (dirty) tant que
+-- report_version, la version des entrées à partir de laquelle il a été produit, est inférieure.
+
+CREATE TABLE IF NOT EXISTS public.ai_reports (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    report_type TEXT NOT NULL CHECK (report_type IN ('study_planning', 'progress_report')),
+    -- Incrémentée par les triggers à chaque changement significatif des entrées
+    input_version BIGINT NOT NULL DEFAULT 1,
+    -- input_version lue avant la collecte des entrées du rapport enregistré
+    report_version BIGINT,
+    -- Empreinte SHA-256 des entrées et de la version du prompt
+    fingerprint TEXT,
+    report JSONB,
+    valid BOOLEAN NOT NULL DEFAULT FALSE,
+    generated_at TIMESTAMP WITH TIME ZONE,
+    -- Réservation par un worker pendant la génération (évite les générations en double)
+    claimed_until TIMESTAMP WITH TIME ZONE,
+    dirty BOOLEAN GENERATED ALWAYS AS (report_version IS NULL OR input_version > report_version) STORED,
+    UNIQUE (user_id, report_type)
+);
+
+-- Les rapports ne sont écrits que par le backend ; l'utilisateur peut consulter les siens
+ALTER TABLE public.ai_reports ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own AI reports" ON public.ai_reports;
+CREATE POLICY "Users can view their own AI reports"
+ON public.ai_reports FOR SELECT
+TO authenticated
+USING (user_id = (SELECT auth.uid()));
+
+-- Rapports à régénérer (tâche de fond) et plannings à renouveler chaque nuit
+CREATE INDEX IF NOT EXISTS idx_ai_reports_dirty
+ON public.ai_reports(input_version)
+WHERE dirty;
+
+CREATE INDEX IF NOT EXISTS idx_ai_reports_type_generated_at
+ON public.ai_reports(report_type, generated_at);
+
+-- Réserve un rapport pour p_seconds secondes s'il n'est pas déjà réservé par un autre worker
+-- (horloge de la base, commune à tous les workers) ; ne renvoie rien si la réservation échoue
+CREATE OR REPLACE FUNCTION public.claim_ai_report(p_id UUID, p_seconds INTEGER)
+RETURNS SETOF public.ai_reports
+LANGUAGE sql
+AS $$
+    UPDATE public.ai_reports
+    SET claimed_until = NOW() + make_interval(secs => p_seconds)
+    WHERE id = p_id
+    AND (claimed_until IS NULL OR claimed_until < NOW())
+    RETURNING *;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.claim_ai_report(UUID, INTEGER) FROM PUBLIC;
+
+-- Marque les deux rapports de l'utilisateur comme à régénérer
+-- (SECURITY DEFINER : l'utilisateur n'a pas le droit d'écrire dans ai_reports)
+CREATE OR REPLACE FUNCTION public.mark_ai_reports_dirty()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+DECLARE
+    target_user UUID;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        target_user := OLD.user_id;
+    ELSE
+        target_user := NEW.user_id;
+    END IF;
+
+    INSERT INTO public.ai_reports (user_id, report_type)
+    SELECT target_user, report_type
+    FROM unnest(ARRAY['study_planning', 'progress_report']) AS report_type
+    ON CONFLICT (user_id, report_type) DO UPDATE
+    SET input_version = public.ai_reports.input_version + 1;
+    RETURN NULL;
+END;
+$$;
+
+-- Progression : création, franchissement d'un palier de 10 %, confiance, examen
+DROP TRIGGER IF EXISTS ai_reports_progress_insert_delete ON public.user_course_progress;
+CREATE TRIGGER ai_reports_progress_insert_delete
+AFTER INSERT OR DELETE ON public.user_course_progress
+FOR EACH ROW EXECUTE FUNCTION public.mark_ai_reports_dirty();
+
+DROP TRIGGER IF EXISTS ai_reports_progress_update ON public.user_course_progress;
+CREATE TRIGGER ai_reports_progress_update
+AFTER UPDATE ON public.user_course_progress
+FOR EACH ROW
+WHEN (
+    floor(COALESCE(OLD.progression_rate, 0) / 10) IS DISTINCT FROM floor(COALESCE(NEW.progression_rate, 0) / 10)
+    OR round(OLD.confidence_level::NUMERIC) IS DISTINCT FROM round(NEW.confidence_level::NUMERIC)
+    OR OLD.exam_date IS DISTINCT FROM NEW.exam_date
+    OR OLD.exam_grade IS DISTINCT FROM NEW.exam_grade
+)
+EXECUTE FUNCTION public.mark_ai_reports_dirty();
+
+-- Journaux : une session terminée ou une journée clôturée (pas chaque ajout de temps d'étude)
+DROP TRIGGER IF EXISTS ai_reports_daily_logs_insert_delete ON public.daily_logs;
+CREATE TRIGGER ai_reports_daily_logs_insert_delete
+AFTER INSERT OR DELETE ON public.daily_logs
+FOR EACH ROW EXECUTE FUNCTION public.mark_ai_reports_dirty();
+
+DROP TRIGGER IF EXISTS ai_reports_daily_logs_update ON public.daily_logs;
+CREATE TRIGGER ai_reports_daily_logs_update
+AFTER UPDATE ON public.daily_logs
+FOR EACH ROW
+WHEN (
+    OLD.sessions_completed IS DISTINCT FROM NEW.sessions_completed
+    OR OLD.day_closed IS DISTINCT FROM NEW.day_closed
+    OR OLD.goal_met IS DISTINCT FROM NEW.goal_met
+)
+EXECUTE FUNCTION public.mark_ai_reports_dirty();
+
+-- Quiz : tout nouveau score
+DROP TRIGGER IF EXISTS ai_reports_quiz_results ON public.quiz_results;
+CREATE TRIGGER ai_reports_quiz_results
+AFTER INSERT OR UPDATE OR DELETE ON public.quiz_results
+FOR EACH ROW EXECUTE FUNCTION public.mark_ai_reports_dirty();
+
+-- Mise à jour du cache de schéma pour Supabase
+NOTIFY pgrst, 'reload schema';
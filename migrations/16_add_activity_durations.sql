@@ -0,0 +1,109 @@
+-- Migration pour estimer la durée des activités à partir de l'historique
+-- À exécuter dans l'éditeur SQL de Supabase
+--
+-- Les dates de début et de fin des activités sont enregistrées par trigger ; chaque activité
+-- terminée met à jour, sans relire l'historique, les statistiques de durée de son type pour
+-- l'utilisateur et pour l'ensemble des utilisateurs (user_id NULL) : moyenne et variance
+-- (algorithme de Welford), médiane et 90e centile (approximation stochastique).
+-- Le backend s'en sert pour le planning (agenda) et le temps d'étude des cours.
+-- Les activités terminées avant cette migration n'ont pas de durée connue.
+
+ALTER TABLE public.activities
+ADD COLUMN IF NOT EXISTS started_at TIMESTAMP WITH TIME ZONE,
+ADD COLUMN IF NOT EXISTS completed_at TIMESTAMP WITH TIME ZONE;
+
+CREATE TABLE IF NOT EXISTS public.activity_duration_stats (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    -- NULL : statistiques de tous les utilisateurs
+    user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
+    activity_type_id UUID NOT NULL REFERENCES public.activity_types(id) ON DELETE CASCADE,
+    samples INTEGER NOT NULL DEFAULT 0,
+    mean_minutes DOUBLE PRECISION NOT NULL DEFAULT 0,
+    -- Somme des carrés des écarts à la moyenne (variance = m2 / samples)
+    m2 DOUBLE PRECISION NOT NULL DEFAULT 0,
+    p50_minutes DOUBLE PRECISION NOT NULL DEFAULT 0,
+    p90_minutes DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    CONSTRAINT activity_duration_stats_user_type_key UNIQUE NULLS NOT DISTINCT (user_id, activity_type_id)
+);
+
+-- Les statistiques ne sont écrites que par le trigger ; l'utilisateur peut consulter les siennes
+ALTER TABLE public.activity_duration_stats ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own activity durations" ON public.activity_duration_stats;
+CREATE POLICY "Users can view their own activity durations"
+ON public.activity_duration_stats FOR SELECT
+TO authenticated
+USING (user_id = (SELECT auth.uid()));
+
+-- Dates de début (premier passage en cours) et de fin (passage à terminé)
+CREATE OR REPLACE FUNCTION public.set_activity_timestamps()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.status = 'in_progress' AND NEW.started_at IS NULL THEN
+        NEW.started_at := NOW();
+    END IF;
+    IF NEW.status = 'completed' AND OLD.status IS DISTINCT FROM 'completed' THEN
+        NEW.completed_at := NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS activities_set_timestamps ON public.activities;
+CREATE TRIGGER activities_set_timestamps
+BEFORE UPDATE OF status ON public.activities
+FOR EACH ROW
+WHEN (OLD.status IS DISTINCT FROM NEW.status)
+EXECUTE FUNCTION public.set_activity_timestamps();
+
+-- Ajoute la durée d'une activité terminée aux statistiques de son type
+-- (durées hors de 1 à 240 minutes ignorées : activité laissée ouverte, clic accidentel)
+-- SECURITY DEFINER : l'utilisateur n'a pas le droit d'écrire dans activity_duration_stats
+CREATE OR REPLACE FUNCTION public.record_activity_duration()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+DECLARE
+    sample DOUBLE PRECISION;
+BEGIN
+    sample := EXTRACT(EPOCH FROM (NEW.completed_at - NEW.started_at)) / 60;
+    IF sample IS NULL OR sample < 1 OR sample > 240 THEN
+        RETURN NULL;
+    END IF;
+
+    -- Centiles : pas proportionnel à l'écart type, décroissant avec le nombre
+    -- d'échantillons sans descendre sous 5 % pour suivre l'évolution des habitudes
+    INSERT INTO public.activity_duration_stats AS s
+        (user_id, activity_type_id, samples, mean_minutes, m2, p50_minutes, p90_minutes)
+    VALUES
+        (NEW.user_id, NEW.activity_type_id, 1, sample, 0, sample, sample),
+        (NULL, NEW.activity_type_id, 1, sample, 0, sample, sample)
+    ON CONFLICT (user_id, activity_type_id) DO UPDATE
+    SET samples = s.samples + 1,
+        mean_minutes = s.mean_minutes + (sample - s.mean_minutes) / (s.samples + 1),
+        m2 = s.m2 + (sample - s.mean_minutes) * (sample - s.mean_minutes - (sample - s.mean_minutes) / (s.samples + 1)),
+        p50_minutes = GREATEST(0, s.p50_minutes
+            + GREATEST(sqrt(s.m2 / s.samples), 1) * GREATEST(1.5 / sqrt(s.samples + 1), 0.05)
+            * CASE WHEN sample > s.p50_minutes THEN 0.5 ELSE -0.5 END),
+        p90_minutes = GREATEST(0, s.p90_minutes
+            + GREATEST(sqrt(s.m2 / s.samples), 1) * GREATEST(1.5 / sqrt(s.samples + 1), 0.05)
+            * CASE WHEN sample > s.p90_minutes THEN 0.9 ELSE -0.1 END),
+        updated_at = NOW();
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS activities_record_duration ON public.activities;
+CREATE TRIGGER activities_record_duration
+AFTER UPDATE OF status ON public.activities
+FOR EACH ROW
+WHEN (NEW.status = 'completed' AND OLD.status IS DISTINCT FROM 'completed' AND NEW.started_at IS NOT NULL)
+EXECUTE FUNCTION public.record_activity_duration();
+
+-- Mise à jour du cache de schéma pour Supabase
+NOTIFY pgrst, 'reload schema';
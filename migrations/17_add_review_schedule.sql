@@ -0,0 +1,244 @@
+-- Migration pour la répétition espacée (révisions des activités et des quiz notés)
+-- À exécuter dans l'éditeur SQL de Supabase
+--
+-- Chaque score enregistré (activité ou quiz) replanifie la révision de l'élément selon
+-- l'algorithme SM-2 : facteur de facilité, intervalle et date d'échéance. L'index
+-- (user_id, due_date) fait de « ce qui est à réviser d'ici telle date » une lecture de plage,
+-- et de chaque mise à jour une écriture d'index en O(log n).
+-- Les recommandations (GET /agenda/recommendations) et GET /agenda/reviews s'en servent.
+-- Chaque validation d'une activité est datée (activities.last_completed_at) : une révision
+-- refaite avec le même score est replanifiée elle aussi.
+
+CREATE TABLE IF NOT EXISTS public.review_items (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    course_id UUID,
+    -- Élément révisé : une activité, ou un quiz d'un cours (course_id, quiz_number)
+    activity_id UUID REFERENCES public.activities(id) ON DELETE CASCADE,
+    quiz_number INTEGER,
+    ease_factor DOUBLE PRECISION NOT NULL DEFAULT 2.5,
+    interval_days INTEGER NOT NULL DEFAULT 0,
+    repetitions INTEGER NOT NULL DEFAULT 0,
+    lapses INTEGER NOT NULL DEFAULT 0,
+    last_score DOUBLE PRECISION,
+    last_reviewed_at TIMESTAMP WITH TIME ZONE,
+    due_date DATE NOT NULL,
+    CHECK ((activity_id IS NULL) <> (quiz_number IS NULL))
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS review_items_activity_key
+ON public.review_items(activity_id)
+WHERE activity_id IS NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS review_items_quiz_key
+ON public.review_items(user_id, course_id, quiz_number)
+WHERE quiz_number IS NOT NULL;
+
+-- Révisions échues d'un utilisateur, par date
+CREATE INDEX IF NOT EXISTS idx_review_items_user_due_date
+ON public.review_items(user_id, due_date);
+
+-- Les révisions ne sont écrites que par les triggers ; l'utilisateur peut consulter les siennes
+ALTER TABLE public.review_items ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own review items" ON public.review_items;
+CREATE POLICY "Users can view their own review items"
+ON public.review_items FOR SELECT
+TO authenticated
+USING (user_id = (SELECT auth.uid()));
+
+-- Replanifie un élément après un score (en pourcentage) selon SM-2 :
+-- note q = score / 20 (0 à 5) ; en dessous de 3, l'élément est à revoir le lendemain
+CREATE OR REPLACE FUNCTION public.schedule_review(
+    p_user_id UUID,
+    p_course_id UUID,
+    p_activity_id UUID,
+    p_quiz_number INTEGER,
+    p_score DOUBLE PRECISION
+)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+DECLARE
+    item public.review_items%ROWTYPE;
+    quality INTEGER := LEAST(5, GREATEST(0, floor(p_score / 20)))::INTEGER;
+BEGIN
+    IF p_activity_id IS NOT NULL THEN
+        SELECT * INTO item FROM public.review_items
+        WHERE activity_id = p_activity_id
+        FOR UPDATE;
+    ELSE
+        SELECT * INTO item FROM public.review_items
+        WHERE user_id = p_user_id AND course_id = p_course_id AND quiz_number = p_quiz_number
+        FOR UPDATE;
+    END IF;
+
+    IF item.id IS NULL THEN
+        item.ease_factor := 2.5;
+        item.interval_days := 0;
+        item.repetitions := 0;
+        item.lapses := 0;
+    END IF;
+
+    IF quality < 3 THEN
+        item.repetitions := 0;
+        item.interval_days := 1;
+        item.lapses := item.lapses + 1;
+    ELSE
+        item.repetitions := item.repetitions + 1;
+        item.interval_days := CASE item.repetitions
+            WHEN 1 THEN 1
+            WHEN 2 THEN 6
+            ELSE GREATEST(1, round(item.interval_days * item.ease_factor))::INTEGER
+        END;
+    END IF;
+    item.ease_factor := GREATEST(1.3, item.ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02));
+
+    IF p_activity_id IS NOT NULL THEN
+        INSERT INTO public.review_items (
+            user_id, course_id, activity_id, ease_factor, interval_days,
+            repetitions, lapses, last_score, last_reviewed_at, due_date
+        )
+        VALUES (
+            p_user_id, p_course_id, p_activity_id, item.ease_factor, item.interval_days,
+            item.repetitions, item.lapses, p_score, NOW(), CURRENT_DATE + item.interval_days
+        )
+        ON CONFLICT (activity_id) WHERE activity_id IS NOT NULL DO UPDATE
+        SET course_id = EXCLUDED.course_id,
+            ease_factor = EXCLUDED.ease_factor,
+            interval_days = EXCLUDED.interval_days,
+            repetitions = EXCLUDED.repetitions,
+            lapses = EXCLUDED.lapses,
+            last_score = EXCLUDED.last_score,
+            last_reviewed_at = EXCLUDED.last_reviewed_at,
+            due_date = EXCLUDED.due_date;
+    ELSE
+        INSERT INTO public.review_items (
+            user_id, course_id, quiz_number, ease_factor, interval_days,
+            repetitions, lapses, last_score, last_reviewed_at, due_date
+        )
+        VALUES (
+            p_user_id, p_course_id, p_quiz_number, item.ease_factor, item.interval_days,
+            item.repetitions, item.lapses, p_score, NOW(), CURRENT_DATE + item.interval_days
+        )
+        ON CONFLICT (user_id, course_id, quiz_number) WHERE quiz_number IS NOT NULL DO UPDATE
+        SET ease_factor = EXCLUDED.ease_factor,
+            interval_days = EXCLUDED.interval_days,
+            repetitions = EXCLUDED.repetitions,
+            lapses = EXCLUDED.lapses,
+            last_score = EXCLUDED.last_score,
+            last_reviewed_at = EXCLUDED.last_reviewed_at,
+            due_date = EXCLUDED.due_date;
+    END IF;
+END;
+$$;
+
+-- Fonction interne, appelée seulement par les triggers ci-dessous (qui s'exécutent avec les droits
+-- de leur propriétaire) : Supabase accorde EXECUTE explicitement à anon, authenticated et
+-- service_role sur les fonctions de public, d'où leur retrait un par un
+REVOKE EXECUTE ON FUNCTION public.schedule_review(UUID, UUID, UUID, INTEGER, DOUBLE PRECISION)
+FROM PUBLIC, anon, authenticated, service_role;
+
+CREATE OR REPLACE FUNCTION public.schedule_activity_review()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+BEGIN
+    PERFORM public.schedule_review(NEW.user_id, NEW.course_id, NEW.id, NULL, NEW.score);
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.schedule_quiz_review()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+BEGIN
+    PERFORM public.schedule_review(NEW.user_id, NEW.course_id, NULL, NEW.quiz_number, NEW.score);
+    RETURN NULL;
+END;
+$$;
+
+-- Date de chaque validation, y compris d'une activité déjà terminée (révision) : écrite par
+-- POST /activities/{id}/complete et par les opérations "complete" de apply_activity_updates
+ALTER TABLE public.activities
+ADD COLUMN IF NOT EXISTS last_completed_at TIMESTAMP WITH TIME ZONE;
+
+-- Migration 09 avec la date de validation : un statut ou un score simplement réécrit
+-- (opération "start" ou "score", COALESCE sur l'ancienne valeur) ne la change pas
+CREATE OR REPLACE FUNCTION public.apply_activity_updates(p_user_id UUID, p_updates JSONB)
+RETURNS SETOF public.activities
+LANGUAGE sql
+-- SECURITY INVOKER (par défaut) : les politiques RLS de activities s'appliquent
+AS $$
+    UPDATE public.activities AS a
+    SET status = COALESCE(u.status, a.status),
+        score = COALESCE(u.score, a.score),
+        last_completed_at = CASE WHEN u.status = 'completed' THEN NOW() ELSE a.last_completed_at END,
+        updated_at = NOW()
+    FROM jsonb_to_recordset(p_updates) AS u(id UUID, status TEXT, score DOUBLE PRECISION)
+    WHERE a.id = u.id
+    AND a.user_id = p_user_id
+    RETURNING a.*;
+$$;
+
+-- Chaque validation notée (nouvelle date de validation, passage à terminé) et chaque nouveau score ;
+-- apply_activity_updates réécrit le score à chaque opération, d'où la comparaison avec l'ancien
+DROP TRIGGER IF EXISTS activities_schedule_review ON public.activities;
+CREATE TRIGGER activities_schedule_review
+AFTER INSERT ON public.activities
+FOR EACH ROW
+WHEN (NEW.score IS NOT NULL)
+EXECUTE FUNCTION public.schedule_activity_review();
+
+DROP TRIGGER IF EXISTS activities_schedule_review_update ON public.activities;
+CREATE TRIGGER activities_schedule_review_update
+AFTER UPDATE OF score, status, last_completed_at ON public.activities
+FOR EACH ROW
+WHEN (
+    NEW.score IS NOT NULL
+    AND (
+        OLD.score IS DISTINCT FROM NEW.score
+        OR OLD.last_completed_at IS DISTINCT FROM NEW.last_completed_at
+        OR (NEW.status = 'completed' AND OLD.status IS DISTINCT FROM 'completed')
+    )
+)
+EXECUTE FUNCTION public.schedule_activity_review();
+
+DROP TRIGGER IF EXISTS quiz_results_schedule_review ON public.quiz_results;
+CREATE TRIGGER quiz_results_schedule_review
+AFTER INSERT ON public.quiz_results
+FOR EACH ROW
+WHEN (NEW.score IS NOT NULL AND NEW.quiz_number IS NOT NULL)
+EXECUTE FUNCTION public.schedule_quiz_review();
+
+DROP TRIGGER IF EXISTS quiz_results_schedule_review_update ON public.quiz_results;
+CREATE TRIGGER quiz_results_schedule_review_update
+AFTER UPDATE OF score ON public.quiz_results
+FOR EACH ROW
+WHEN (NEW.score IS NOT NULL AND NEW.quiz_number IS NOT NULL AND OLD.score IS DISTINCT FROM NEW.score)
+EXECUTE FUNCTION public.schedule_quiz_review();
+
+-- Planifie une première révision des scores déjà enregistrés
+SELECT public.schedule_review(a.user_id, a.course_id, a.id, NULL, a.score)
+FROM public.activities AS a
+WHERE a.score IS NOT NULL
+AND NOT EXISTS (SELECT 1 FROM public.review_items AS r WHERE r.activity_id = a.id);
+
+SELECT public.schedule_review(q.user_id, q.course_id, NULL, q.quiz_number, q.score)
+FROM public.quiz_results AS q
+WHERE q.score IS NOT NULL
+AND q.quiz_number IS NOT NULL
+AND NOT EXISTS (
+    SELECT 1 FROM public.review_items AS r
+    WHERE r.user_id = q.user_id AND r.course_id = q.course_id AND r.quiz_number = q.quiz_number
+);
+
+-- Mise à jour du cache de schéma pour Supabase
+NOTIFY pgrst, 'reload schema';
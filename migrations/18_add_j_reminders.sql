@@ -0,0 +1,262 @@
+-- Migration pour les rappels d'examen J-7 / J-3 / J-1
+-- À exécuter dans l'éditeur SQL de Supabase
+--
+-- Les dates de rappel sont calculées en bloc (un trigger par instruction) quand exam_date est
+-- défini ou modifié sur user_courses, y compris par les écritures directes du frontend.
+-- next_reminder_on, la date du prochain rappel à envoyer, est indexée : la tâche quotidienne
+-- du backend réserve les rappels échus avec claim_due_j_reminders (lecture de plage), les
+-- envoie par le notificateur configuré (REMINDER_NOTIFIER), puis passe au rappel suivant ceux
+-- qui ont été envoyés (complete_j_reminders) et relâche les autres (release_j_reminders).
+
+CREATE TABLE IF NOT EXISTS public.j_reminders (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_course_id UUID NOT NULL REFERENCES public.user_courses(id) ON DELETE CASCADE,
+    j7 DATE,
+    j3 DATE,
+    j1 DATE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE public.j_reminders
+ADD COLUMN IF NOT EXISTS user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
+ADD COLUMN IF NOT EXISTS course_id UUID,
+ADD COLUMN IF NOT EXISTS exam_date DATE,
+-- Prochain rappel à envoyer ('j7', 'j3' ou 'j1') et sa date ; NULL une fois tous envoyés
+ADD COLUMN IF NOT EXISTS next_reminder TEXT,
+ADD COLUMN IF NOT EXISTS next_reminder_on DATE,
+ADD COLUMN IF NOT EXISTS last_reminder TEXT,
+ADD COLUMN IF NOT EXISTS last_sent_at TIMESTAMP WITH TIME ZONE,
+-- Rappel réservé par un worker jusqu'à cette date (envoi en cours)
+ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMP WITH TIME ZONE;
+
+-- Un seul jeu de rappels par cours de l'utilisateur (en conservant le plus ancien)
+DELETE FROM public.j_reminders AS d
+USING (
+    SELECT id, ROW_NUMBER() OVER (PARTITION BY user_course_id ORDER BY created_at, id) AS position
+    FROM public.j_reminders
+) AS r
+WHERE d.id = r.id
+AND r.position > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS j_reminders_user_course_key
+ON public.j_reminders(user_course_id);
+
+-- Rappels échus (tâche quotidienne)
+CREATE INDEX IF NOT EXISTS idx_j_reminders_next_reminder_on
+ON public.j_reminders(next_reminder_on)
+WHERE next_reminder_on IS NOT NULL;
+
+ALTER TABLE public.j_reminders ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own exam reminders" ON public.j_reminders;
+CREATE POLICY "Users can view their own exam reminders"
+ON public.j_reminders FOR SELECT
+TO authenticated
+USING (user_id = (SELECT auth.uid()));
+
+-- (Re)calcule les rappels des cours donnés : J-7, J-3 et J-1 de la date d'examen, le prochain
+-- étant le premier qui n'est pas encore passé. Les rappels d'un cours sans date d'examen sont
+-- supprimés ; ceux dont la date d'examen n'a pas changé ne sont pas réécrits.
+CREATE OR REPLACE FUNCTION public.refresh_j_reminders(p_user_course_ids UUID[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    DELETE FROM public.j_reminders AS r
+    USING public.user_courses AS uc
+    WHERE r.user_course_id = uc.id
+    AND uc.id = ANY (p_user_course_ids)
+    AND uc.exam_date IS NULL;
+
+    INSERT INTO public.j_reminders (
+        user_course_id, user_id, course_id, exam_date, j7, j3, j1, next_reminder, next_reminder_on
+    )
+    SELECT uc.id, uc.user_id, uc.course_id, uc.exam_date,
+           uc.exam_date - 7, uc.exam_date - 3, uc.exam_date - 1,
+           next.reminder, next.remind_on
+    FROM public.user_courses AS uc
+    LEFT JOIN LATERAL (
+        SELECT v.reminder, v.remind_on
+        FROM (VALUES ('j7', uc.exam_date - 7), ('j3', uc.exam_date - 3), ('j1', uc.exam_date - 1))
+            AS v(reminder, remind_on)
+        WHERE v.remind_on >= CURRENT_DATE
+        ORDER BY v.remind_on
+        LIMIT 1
+    ) AS next ON TRUE
+    WHERE uc.id = ANY (p_user_course_ids)
+    AND uc.exam_date IS NOT NULL
+    ON CONFLICT (user_course_id) DO UPDATE
+    SET user_id = EXCLUDED.user_id,
+        course_id = EXCLUDED.course_id,
+        exam_date = EXCLUDED.exam_date,
+        j7 = EXCLUDED.j7,
+        j3 = EXCLUDED.j3,
+        j1 = EXCLUDED.j1,
+        next_reminder = EXCLUDED.next_reminder,
+        next_reminder_on = EXCLUDED.next_reminder_on,
+        last_reminder = NULL,
+        last_sent_at = NULL,
+        claimed_until = NULL
+    WHERE public.j_reminders.exam_date IS DISTINCT FROM EXCLUDED.exam_date;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$;
+
+-- Fonction interne, appelée seulement par le trigger de user_courses (droits de son propriétaire) :
+-- Supabase accorde EXECUTE explicitement à anon, authenticated et service_role, d'où leur retrait
+REVOKE EXECUTE ON FUNCTION public.refresh_j_reminders(UUID[])
+FROM PUBLIC, anon, authenticated, service_role;
+
+CREATE OR REPLACE FUNCTION public.user_courses_refresh_j_reminders()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM public.refresh_j_reminders(ARRAY(
+            SELECT n.id FROM new_rows AS n WHERE n.exam_date IS NOT NULL
+        ));
+    ELSE
+        PERFORM public.refresh_j_reminders(ARRAY(
+            SELECT n.id
+            FROM new_rows AS n
+            JOIN old_rows AS o ON o.id = n.id
+            WHERE o.exam_date IS DISTINCT FROM n.exam_date
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Un trigger par instruction : une seule mise à jour des rappels pour toutes les lignes écrites
+DROP TRIGGER IF EXISTS user_courses_j_reminders_insert ON public.user_courses;
+CREATE TRIGGER user_courses_j_reminders_insert
+AFTER INSERT ON public.user_courses
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION public.user_courses_refresh_j_reminders();
+
+DROP TRIGGER IF EXISTS user_courses_j_reminders_update ON public.user_courses;
+CREATE TRIGGER user_courses_j_reminders_update
+AFTER UPDATE ON public.user_courses
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION public.user_courses_refresh_j_reminders();
+
+-- Réserve pour p_lease_seconds au plus p_limit rappels échus au p_today et non réservés
+-- (SKIP LOCKED : plusieurs workers peuvent tourner en même temps) ; renvoie pour chacun le
+-- dernier rappel échu : après une interruption, J-3 est envoyé plutôt qu'un J-7 dépassé.
+-- Le rappel suivant n'est pas encore programmé : un rappel non envoyé n'est pas perdu.
+DROP FUNCTION IF EXISTS public.claim_due_j_reminders(DATE, INTEGER);
+CREATE OR REPLACE FUNCTION public.claim_due_j_reminders(p_today DATE, p_limit INTEGER, p_lease_seconds INTEGER)
+RETURNS TABLE (
+    id UUID,
+    user_id UUID,
+    course_id UUID,
+    user_course_id UUID,
+    exam_date DATE,
+    reminder TEXT,
+    remind_on DATE
+)
+LANGUAGE sql
+AS $$
+    WITH due AS (
+        SELECT r.id, latest.reminder, latest.remind_on
+        FROM public.j_reminders AS r
+        CROSS JOIN LATERAL (
+            SELECT v.reminder, v.remind_on
+            FROM (VALUES ('j7', r.j7), ('j3', r.j3), ('j1', r.j1)) AS v(reminder, remind_on)
+            WHERE v.remind_on >= r.next_reminder_on
+            AND v.remind_on <= p_today
+            ORDER BY v.remind_on DESC
+            LIMIT 1
+        ) AS latest
+        WHERE r.next_reminder_on <= p_today
+        AND (r.claimed_until IS NULL OR r.claimed_until < NOW())
+        ORDER BY r.next_reminder_on
+        LIMIT p_limit
+        FOR UPDATE OF r SKIP LOCKED
+    )
+    UPDATE public.j_reminders AS r
+    SET claimed_until = NOW() + make_interval(secs => p_lease_seconds)
+    FROM due
+    WHERE r.id = due.id
+    RETURNING r.id, r.user_id, r.course_id, r.user_course_id, r.exam_date, due.reminder, due.remind_on;
+$$;
+
+-- Réservée à la tâche du backend (clé service_role)
+REVOKE EXECUTE ON FUNCTION public.claim_due_j_reminders(DATE, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.claim_due_j_reminders(DATE, INTEGER, INTEGER) TO service_role;
+
+-- Rappels réservés traités (envoyés, ou examen passé) : passe chacun au premier rappel après
+-- p_today. Un rappel dont la date d'examen a changé entre-temps n'est pas modifié.
+CREATE OR REPLACE FUNCTION public.complete_j_reminders(p_ids UUID[], p_today DATE)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    UPDATE public.j_reminders AS r
+    SET last_reminder = (
+            SELECT v.reminder
+            FROM (VALUES ('j7', r.j7), ('j3', r.j3), ('j1', r.j1)) AS v(reminder, remind_on)
+            WHERE v.remind_on <= p_today
+            ORDER BY v.remind_on DESC
+            LIMIT 1
+        ),
+        last_sent_at = NOW(),
+        (next_reminder, next_reminder_on) = (
+            SELECT v.reminder, v.remind_on
+            FROM (VALUES ('j7', r.j7), ('j3', r.j3), ('j1', r.j1)) AS v(reminder, remind_on)
+            WHERE v.remind_on > p_today
+            ORDER BY v.remind_on
+            LIMIT 1
+        ),
+        claimed_until = NULL
+    WHERE r.id = ANY (p_ids)
+    AND r.next_reminder_on <= p_today;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.complete_j_reminders(UUID[], DATE) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.complete_j_reminders(UUID[], DATE) TO service_role;
+
+-- Rappels réservés dont l'envoi a échoué : à nouveau disponibles pour le prochain passage
+CREATE OR REPLACE FUNCTION public.release_j_reminders(p_ids UUID[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    UPDATE public.j_reminders AS r
+    SET claimed_until = NULL
+    WHERE r.id = ANY (p_ids);
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.release_j_reminders(UUID[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.release_j_reminders(UUID[]) TO service_role;
+
+-- Rappels des dates d'examen déjà saisies
+SELECT public.refresh_j_reminders(ARRAY(
+    SELECT id FROM public.user_courses WHERE exam_date IS NOT NULL
+));
+
+-- Mise à jour du cache de schéma pour Supabase
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,135 @@
+-- Migration pour les statistiques d'étude hebdomadaires et mensuelles
+-- À exécuter dans l'éditeur SQL de Supabase
+--
+-- study_stats cumule les journaux quotidiens (daily_logs) par semaine (commençant le lundi)
+-- et par mois. Les cumuls sont tenus à jour par des triggers par instruction : chaque écriture
+-- de daily_logs (y compris un lot de increment_daily_logs) ajoute en une seule requête la
+-- différence entre les nouvelles et les anciennes lignes aux périodes concernées.
+-- GET /agenda/stats ne lit que ces cumuls : une année d'historique tient en quelques dizaines de lignes.
+
+CREATE TABLE IF NOT EXISTS public.study_stats (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    granularity TEXT NOT NULL CHECK (granularity IN ('week', 'month')),
+    -- Premier jour de la période (lundi de la semaine ou premier du mois)
+    period_start DATE NOT NULL,
+    sessions_completed BIGINT NOT NULL DEFAULT 0,
+    total_time BIGINT NOT NULL DEFAULT 0,
+    days_logged INTEGER NOT NULL DEFAULT 0,
+    goal_met_days INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    CONSTRAINT study_stats_user_period_key UNIQUE (user_id, granularity, period_start)
+);
+
+-- Les cumuls ne sont écrits que par les triggers ; l'utilisateur peut consulter les siens
+ALTER TABLE public.study_stats ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own study stats" ON public.study_stats;
+CREATE POLICY "Users can view their own study stats"
+ON public.study_stats FOR SELECT
+TO authenticated
+USING (user_id = (SELECT auth.uid()));
+
+-- Ajoute aux cumuls les lignes écrites et retire les lignes remplacées ou supprimées
+CREATE OR REPLACE FUNCTION public.rollup_daily_logs()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+DECLARE
+    added public.daily_logs[] := '{}';
+    removed public.daily_logs[] := '{}';
+BEGIN
+    -- Seules les tables de transition de l'opération existent
+    IF TG_OP <> 'DELETE' THEN
+        added := ARRAY(SELECT n::public.daily_logs FROM new_rows AS n);
+    END IF;
+    IF TG_OP <> 'INSERT' THEN
+        removed := ARRAY(SELECT o::public.daily_logs FROM old_rows AS o);
+    END IF;
+
+    WITH changes AS (
+        SELECT n.user_id, n.date, n.sessions_completed, n.total_time, n.goal_met, 1 AS sign
+        FROM unnest(added) AS n
+        UNION ALL
+        SELECT o.user_id, o.date, o.sessions_completed, o.total_time, o.goal_met, -1 AS sign
+        FROM unnest(removed) AS o
+    ),
+    deltas AS (
+        SELECT c.user_id, p.granularity, p.period_start,
+               SUM(c.sign * COALESCE(c.sessions_completed, 0)) AS sessions_completed,
+               SUM(c.sign * COALESCE(c.total_time, 0)) AS total_time,
+               SUM(c.sign) AS days_logged,
+               SUM(CASE WHEN c.goal_met THEN c.sign ELSE 0 END) AS goal_met_days
+        FROM changes AS c
+        CROSS JOIN LATERAL (
+            VALUES ('week', date_trunc('week', c.date)::DATE),
+                   ('month', date_trunc('month', c.date)::DATE)
+        ) AS p(granularity, period_start)
+        WHERE c.user_id IS NOT NULL AND c.date IS NOT NULL
+        GROUP BY c.user_id, p.granularity, p.period_start
+    )
+    INSERT INTO public.study_stats AS s
+        (user_id, granularity, period_start, sessions_completed, total_time, days_logged, goal_met_days)
+    SELECT d.user_id, d.granularity, d.period_start, d.sessions_completed, d.total_time, d.days_logged, d.goal_met_days
+    FROM deltas AS d
+    WHERE d.sessions_completed <> 0 OR d.total_time <> 0 OR d.days_logged <> 0 OR d.goal_met_days <> 0
+    -- Ordre fixe : deux lots concurrents verrouillent les cumuls dans le même ordre
+    ORDER BY d.user_id, d.granularity, d.period_start
+    ON CONFLICT (user_id, granularity, period_start) DO UPDATE
+    SET sessions_completed = s.sessions_completed + EXCLUDED.sessions_completed,
+        total_time = s.total_time + EXCLUDED.total_time,
+        days_logged = s.days_logged + EXCLUDED.days_logged,
+        goal_met_days = s.goal_met_days + EXCLUDED.goal_met_days,
+        updated_at = NOW();
+    RETURN NULL;
+END;
+$$;
+
+-- Une table de transition par trigger : un trigger par opération
+DROP TRIGGER IF EXISTS daily_logs_rollup_insert ON public.daily_logs;
+CREATE TRIGGER daily_logs_rollup_insert
+AFTER INSERT ON public.daily_logs
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION public.rollup_daily_logs();
+
+DROP TRIGGER IF EXISTS daily_logs_rollup_update ON public.daily_logs;
+CREATE TRIGGER daily_logs_rollup_update
+AFTER UPDATE ON public.daily_logs
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION public.rollup_daily_logs();
+
+DROP TRIGGER IF EXISTS daily_logs_rollup_delete ON public.daily_logs;
+CREATE TRIGGER daily_logs_rollup_delete
+AFTER DELETE ON public.daily_logs
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION public.rollup_daily_logs();
+
+-- Cumuls de l'historique existant (recalculés si la migration est rejouée)
+INSERT INTO public.study_stats
+    (user_id, granularity, period_start, sessions_completed, total_time, days_logged, goal_met_days)
+SELECT l.user_id, p.granularity, p.period_start,
+       SUM(COALESCE(l.sessions_completed, 0)),
+       SUM(COALESCE(l.total_time, 0)),
+       COUNT(*),
+       COUNT(*) FILTER (WHERE l.goal_met)
+FROM public.daily_logs AS l
+CROSS JOIN LATERAL (
+    VALUES ('week', date_trunc('week', l.date)::DATE),
+           ('month', date_trunc('month', l.date)::DATE)
+) AS p(granularity, period_start)
+WHERE l.user_id IS NOT NULL AND l.date IS NOT NULL
+GROUP BY l.user_id, p.granularity, p.period_start
+ON CONFLICT (user_id, granularity, period_start) DO UPDATE
+SET sessions_completed = EXCLUDED.sessions_completed,
+    total_time = EXCLUDED.total_time,
+    days_logged = EXCLUDED.days_logged,
+    goal_met_days = EXCLUDED.goal_met_days,
+    updated_at = NOW();
+
+-- Mise à jour du cache de schéma pour Supabase
+NOTIFY pgrst, 'reload schema';
@@ -45,18 +45,10 @@ const AIEvaluationButton: React.FC<AIEvaluationButtonProps> = ({
     setSuccess(false);
     
     try {
-      // Récupérer l'ID de l'organisation depuis les variables d'environnement
-      const organizationId = import.meta.env.VITE_FABRILE_ORGANIZATION_ID;
-      
-      if (!organizationId) {
-        throw new Error("ID d'organisation Fabrile manquant dans les variables d'environnement");
-      }
-      
-      // Appeler le service IA avec le type d'interaction approprié
+      // Appeler le service IA (passerelle du backend) avec le type d'interaction approprié
       const result = await AIService.interact(
         interactionType,
-        content,
-        organizationId
+        content
       );
       
       // Indiquer le succès
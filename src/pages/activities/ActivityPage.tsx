@@ -3,6 +3,7 @@ import { useParams, useNavigate, useSearchParams } from 'react-router-dom';
 import { AlertCircle } from 'lucide-react';
 import Card from '../../components/common/Card';
 import { supabase } from '../../lib/supabaseClient';
+import apiService from '../../services/api';
 
 // Import des composants modulaires
 import ActivityHeader from './components/ActivityHeader';
@@ -207,6 +208,10 @@ const ActivityPage: React.FC = () => {
     if (activity) {
       localStorage.setItem(`activity_start_${activity.id}`, startTimeRef.current.toString());
       localStorage.setItem(`activity_active_time_${activity.id}`, '0');
+      
+      // Date de début côté serveur : sert à apprendre la durée des activités
+      apiService.activities.batch([{ activity_id: activity.id, action: 'start' }])
+        .catch(err => console.error('Erreur lors du démarrage de l\'activité:', err));
     }
   };
   
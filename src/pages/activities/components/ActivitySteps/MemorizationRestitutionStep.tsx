@@ -68,6 +68,63 @@ const MemorizationRestitutionStep: React.FC<MemorizationRestitutionStepProps> =
   const [isEvaluating, setIsEvaluating] = useState(false);
   const [aiEvaluations, setAiEvaluations] = useState<Record<string, ExtendedConceptRestitutionResponse>>({});
 
+  /**
+   * Construit le concept de référence (carte d'origine) envoyé à l'IA
+   */
+  const buildReferenceConcept = (concept: Concept): Record<string, string> => {
+    const referenceConcept: Record<string, string> = {
+      name: concept.name,
+      what: concept.what || '',
+      why: concept.why || '',
+      how: concept.how || '',
+      who: concept.who || '',
+      when: concept.when || '',
+      where: concept.where || '',
+      essentials: concept.essentials || ''
+    };
+    
+    // Ajouter les champs personnalisés
+    if (concept.customFields) {
+      concept.customFields.forEach(field => {
+        referenceConcept[field.id] = field.content || '';
+      });
+    }
+    return referenceConcept;
+  };
+
+  /**
+   * Évalue plusieurs concepts avec une seule demande IA groupée
+   * @returns Scores des concepts évalués, par identifiant
+   */
+  const evaluateConceptsWithAI = async (conceptIds: string[]): Promise<Record<string, ConceptScore>> => {
+    const items: Record<string, { userResponses: Record<string, string>; referenceConcept: Record<string, string> }> = {};
+    conceptIds.forEach(conceptId => {
+      const concept = concepts.find(c => c.id === conceptId);
+      if (concept) {
+        items[conceptId] = {
+          userResponses: userAnswers[conceptId] || {},
+          referenceConcept: buildReferenceConcept(concept)
+        };
+      }
+    });
+    
+    const evaluations = await AIService.evaluateConceptRestitutionBatch(items, activity.id);
+    const scores: Record<string, ConceptScore> = {};
+    Object.entries(evaluations).forEach(([conceptId, evaluation]) => {
+      scores[conceptId] = { score: evaluation.note_globale_sur_30, maxPossible: 30 };
+    });
+    
+    setAiEvaluations(prev => ({ ...prev, ...evaluations }));
+    setConceptScores(prev => ({ ...prev, ...scores }));
+    setEvaluatedConcepts(prev => [...prev, ...Object.keys(scores).filter(id => !prev.includes(id))]);
+    
+    // Sauvegarder les résultats dans la base de données
+    await Promise.all(Object.entries(evaluations).map(([conceptId, evaluation]) =>
+      saveRestitutionResults(conceptId, items[conceptId].userResponses, evaluation)
+    ));
+    return scores;
+  };
+
   /**
    * Évalue un concept avec l'IA Fabrile
    */
@@ -85,23 +142,7 @@ const MemorizationRestitutionStep: React.FC<MemorizationRestitutionStepProps> =
       const userResponsesToEvaluate = userAnswers[conceptId] || {};
       
       // Préparer le concept de référence (original)
-      const referenceConcept: Record<string, string> = {
-        name: conceptToEvaluate.name,
-        what: conceptToEvaluate.what || '',
-        why: conceptToEvaluate.why || '',
-        how: conceptToEvaluate.how || '',
-        who: conceptToEvaluate.who || '',
-        when: conceptToEvaluate.when || '',
-        where: conceptToEvaluate.where || '',
-        essentials: conceptToEvaluate.essentials || ''
-      };
-      
-      // Ajouter les champs personnalisés
-      if (conceptToEvaluate.customFields) {
-        conceptToEvaluate.customFields.forEach(field => {
-          referenceConcept[field.id] = field.content || '';
-        });
-      }
+      const referenceConcept = buildReferenceConcept(conceptToEvaluate);
       
       console.log('Concept de référence:', referenceConcept);
       console.log('Réponses de l\'utilisateur:', userResponsesToEvaluate);
@@ -563,22 +604,22 @@ const MemorizationRestitutionStep: React.FC<MemorizationRestitutionStepProps> =
               
               // Vérifier si tous les concepts ont été évalués
               const remainingConcepts = concepts.filter(c => !evaluatedConcepts.includes(c.id));
+              let newScores: Record<string, ConceptScore> = {};
               
               if (remainingConcepts.length > 0) {
                 const conceptNames = remainingConcepts.map(c => c.name).join(', ');
                 const shouldContinue = window.confirm(`Certains concepts n'ont pas encore été évalués: ${conceptNames}. Voulez-vous les évaluer maintenant?`);
                 
                 if (shouldContinue) {
-                  // Évaluer automatiquement les concepts restants
+                  // Évaluer automatiquement les concepts restants en une seule demande groupée
                   setIsEvaluating(true);
                   try {
-                    for (const concept of remainingConcepts) {
-                      await evaluateConcept(concept.id);
-                    }
+                    newScores = await evaluateConceptsWithAI(remainingConcepts.map(c => c.id));
                   } catch (error) {
                     console.error('Erreur lors de l\'évaluation automatique:', error);
                   } finally {
                     setIsEvaluating(false);
+                    saveProgress();
                   }
                 } else {
                   return; // L'utilisateur veut évaluer manuellement
@@ -589,7 +630,7 @@ const MemorizationRestitutionStep: React.FC<MemorizationRestitutionStepProps> =
               let finalScore = 0;
               let finalMaxPossible = 0;
               
-              Object.values(conceptScores).forEach(score => {
+              Object.values({ ...conceptScores, ...newScores }).forEach(score => {
                 finalScore += score.score;
                 finalMaxPossible += score.maxPossible;
               });
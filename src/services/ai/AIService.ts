@@ -1,7 +1,9 @@
 /**
  * Service centralisé pour les interactions avec l'IA Fabrile
+ * (via la passerelle IA du backend : jeton, consignes et threads restent côté serveur)
  */
-import { interactWithAI, AIInteractionType } from '../../api/ai/routes/fabrileInteraction';
+import type { AIInteractionType } from '../../api/ai/routes/fabrileInteraction';
+import { apiService } from '../api';
 
 // Types de réponses pour les différentes interactions IA
 
@@ -90,26 +92,20 @@ export const AIService = {
    * Interaction générique avec l'IA
    * @param type Type d'interaction avec l'IA
    * @param content Contenu à analyser ou évaluer
-   * @param organizationId ID de l'organisation Fabrile
+   * @param organizationId Conservé pour compatibilité (l'organisation est configurée côté backend)
+   * @param activityId Activité concernée (le thread IA est réutilisé par activité)
+   * @param chapterId Chapitre dont les extraits pertinents sont joints (sélectionnés côté backend)
    * @returns Réponse formatée de l'IA
    */
   interact: async <T extends AIResponse>(
     type: AIInteractionType,
     content: string | object,
-    organizationId: string = import.meta.env.VITE_FABRILE_ORG_ID
+    organizationId?: string,
+    activityId?: string,
+    chapterId?: string
   ): Promise<T> => {
-    // Vérifier que l'ID d'organisation est défini
-    if (!organizationId) {
-      throw new Error("ID d'organisation Fabrile manquant dans les variables d'environnement");
-    }
-    
-    // Convertir le contenu en string s'il s'agit d'un objet
-    const contentStr = typeof content === 'object' ? JSON.stringify(content) : content;
-    
-    // Appeler l'API Fabrile
-    const result = await interactWithAI(organizationId, contentStr, type);
-    
-    return result as T;
+    const { result } = await apiService.ai.interact<T>(type, content, activityId, chapterId);
+    return result;
   },
 
   /**
@@ -153,29 +149,13 @@ export const AIService = {
     referenceConcept: Record<string, string>,
     organizationId: string = import.meta.env.VITE_FABRILE_ORG_ID
   ): Promise<ConceptRestitutionResponse> => {
-    // Récupérer l'ID du bot spécifique pour la restitution
-    // Utiliser directement la valeur fournie si elle est disponible dans l'environnement
-    const botId = import.meta.env.VITE_Restitution_BOT_ID || 'bot_CHnxzWJ59zu6W2gH7E9gb';
-    
-    console.log('Bot ID utilisé pour la restitution:', botId);
-    
-    if (!botId) {
-      throw new Error("ID du bot de restitution manquant dans les variables d'environnement");
-    }
-    
-    // Préparer les données à envoyer
     // Inclure explicitement les cartes de concepts originales pour la comparaison
+    // (l'agent de restitution est choisi par la passerelle IA du backend)
     const content = {
       userResponses,
-      referenceConcept,
-      botId
+      referenceConcept
     };
     
-    console.log("Envoi des données pour évaluation de restitution:", {
-      ...content,
-      botId: "[REDACTED]" // Pour la sécurité dans les logs
-    });
-    
     return AIService.interact<ConceptRestitutionResponse>(
       'concept_restitution',
       content,
@@ -183,6 +163,28 @@ export const AIService = {
     );
   },
   
+  /**
+   * Évalue la restitution de plusieurs concepts d'une activité en une seule demande groupée
+   * @param items Réponses de l'utilisateur et concept de référence, par identifiant de concept
+   * @param activityId Activité concernée
+   * @returns Évaluation de chaque concept par identifiant (les éléments non évalués sont absents)
+   */
+  evaluateConceptRestitutionBatch: async (
+    items: Record<string, { userResponses: Record<string, string>; referenceConcept: Record<string, string> }>,
+    activityId: string
+  ): Promise<Record<string, ConceptRestitutionResponse>> => {
+    const { results } = await apiService.ai.evaluateBatch<ConceptRestitutionResponse>(
+      'concept_restitution',
+      activityId,
+      Object.entries(items).map(([id, content]) => ({ id, content }))
+    );
+    const evaluations: Record<string, ConceptRestitutionResponse> = {};
+    Object.entries(results).forEach(([id, response]) => {
+      if (response.valid) evaluations[id] = response.result;
+    });
+    return evaluations;
+  },
+  
   /**
    * Obtient un feedback sur les notes prises par l'apprenant
    * @param notes Contenu des notes
@@ -225,6 +227,52 @@ export const AIService = {
       },
       organizationId
     );
+  },
+  
+  /**
+   * Évalue les réponses d'un quiz question par question, en requêtes groupées côté serveur
+   * @param questions Réponse de l'utilisateur et réponse correcte, par identifiant de question
+   * @param activityId Activité concernée
+   * @param complete Termine l'activité avec le score moyen obtenu
+   * @returns Évaluation de chaque question par identifiant et score moyen (en pourcentage)
+   */
+  evaluateQuizBatch: async (
+    questions: Record<string, { userAnswer: any; correctAnswer: any }>,
+    activityId: string,
+    complete: boolean = false
+  ): Promise<{ results: Record<string, QuizEvaluationResponse>; score: number | null }> => {
+    const response = await apiService.ai.evaluateBatch<QuizEvaluationResponse>(
+      'quiz_evaluation',
+      activityId,
+      Object.entries(questions).map(([id, { userAnswer, correctAnswer }]) => ({
+        id,
+        content: { userAnswers: { [id]: userAnswer }, correctAnswers: { [id]: correctAnswer } }
+      })),
+      { complete }
+    );
+    const results: Record<string, QuizEvaluationResponse> = {};
+    Object.entries(response.results).forEach(([id, item]) => {
+      if (item.valid) results[id] = item.result;
+    });
+    return { results, score: response.score };
+  },
+
+  /**
+   * Récupère le planning d'étude précalculé de l'utilisateur (renouvelé chaque nuit)
+   * @returns Planning d'étude
+   */
+  getStudyPlanning: async (): Promise<StudyPlanningResponse> => {
+    const { report } = await apiService.ai.report<StudyPlanningResponse>('study_planning');
+    return report;
+  },
+
+  /**
+   * Récupère le rapport de progression précalculé de l'utilisateur
+   * @returns Rapport de progression
+   */
+  getProgressReport: async (): Promise<ProgressReportResponse> => {
+    const { report } = await apiService.ai.report<ProgressReportResponse>('progress_report');
+    return report;
   }
 };
 
@@ -155,6 +155,227 @@ export const apiService = {
     }
   },
   
+  /**
+   * Tableau de bord : profil, progression, parcours, recommandations et journal en un seul appel
+   * @param sections Sections à charger (toutes par défaut)
+   * @param days Nombre de jours de journal quotidien
+   */
+  dashboard: {
+    async get(sections?: string[], days?: number) {
+      const params = new URLSearchParams();
+      if (sections && sections.length) params.set('sections', sections.join(','));
+      if (days) params.set('days', String(days));
+      const query = params.toString();
+      return apiService.get(`/dashboard${query ? `?${query}` : ''}`);
+    }
+  },
+
+  /**
+   * Synchronisation incrémentale du cache local
+   * @param since Curseur renvoyé par l'appel précédent (absent : synchronisation complète)
+   * @param tables Tables à synchroniser (toutes par défaut)
+   * @returns Lignes modifiées, identifiants supprimés et nouveau curseur
+   */
+  sync: {
+    async changes(since?: string, tables?: string[]): Promise<{
+      cursor: string;
+      full: boolean;
+      changes: Record<string, any[]>;
+      deleted: Record<string, string[]>;
+    }> {
+      const params = new URLSearchParams();
+      if (since) params.set('since', since);
+      if (tables && tables.length) params.set('tables', tables.join(','));
+      const query = params.toString();
+      return apiService.get(`/sync${query ? `?${query}` : ''}`);
+    }
+  },
+
+  /**
+   * Flux d'événements du serveur (progression des extractions, conversions terminées,
+   * recommandations prêtes). EventSource ne permet pas d'en-tête Authorization :
+   * le jeton est passé dans l'URL.
+   * @returns EventSource à fermer avec close() ; se reconnecte automatiquement
+   */
+  events: {
+    async open(): Promise<EventSource> {
+      const token = await apiService.getAuthToken();
+      const query = token ? `?access_token=${encodeURIComponent(token)}` : '';
+      return new EventSource(`${API_URL}/events${query}`);
+    }
+  },
+
+  /**
+   * Passerelle IA du backend (évaluations, feedbacks, recommandations)
+   */
+  ai: {
+    /**
+     * Exécute une interaction IA
+     * @param type Type d'interaction
+     * @param content Contenu à évaluer ou analyser
+     * @param activityId Activité concernée (le thread IA est réutilisé par activité)
+     * @param chapterId Chapitre dont les extraits les plus pertinents accompagnent la demande
+     * @returns Réponse de l'IA, indicateur de cache et de validité
+     */
+    async interact<T = any>(type: string, content: string | object, activityId?: string, chapterId?: string): Promise<{
+      result: T;
+      cached: boolean;
+      valid: boolean;
+    }> {
+      return apiService.post('/ai/interact', { type, content, activity_id: activityId, chapter_id: chapterId });
+    },
+    
+    /**
+     * Exécute une interaction IA en recevant la réponse au fil de l'eau
+     * @param onDelta Appelée avec chaque fragment de texte produit par le modèle
+     * @returns Même résultat que interact
+     */
+    async stream<T = any>(
+      type: string,
+      content: string | object,
+      onDelta: (text: string) => void,
+      activityId?: string,
+      chapterId?: string
+    ): Promise<{ result: T; cached: boolean; valid: boolean }> {
+      const token = await apiService.getAuthToken();
+      if (!token) {
+        throw new Error('Non authentifié');
+      }
+      
+      const response = await fetch(`${API_URL}/ai/interact/stream`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'Authorization': `Bearer ${token}`
+        },
+        body: JSON.stringify({ type, content, activity_id: activityId, chapter_id: chapterId })
+      });
+      if (!response.ok || !response.body) {
+        throw new Error(`Erreur API: ${response.status}`);
+      }
+      
+      // Lecture des événements server-sent events séparés par une ligne vide
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let separator;
+        while ((separator = buffer.indexOf('\n\n')) >= 0) {
+          const block = buffer.slice(0, separator);
+          buffer = buffer.slice(separator + 2);
+          const name = block.match(/^event: (.*)$/m)?.[1];
+          const data = block.match(/^data: (.*)$/m)?.[1];
+          if (!name || data === undefined) continue;
+          const payload = JSON.parse(data);
+          if (name === 'delta') onDelta(payload.text);
+          else if (name === 'result') return payload;
+          else if (name === 'error') throw new Error(payload.detail);
+        }
+      }
+      throw new Error('Réponse IA interrompue');
+    },
+    
+    /**
+     * Évalue en une fois les réponses d'un quiz ou les cartes de concepts d'une activité
+     * (requêtes IA groupées côté serveur)
+     * @param items Éléments à évaluer, chacun avec un identifiant unique
+     * @param options complete : termine l'activité avec le score moyen (en pourcentage)
+     * @returns Résultat de chaque élément par identifiant, score moyen et activité mise à jour
+     */
+    async evaluateBatch<T = any>(
+      type: 'quiz_evaluation' | 'concept_restitution',
+      activityId: string,
+      items: Array<{ id: string; content: object }>,
+      options: { chapterId?: string; complete?: boolean } = {}
+    ): Promise<{
+      results: Record<string, { result: T; cached: boolean; valid: boolean; batched: boolean; error?: string }>;
+      score: number | null;
+      activity: any | null;
+    }> {
+      return apiService.post('/ai/evaluate/batch', {
+        type,
+        activity_id: activityId,
+        chapter_id: options.chapterId,
+        items,
+        complete: options.complete ?? false
+      });
+    },
+
+    /**
+     * Récupère le planning d'étude ou le rapport de progression précalculé de l'utilisateur
+     * (stale : rapport en cours de régénération, signalé par l'événement report.ready)
+     * @param type Type de rapport
+     * @returns Rapport, date de génération et indicateur de fraîcheur
+     */
+    async report<T = any>(
+      type: 'study_planning' | 'progress_report'
+    ): Promise<{ report: T; generated_at: string | null; valid: boolean; stale: boolean }> {
+      return apiService.get(`/ai/reports/${type}`);
+    }
+  },
+
+  /**
+   * Services spécifiques pour l'agenda
+   */
+  agenda: {
+    /**
+     * Ajoute du temps d'étude et des sessions terminées au journal du jour
+     * (cumulé côté serveur et écrit par lots)
+     * @param increment Minutes d'étude et sessions terminées depuis le dernier appel
+     */
+    async heartbeat(increment: { total_time?: number; sessions_completed?: number; date?: string }) {
+      return apiService.post('/agenda/heartbeat', increment);
+    },
+
+    /**
+     * Récupère les révisions à faire (répétition espacée), les plus anciennes d'abord
+     * @param until Date limite (aujourd'hui par défaut, format AAAA-MM-JJ)
+     * @returns Révisions échues avec leur activité et le nom du cours
+     */
+    async reviews(until?: string) {
+      return apiService.get(`/agenda/reviews${until ? `?until=${until}` : ''}`);
+    },
+
+    /**
+     * Récupère les rappels d'examen (J-7, J-3, J-1) de l'utilisateur
+     * @returns Dates de rappel par cours, prochain rappel d'abord
+     */
+    async reminders() {
+      return apiService.get('/agenda/reminders');
+    },
+
+    /**
+     * Récupère le temps d'étude et les sessions par semaine ou par mois
+     * @param granularity 'week' ou 'month'
+     * @param from Début de la période (format AAAA-MM-JJ, 12 périodes avant `to` par défaut)
+     * @param to Fin de la période (aujourd'hui par défaut)
+     * @returns Totaux par période, périodes sans étude comprises
+     */
+    async stats(granularity: 'week' | 'month' = 'week', from?: string, to?: string) {
+      const params = new URLSearchParams({ granularity });
+      if (from) params.append('from', from);
+      if (to) params.append('to', to);
+      return apiService.get(`/agenda/stats?${params.toString()}`);
+    }
+  },
+
+  /**
+   * Services spécifiques pour les activités
+   */
+  activities: {
+    /**
+     * Applique plusieurs démarrages / validations / scores d'activités en un seul appel
+     * @param operations Opérations appliquées dans l'ordre
+     * @returns Activités mises à jour, identifiants introuvables et cours recalculés
+     */
+    async batch(operations: Array<{ activity_id: string; action: 'start' | 'complete' | 'score'; score?: number }>) {
+      return apiService.post('/activities/batch', { operations });
+    }
+  },
+
   /**
    * Services spécifiques pour les chapitres
    */
@@ -178,17 +399,60 @@ export const apiService = {
     },
     
     /**
-     * Télécharge un fichier et l'associe à un chapitre existant
+     * Envoie un fichier directement à Supabase Storage et l'associe à un chapitre existant
+     * (le fichier ne transite pas par l'API : URL signée, envoi, puis finalisation)
      * @param chapterId ID du chapitre
-     * @param file Fichier à télécharger (PDF, DOCX, PPTX)
-     * @returns Résultat de l'opération avec l'URL du fichier stocké
+     * @param file Fichier à envoyer (PDF, DOCX, PPTX)
+     * @returns Chapitre mis à jour (file_path, taille, empreinte) ; l'extraction est lancée en arrière-plan
      */
     async uploadChapterFile(chapterId: string, file: File) {
-      const formData = new FormData();
-      formData.append('file', file);
-      formData.append('chapter_id', chapterId);
+      const upload = await apiService.post<{ bucket: string; path: string; token: string; file_path: string }>(
+        '/chapters/upload-url',
+        { chapter_id: chapterId, filename: file.name, size: file.size }
+      );
+      
+      const { error } = await supabase.storage
+        .from(upload.bucket)
+        .uploadToSignedUrl(upload.path, upload.token, file, { contentType: file.type || undefined });
+      if (error) {
+        throw new Error(`Erreur lors de l'envoi du fichier: ${error.message}`);
+      }
+      
+      const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+      const sha256 = Array.from(new Uint8Array(digest))
+        .map((byte) => byte.toString(16).padStart(2, '0'))
+        .join('');
+      
+      return apiService.post('/chapters/upload/finalize', {
+        chapter_id: chapterId,
+        file_path: upload.file_path,
+        sha256
+      });
+    }
+  },
+
+  /**
+   * Export de toutes les données d'étude de l'utilisateur
+   */
+  export: {
+    /**
+     * Télécharge l'export (NDJSON : une ligne {"type", "data"} par enregistrement)
+     * @returns Fichier de l'export, complet si sa dernière ligne est de type "end"
+     */
+    async download(): Promise<Blob> {
+      const token = await apiService.getAuthToken();
+      if (!token) {
+        throw new Error('Non authentifié');
+      }
       
-      return apiService.postFormData('/chapters/upload', formData);
+      const response = await fetch(`${API_URL}/export`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.detail || `Erreur ${response.status}`);
+      }
+      return response.blob();
     }
   }
 };